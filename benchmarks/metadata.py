@@ -0,0 +1,114 @@
+"""
+Instance metadata load benchmark for Claude Code Manager.
+
+Generates instance records and measures how long loading all of them takes with
+each storage option: one YAML file per instance parsed by pure-Python PyYAML (the
+original layout) or by libyaml, one JSON file per instance, and the SQLite registry.
+
+Usage:
+    python benchmarks/metadata.py [--records N] [--runs N]
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime
+from typing import Any, Callable, Dict, List
+
+import yaml
+
+from claude_code_manager.registry import InstanceRegistry
+from claude_code_manager.serialization import dump_yaml
+
+
+def _make_records(count: int) -> List[Dict[str, Any]]:
+    """Build instance records shaped like the ones scaffold saves."""
+    records = []
+    for index in range(count):
+        instance_id = str(uuid.uuid4())
+        records.append(
+            {
+                "id": instance_id,
+                "environment": f"env{index % 10}",
+                "path": f"/home/user/claude_code_work/env{index % 10}_{instance_id[:8]}",
+                "created_at": datetime.now().isoformat(),
+                "scaffold_commands": [
+                    {"name": "install", "status": "succeeded", "duration": 12.5},
+                    {"name": "build", "status": "cached", "duration": 0.4},
+                ],
+            }
+        )
+    return records
+
+
+def _load_files(directory: str, load: Callable[[Any], Any]) -> int:
+    """Load every file in a directory, returning the number of records."""
+    count = 0
+    for entry in os.scandir(directory):
+        with open(entry.path, "r") as f:
+            if load(f) is not None:
+                count += 1
+    return count
+
+
+def _time(func: Callable[[], int], runs: int) -> float:
+    """Run a loader several times and return the fastest run in milliseconds."""
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1000)
+    return min(timings)
+
+
+def main() -> int:
+    """
+    Run the metadata benchmark.
+
+    Returns:
+        Process exit status
+    """
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--records", type=int, default=10000, help="Number of instance records")
+    parser.add_argument("--runs", type=int, default=3, help="Runs per storage option; the fastest one counts")
+    options = parser.parse_args()
+
+    records = _make_records(options.records)
+    with tempfile.TemporaryDirectory() as root:
+        yaml_dir = os.path.join(root, "yaml")
+        json_dir = os.path.join(root, "json")
+        os.makedirs(yaml_dir)
+        os.makedirs(json_dir)
+        registry = InstanceRegistry(os.path.join(root, "instances.db"))
+        for record in records:
+            with open(os.path.join(yaml_dir, f"{record['id']}.yaml"), "w") as f:
+                dump_yaml(record, f)
+            with open(os.path.join(json_dir, f"{record['id']}.json"), "w") as f:
+                json.dump(record, f)
+            registry.save(record["id"], record)
+
+        loaders = {
+            "YAML files, pure Python": lambda: _load_files(yaml_dir, lambda f: yaml.load(f, Loader=yaml.SafeLoader)),
+            "YAML files, libyaml": lambda: _load_files(yaml_dir, lambda f: yaml.load(f, Loader=yaml.CSafeLoader)),
+            "JSON files": lambda: _load_files(json_dir, json.load),
+            "SQLite registry, full records": lambda: len(registry.list()),
+            "SQLite registry, indexed columns": lambda: len(registry.summaries()),
+        }
+        if not yaml.__with_libyaml__:
+            del loaders["YAML files, libyaml"]
+
+        print(f"Loading {options.records} instance records")
+        baseline_ms = None
+        for name, loader in loaders.items():
+            elapsed_ms = _time(loader, options.runs)
+            baseline_ms = baseline_ms or elapsed_ms
+            print(f"  {name:<34} {elapsed_ms:9.1f} ms  {baseline_ms / elapsed_ms:6.1f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,114 @@
+"""
+CLI startup benchmark for Claude Code Manager.
+
+Runs ccm subcommands under `python -X importtime` against an empty configuration
+directory and fails when a command imports a module it must not need or when its
+import time exceeds its budget. Bytecode is written and reused as in an installed
+ccm, even when PYTHONDONTWRITEBYTECODE is set.
+
+Usage:
+    python benchmarks/startup.py [--runs N] [--scale FACTOR]
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+from typing import Dict, List, Set, Tuple
+
+# Command arguments -> (import time budget in ms, modules that must not be imported). list and envs need
+# click, rich and PyYAML (for config.yaml), about 90 ms together on a slow machine; their budgets leave
+# room for measurement noise on top. tests/test_startup.py checks the modules on every test run.
+BUDGETS: Dict[Tuple[str, ...], Tuple[float, List[str]]] = {
+    ("-h",): (80, ["git", "inquirer", "rich", "yaml"]),
+    ("list",): (150, ["git", "inquirer", "claude_code_manager.environment"]),
+    ("envs",): (150, ["git", "inquirer", "claude_code_manager.environment"]),
+    ("cache",): (200, ["inquirer"]),
+    ("pool",): (200, ["git", "inquirer"]),
+}
+
+
+def _parse_importtime(stderr: str) -> List[Tuple[str, int, int]]:
+    """Parse `-X importtime` output into (module, cumulative microseconds, nesting level) entries."""
+    entries = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        _, cumulative, name = line.split("|")
+        level = (len(name) - len(name.lstrip()) - 1) // 2
+        entries.append((name.strip(), int(cumulative.strip()), level))
+    return entries
+
+
+def _baseline_modules() -> Set[str]:
+    """Modules the bare interpreter imports at startup, excluded from the measurement."""
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", "pass"], capture_output=True, text=True)
+    return {name for name, _, _ in _parse_importtime(result.stderr)}
+
+
+def measure(args: Tuple[str, ...], env: Dict[str, str], baseline: Set[str]) -> Tuple[float, Set[str]]:
+    """
+    Measure the import time of one ccm invocation.
+
+    Args:
+        args: ccm arguments
+        env: Environment of the child process
+        baseline: Modules to exclude from the measurement
+
+    Returns:
+        Import time in milliseconds and the set of imported module names
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-m", "claude_code_manager.cli", *args],
+        capture_output=True,
+        text=True,
+        env=env,
+    )
+    entries = _parse_importtime(result.stderr)
+    modules = {name for name, _, _ in entries}
+    import_us = sum(cumulative for name, cumulative, level in entries if level == 0 and name not in baseline)
+    return import_us / 1000, modules
+
+
+def main() -> int:
+    """
+    Run the startup benchmark.
+
+    Returns:
+        Process exit status: 0 when every command is within budget
+    """
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5, help="Runs per command; the fastest one counts")
+    parser.add_argument("--scale", type=float, default=1.0, help="Multiply all budgets, e.g. for slow CI machines")
+    options = parser.parse_args()
+
+    baseline = _baseline_modules()
+    failures = []
+    with tempfile.TemporaryDirectory() as home:
+        env = dict(os.environ, HOME=home, CCM_CONFIG_DIR=os.path.join(home, ".claude_code"))
+        # Otherwise every run compiles the package from source and the fastest run measures that
+        env.pop("PYTHONDONTWRITEBYTECODE", None)
+        for args, (budget_ms, forbidden) in BUDGETS.items():
+            budget_ms *= options.scale
+            timings = []
+            for _ in range(options.runs):
+                import_ms, modules = measure(args, env, baseline)
+                timings.append(import_ms)
+            best_ms = min(timings)
+            unexpected = sorted(set(forbidden) & modules)
+
+            status = "ok"
+            if unexpected:
+                status = f"FAIL imports {', '.join(unexpected)}"
+            elif best_ms > budget_ms:
+                status = "FAIL over budget"
+            if status != "ok":
+                failures.append(args)
+            print(f"ccm {' '.join(args):<8} {best_ms:7.1f} ms  (budget {budget_ms:.0f} ms)  {status}")
+
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,378 @@
+"""
+Benchmark suite for Claude Code Manager.
+
+Runs offline against generated data in a temporary directory:
+
+- list: ConfigManager.list_instances, and one page of query_instances, with 1k, 10k
+  and 100k registered instances
+- scaffold: EnvironmentManager.scaffold_environment from generated local git
+  repositories of several sizes, with a cold and a warm mirror cache
+- delete: EnvironmentManager.delete_instance on large trees, plus the time until
+  the background reaper has removed them
+- startup: wall time of a fresh `ccm <subcommand>` process
+- mcp: round-trip latency of MCP tool calls to a running `ccm mcp` server
+- template: rendering claude.md templates of 100 KB and 1 MB for a batch of 20
+  instances, with the parsed template cache and parsing for every instance
+- dedupe: DedupeStore.dedupe of an instance tree into an empty store, and of an
+  identical second instance whose files are all in the store already
+
+Results are written as JSON so runs of different releases can be compared; with
+--compare the suite exits with status 1 when a result got slower than the threshold.
+
+Usage:
+    python benchmarks/suite.py [--quick] [--only NAME ...] [--output FILE] [--compare FILE]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+from claude_code_manager import __version__
+from claude_code_manager.config import ConfigManager
+from claude_code_manager.environment import EnvironmentManager
+from claude_code_manager.templates import Template, render_template
+from claude_code_manager.trash import TRASH_DIR_NAME
+
+# Repository sizes for the scaffold benchmark: name -> (files, bytes per file)
+REPO_SIZES = {"small": (10, 1024), "medium": (1000, 4096), "large": (5000, 16384)}
+STARTUP_COMMANDS = [["-h"], ["list"], ["envs"], ["cache"], ["pool"], ["stats"]]
+
+
+def _result(benchmark: str, params: Dict[str, Any], timings: List[float]) -> Dict[str, Any]:
+    """Build a result entry; the fastest run is the headline number."""
+    return {
+        "benchmark": benchmark,
+        "params": params,
+        "seconds": min(timings),
+        "median": sorted(timings)[len(timings) // 2],
+        "runs": [round(timing, 6) for timing in timings],
+    }
+
+
+def _timed(func: Callable[[], Any]) -> float:
+    """Run a function once and return its wall time in seconds."""
+    start = time.perf_counter()
+    func()
+    return time.perf_counter() - start
+
+
+def _config_manager(root: str) -> ConfigManager:
+    """Create a configuration directory whose work directory is inside root."""
+    config_manager = ConfigManager(os.path.join(root, f"config-{uuid.uuid4().hex[:8]}"))
+    config_manager.config["default_work_dir"] = os.path.join(root, "work")
+    config_manager.save()
+    return config_manager
+
+
+def _make_repo(path: str, files: int, file_size: int) -> str:
+    """Create a git repository with one commit of generated files and return its file:// URL."""
+    os.makedirs(path)
+    payload = os.urandom(file_size // 2).hex()
+    for index in range(files):
+        directory = os.path.join(path, f"dir{index % 50}")
+        os.makedirs(directory, exist_ok=True)
+        with open(os.path.join(directory, f"file{index}.txt"), "w") as f:
+            f.write(f"{index}\n{payload}")
+    git = ["git", "-C", path, "-c", "user.name=bench", "-c", "user.email=bench@example.com"]
+    subprocess.run(git + ["init", "-q", "-b", "main"], check=True)
+    subprocess.run(git + ["add", "-A"], check=True)
+    subprocess.run(git + ["commit", "-q", "-m", "Generated"], check=True)
+    return f"file://{path}"
+
+
+def _make_tree(path: str, files: int) -> None:
+    """Create a node_modules-like tree of small files."""
+    for index in range(files):
+        directory = os.path.join(path, "node_modules", f"package{index // 100}")
+        if index % 100 == 0:
+            os.makedirs(directory, exist_ok=True)
+        with open(os.path.join(directory, f"file{index % 100}.js"), "w") as f:
+            f.write("module.exports = {};\n")
+
+
+def bench_list(root: str, options: argparse.Namespace) -> List[Dict[str, Any]]:
+    """Time listing all instances of a registry of growing size."""
+    results = []
+    for count in [1000, 10000] if options.quick else [1000, 10000, 100000]:
+        config_manager = _config_manager(root)
+        config_manager.registry.save_many(
+            [
+                {
+                    "id": str(uuid.uuid4()),
+                    "environment": f"env{index % 10}",
+                    "path": os.path.join(root, "work", f"env{index % 10}_{index:08x}"),
+                    "created_at": datetime.now().isoformat(),
+                }
+                for index in range(count)
+            ]
+        )
+        timings = [_timed(config_manager.list_instances) for _ in range(options.runs)]
+        results.append(_result("list_instances", {"instances": count}, timings))
+        # One page from the middle of the registry, as `ccm list --limit 50 --offset N` reads it
+        timings = [
+            _timed(lambda: list(config_manager.query_instances(limit=50, offset=count // 2)))
+            for _ in range(options.runs)
+        ]
+        results.append(_result("list_page", {"instances": count}, timings))
+    return results
+
+
+def bench_scaffold(root: str, options: argparse.Namespace) -> List[Dict[str, Any]]:
+    """Time scaffolding an environment with one repository of each size."""
+    results = []
+    sizes = ["small", "medium"] if options.quick else list(REPO_SIZES)
+    for size in sizes:
+        files, file_size = REPO_SIZES[size]
+        url = _make_repo(os.path.join(root, "repos", size), files, file_size)
+        env_config = {"repositories": [{"url": url, "path": "repo"}], "scaffold_commands": []}
+
+        cold, warm = [], []
+        for _ in range(options.runs):
+            # A fresh configuration directory has an empty mirror cache
+            env_manager = EnvironmentManager(_config_manager(root))
+            env_manager.config_manager.save_environment_config("bench", dict(env_config))
+            cold.append(_timed(lambda: env_manager.scaffold_environment("bench")))
+            warm.append(_timed(lambda: env_manager.scaffold_environment("bench")))
+        results.append(_result("scaffold", {"repo": size, "files": files, "mirror_cache": "cold"}, cold))
+        results.append(_result("scaffold", {"repo": size, "files": files, "mirror_cache": "warm"}, warm))
+    return results
+
+
+def bench_delete(root: str, options: argparse.Namespace) -> List[Dict[str, Any]]:
+    """Time deleting instances with large trees, and until the background reaper has removed them."""
+    results = []
+    for files in [10000] if options.quick else [10000, 50000]:
+        env_manager = EnvironmentManager(_config_manager(root))
+        delete_timings, reap_timings = [], []
+        for _ in range(options.runs):
+            instance_id = str(uuid.uuid4())
+            instance_dir = os.path.join(root, "work", f"bench_{instance_id[:8]}")
+            _make_tree(instance_dir, files)
+            env_manager.config_manager.save_instance(
+                instance_id,
+                {"id": instance_id, "environment": "bench", "path": instance_dir, "created_at": ""},
+            )
+            start = time.perf_counter()
+            env_manager.delete_instance(instance_id)
+            delete_timings.append(time.perf_counter() - start)
+            # The detached reaper removes the tree; wait until the trash is empty again
+            trash_dir = os.path.join(root, "work", TRASH_DIR_NAME)
+            while any(entry.name != ".lock" for entry in os.scandir(trash_dir)):
+                time.sleep(0.01)
+            reap_timings.append(time.perf_counter() - start)
+        results.append(_result("delete_instance", {"files": files}, delete_timings))
+        results.append(_result("delete_reaped", {"files": files}, reap_timings))
+    return results
+
+
+def bench_startup(root: str, options: argparse.Namespace) -> List[Dict[str, Any]]:
+    """Time fresh ccm processes for each cheap subcommand."""
+    env = dict(os.environ, HOME=root, CCM_CONFIG_DIR=os.path.join(root, "startup-config"))
+    results = []
+    for args in STARTUP_COMMANDS:
+        command = [sys.executable, "-m", "claude_code_manager.cli", *args]
+        timings = [
+            _timed(lambda: subprocess.run(command, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL))
+            for _ in range(max(options.runs, 5))
+        ]
+        results.append(_result("cli_startup", {"command": " ".join(args)}, timings))
+    return results
+
+
+def bench_mcp(root: str, options: argparse.Namespace) -> List[Dict[str, Any]]:
+    """Time MCP tool calls against one running server."""
+    try:
+        from mcp import ClientSession, StdioServerParameters
+        from mcp.client.stdio import stdio_client
+    except ImportError:
+        print("  skipped: the mcp package is not installed")
+        return []
+
+    config_manager = _config_manager(root)
+    config_manager.save_environment_config("bench", {"description": "Benchmark", "repositories": []})
+    params = StdioServerParameters(
+        command=sys.executable,
+        args=["-m", "claude_code_manager.mcp.server"],
+        env=dict(os.environ, HOME=root, CCM_CONFIG_DIR=config_manager.config_dir),
+    )
+    calls = [("list_environments", {}), ("list_instances", {}), ("scaffold_help", {})]
+
+    async def run() -> List[Dict[str, Any]]:
+        results = []
+        # The server logs every request to stderr
+        with open(os.devnull, "w") as errlog:
+            async with stdio_client(params, errlog=errlog) as (read_stream, write_stream):
+                async with ClientSession(read_stream, write_stream) as session:
+                    await session.initialize()
+                    for tool, arguments in calls:
+                        # The first call pays for lazy imports and config loading
+                        await session.call_tool(tool, arguments)
+                        timings = []
+                        for _ in range(max(options.runs, 20)):
+                            start = time.perf_counter()
+                            await session.call_tool(tool, arguments)
+                            timings.append(time.perf_counter() - start)
+                        results.append(_result("mcp_call", {"tool": tool}, timings))
+        return results
+
+    return asyncio.run(run())
+
+
+def bench_template(root: str, options: argparse.Namespace) -> List[Dict[str, Any]]:
+    """Time rendering large claude.md templates for every instance of a batch."""
+    results = []
+    paragraph = "Run the tests in ${REPO_APP_PATH} at ${REPO_APP_SHA} for ${INSTANCE_ID} before committing. " * 4
+    for size_kb in [100, 1024]:
+        source = (paragraph + "\n") * (size_kb * 1024 // (len(paragraph) + 1))
+        batch = [
+            {"INSTANCE_ID": str(uuid.uuid4()), "REPO_APP_PATH": f"/work/app_{index}", "REPO_APP_SHA": "0" * 40}
+            for index in range(20)
+        ]
+        params = {"size_kb": size_kb, "instances": len(batch)}
+        # The first instance of a batch parses the template; the rest render the cached parse
+        timings = [
+            _timed(lambda: [render_template(source, variables) for variables in batch]) for _ in range(options.runs)
+        ]
+        results.append(_result("template_render", params, timings))
+        # For comparison: parsing the template again for every instance
+        timings = [
+            _timed(lambda: [Template(source).render(variables) for variables in batch]) for _ in range(options.runs)
+        ]
+        results.append(_result("template_parse", params, timings))
+    return results
+
+
+def bench_dedupe(root: str, options: argparse.Namespace) -> List[Dict[str, Any]]:
+    """Time deduplicating instance trees into a cold and a warm dedupe store."""
+    results = []
+    for files in [1000] if options.quick else [1000, 10000]:
+        cold, warm = [], []
+        for _ in range(options.runs):
+            config_manager = _config_manager(root)
+            # Hardlink every file, so the benchmark does not depend on the filesystem supporting reflinks
+            config_manager.config.update(dedupe_min_file_size_kb=0, dedupe_hardlink_paths=["*"])
+            env_manager = EnvironmentManager(config_manager)
+            instance_dirs = []
+            for _ in range(2):
+                instance_dir = os.path.join(root, "work", f"bench_{uuid.uuid4().hex[:8]}")
+                for index in range(files):
+                    directory = os.path.join(instance_dir, "node_modules", f"package{index // 100}")
+                    if index % 100 == 0:
+                        os.makedirs(directory, exist_ok=True)
+                    with open(os.path.join(directory, f"file{index % 100}.js"), "w") as f:
+                        f.write(f"module.exports = {{ id: {index} }};\n")
+                instance_dirs.append(instance_dir)
+            for timings, instance_dir in zip((cold, warm), instance_dirs):
+                instance_id = str(uuid.uuid4())
+                timings.append(_timed(lambda: env_manager.dedupe.dedupe(instance_id, instance_dir)))
+        results.append(_result("dedupe", {"files": files, "store": "cold"}, cold))
+        results.append(_result("dedupe", {"files": files, "store": "warm"}, warm))
+    return results
+
+
+BENCHMARKS: Dict[str, Callable[[str, argparse.Namespace], List[Dict[str, Any]]]] = {
+    "list": bench_list,
+    "scaffold": bench_scaffold,
+    "delete": bench_delete,
+    "startup": bench_startup,
+    "mcp": bench_mcp,
+    "template": bench_template,
+    "dedupe": bench_dedupe,
+}
+
+
+def _key(result: Dict[str, Any]) -> str:
+    """Identify a result across runs."""
+    return result["benchmark"] + json.dumps(result["params"], sort_keys=True)
+
+
+def compare(results: List[Dict[str, Any]], baseline_file: str, threshold: float) -> List[str]:
+    """
+    Compare results against a previous run.
+
+    Args:
+        results: Results of this run
+        baseline_file: JSON file written by an earlier run
+        threshold: Slowdown factor above which a result counts as a regression
+
+    Returns:
+        Descriptions of the regressions
+    """
+    with open(baseline_file, "r") as f:
+        baseline = {_key(result): result for result in json.load(f)["results"]}
+    regressions = []
+    for result in results:
+        previous = baseline.get(_key(result))
+        if previous is None or previous["seconds"] <= 0:
+            continue
+        ratio = result["seconds"] / previous["seconds"]
+        if ratio > threshold:
+            regressions.append(
+                f"{result['benchmark']} {result['params']}: {previous['seconds'] * 1000:.1f} ms"
+                f" -> {result['seconds'] * 1000:.1f} ms ({ratio:.2f}x)"
+            )
+    return regressions
+
+
+def main() -> int:
+    """
+    Run the benchmark suite.
+
+    Returns:
+        Process exit status: 1 when --compare found a regression
+    """
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--quick", action="store_true", help="Skip the largest sizes")
+    parser.add_argument("--runs", type=int, default=3, help="Runs per measurement; the fastest one counts")
+    parser.add_argument("--only", nargs="+", choices=sorted(BENCHMARKS), help="Benchmarks to run (default: all)")
+    parser.add_argument("--output", default="benchmark-results.json", help="JSON file to write the results to")
+    parser.add_argument("--compare", help="JSON results of an earlier run to compare against")
+    parser.add_argument("--threshold", type=float, default=1.25, help="Slowdown factor reported as a regression")
+    options = parser.parse_args()
+
+    results: List[Dict[str, Any]] = []
+    root = tempfile.mkdtemp(prefix="ccm-bench-")
+    try:
+        for name in options.only or list(BENCHMARKS):
+            print(f"{name}:")
+            for result in BENCHMARKS[name](root, options):
+                params = ", ".join(f"{key}={value}" for key, value in result["params"].items())
+                print(f"  {result['benchmark']:<16} {params:<40} {result['seconds'] * 1000:10.1f} ms")
+                results.append(result)
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+    report: Dict[str, Any] = {
+        "version": __version__,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "timestamp": datetime.now().isoformat(),
+        "quick": options.quick,
+        "results": results,
+    }
+    with open(options.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {options.output}")
+
+    regressions: Optional[List[str]] = compare(results, options.compare, options.threshold) if options.compare else None
+    if regressions:
+        print("Regressions:")
+        for regression in regressions:
+            print(f"  {regression}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
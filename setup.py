@@ -23,6 +23,7 @@ setup(
     entry_points={
         "console_scripts": [
             "ccm=claude_code_manager.cli:main",
+            "ccmd=claude_code_manager.daemon.server:main",
         ],
     },
     classifiers=[
@@ -32,6 +33,7 @@ setup(
     ],
     extras_require={
         "dev": [
+            "pytest>=7.0",
             "ruff>=0.1.0",
             "uv>=0.24.0",
         ],
@@ -0,0 +1,123 @@
+"""
+Partial clone, sparse checkout and submodule options of repository entries.
+
+A repository entry in the environment YAML may set:
+
+- filter: a partial clone filter such as ``blob:none`` or ``tree:0``; objects left out
+  are fetched from the repository on demand
+- sparse_paths: directories to check out (cone mode); the rest of the tree is skipped
+- submodules: ``none`` (default), ``recursive``, ``shallow`` (recursive at depth 1) or a
+  list of submodule paths to initialize recursively
+"""
+
+from typing import TYPE_CHECKING, Any, Dict, List, Optional
+
+if TYPE_CHECKING:
+    import git
+
+SUBMODULE_POLICIES = ("none", "recursive", "shallow")
+
+
+def clone_options(repo_config: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Read and validate the clone options of a repository entry.
+
+    Args:
+        repo_config: Repository configuration from the environment config
+
+    Returns:
+        Dictionary with filter (str or None), sparse_paths (list) and submodules
+        (a policy name or a list of paths) keys
+
+    Raises:
+        ValueError: If an option has an invalid value
+    """
+    filter_spec: Optional[str] = repo_config.get("filter") or None
+    if filter_spec is not None and (not isinstance(filter_spec, str) or filter_spec.startswith("-")):
+        raise ValueError(f"Invalid filter: {filter_spec!r}")
+
+    sparse_paths = repo_config.get("sparse_paths") or []
+    if isinstance(sparse_paths, str):
+        sparse_paths = [sparse_paths]
+    sparse_paths = [str(path).strip("/") for path in sparse_paths if str(path).strip("/")]
+
+    submodules = repo_config.get("submodules") or "none"
+    if isinstance(submodules, bool):
+        submodules = "recursive" if submodules else "none"
+    if isinstance(submodules, str):
+        if submodules not in SUBMODULE_POLICIES:
+            raise ValueError(
+                f"Invalid submodules policy {submodules!r}, expected a list of paths or one of "
+                f"{', '.join(SUBMODULE_POLICIES)}"
+            )
+    else:
+        submodules = [str(path) for path in submodules]
+
+    return {"filter": filter_spec, "sparse_paths": sparse_paths, "submodules": submodules}
+
+
+def defers_checkout(options: Dict[str, Any]) -> bool:
+    """
+    Whether a clone with these options must be made with --no-checkout and checked out by complete_checkout.
+
+    Args:
+        options: Options from clone_options
+
+    Returns:
+        True if the repository uses a filter or sparse paths
+    """
+    return bool(options["filter"] or options["sparse_paths"])
+
+
+def enable_partial_clone(repo: "git.Repo", filter_spec: str) -> None:
+    """
+    Make origin the promisor remote of a clone, so objects left out by a filter are fetched from it on demand.
+
+    Used for clones of a partial mirror, whose objects were copied locally and whose
+    origin was then pointed at the real repository.
+
+    Args:
+        repo: Cloned repository
+        filter_spec: Filter the objects were left out by
+    """
+    with repo.config_writer() as config:
+        config.set_value("core", "repositoryformatversion", "1")
+        config.set_value("extensions", "partialclone", "origin")
+        config.set_value('remote "origin"', "promisor", "true")
+        config.set_value('remote "origin"', "partialclonefilter", filter_spec)
+
+
+def complete_checkout(repo: "git.Repo", options: Dict[str, Any]) -> None:
+    """
+    Check out a fresh clone according to its options and initialize its submodules.
+
+    Args:
+        repo: Cloned repository, made with --no-checkout if defers_checkout(options)
+        options: Options from clone_options
+    """
+    if options["sparse_paths"]:
+        repo.git.sparse_checkout("set", "--cone", *options["sparse_paths"])
+    if defers_checkout(options):
+        repo.git.checkout()
+    update_submodules(repo, options)
+
+
+def update_submodules(repo: "git.Repo", options: Dict[str, Any]) -> None:
+    """
+    Initialize and update a repository's submodules according to its submodules policy.
+
+    Args:
+        repo: Checked out repository
+        options: Options from clone_options
+    """
+    submodules = options["submodules"]
+    if submodules == "none" or not submodules:
+        return
+    args: List[str] = ["update", "--init", "--recursive"]
+    if submodules == "shallow":
+        args.extend(["--depth", "1"])
+    if options["filter"]:
+        args.append(f"--filter={options['filter']}")
+    if isinstance(submodules, list):
+        args.extend(["--", *submodules])
+    repo.git.submodule(*args)
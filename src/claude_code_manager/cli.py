@@ -1,29 +1,101 @@
 """
 CLI interface for Claude Code Manager.
 Provides command-line commands for interacting with Claude Code environments.
+
+Only click is imported at module level; each command imports the rest of the
+package when it runs, so `ccm -h` and cheap commands don't pay for GitPython,
+inquirer or rich.
 """
 
+import os
 import sys
-from typing import Optional
+from typing import TYPE_CHECKING, Optional
 
 import click
 
-from .core import ClaudeCodeManager
-from .utils import print_error, print_info
+if TYPE_CHECKING:
+    from .core import ClaudeCodeManager
 
 CONTEXT_SETTINGS = dict(help_option_names=["-h", "--help"])
 
+# Cleared by --no-daemon, --profile and CCM_TRACE, which need the work done in this process
+_use_daemon = True
+
+
+def _manager() -> "ClaudeCodeManager":
+    """Create the core manager, served by the ccm daemon if one is running."""
+    from .core import ClaudeCodeManager
+
+    if _use_daemon:
+        from .daemon.client import connect
+
+        return ClaudeCodeManager(daemon=connect())
+    return ClaudeCodeManager()
+
+
+class _CliGroup(click.Group):
+    """Command group accepting ``--profile`` both with and without a ``=PATH`` value."""
+
+    def parse_args(self, ctx: click.Context, args: list) -> list:
+        """Treat a bare ``--profile`` before the subcommand as ``--profile=`` (profile to the default path)."""
+        rewritten = []
+        for index, arg in enumerate(args):
+            if not arg.startswith("-"):
+                rewritten.extend(args[index:])
+                break
+            rewritten.append("--profile=" if arg == "--profile" else arg)
+        return super().parse_args(ctx, rewritten)
+
+
+def _start_profiling(ctx: click.Context, path: str, top: int) -> None:
+    """Profile the rest of the command and write the stats when it finishes."""
+    import cProfile
 
-@click.group(context_settings=CONTEXT_SETTINGS)
+    from .profiling import default_profile_path, write_profile
+
+    profile = cProfile.Profile()
+
+    def finish() -> None:
+        profile.disable()
+        write_profile(profile, path or default_profile_path(ctx.invoked_subcommand or "ccm"), top)
+
+    ctx.call_on_close(finish)
+    profile.enable()
+
+
+def _start_tracing(ctx: click.Context) -> None:
+    """Record the rest of the command as the root span of its trace."""
+    from .tracing import span
+
+    root_span = span(f"ccm {ctx.invoked_subcommand}", argv=sys.argv[1:])
+    root_span.__enter__()
+    ctx.call_on_close(lambda: root_span.__exit__(None, None, None))
+
+
+@click.group(cls=_CliGroup, context_settings=CONTEXT_SETTINGS)
 @click.version_option()
-def cli():
+@click.option(
+    "--profile",
+    metavar="[=PATH]",
+    help="Profile the command with cProfile and write a .pstats file (default: ./ccm-<command>-<time>.pstats)",
+)
+@click.option("--profile-top", type=int, default=25, show_default=True, help="Profile entries to print")
+@click.option("--no-daemon", is_flag=True, help="Do the work in this process even if the ccm daemon (ccmd) is running")
+@click.pass_context
+def cli(ctx: click.Context, profile: Optional[str] = None, profile_top: int = 25, no_daemon: bool = False):
     """
     Claude Code Manager - A tool for managing Claude Code environments.
 
     This tool helps you define, scaffold, and manage temporary working
     environments for Claude Code projects.
     """
-    pass
+    global _use_daemon
+    _use_daemon = not (no_daemon or profile is not None or os.environ.get("CCM_TRACE"))
+    if profile is not None:
+        _start_profiling(ctx, profile, profile_top)
+    # Checked here so that the tracing module is only imported when it is enabled
+    if os.environ.get("CCM_TRACE"):
+        _start_tracing(ctx)
 
 
 @cli.command("setup")
@@ -35,23 +107,31 @@ def setup(env_name: Optional[str] = None):
     Parameters:
         --env-name: The name of the environment to configure.
     """
-    manager = ClaudeCodeManager()
+    manager = _manager()
     manager.setup_environment(env_name)
 
 
 @cli.command("scaffold")
 @click.option("--env-name", "-e", help="The name of the environment to scaffold")
 @click.option("--dir", "-d", help="Working directory for the environment")
-def scaffold(env_name: str, dir: Optional[str] = None):
+@click.option("--count", "-n", type=click.IntRange(min=1), default=1, help="Number of instances to create")
+@click.option("--jobs", "-j", type=click.IntRange(min=1), help="Number of instances built at once (with --count)")
+def scaffold(env_name: str, dir: Optional[str] = None, count: int = 1, jobs: Optional[int] = None):
     """
     Create a new environment instance.
 
     Parameters:
         --env-name: The name of the environment to scaffold.
-        --dir: The working directory for the environment.
+        --dir: The working directory for the environment; with --count, the directory
+            the instances are created in as <env-name>_<n>.
+        --count: The number of instances to create.
+        --jobs: The number of instances built at once.
     """
-    manager = ClaudeCodeManager()
-    manager.scaffold_environment(env_name, dir)
+    manager = _manager()
+    if count > 1:
+        manager.scaffold_many(env_name, count, jobs, dir)
+    else:
+        manager.scaffold_environment(env_name, dir)
 
 
 @cli.command("choose")
@@ -65,7 +145,7 @@ def choose(env_name: Optional[str] = None, instance: Optional[str] = None):
         --env-name: The name of the environment to filter instances.
         --instance: The instance ID to select.
     """
-    manager = ClaudeCodeManager()
+    manager = _manager()
     manager.choose_environment(env_name, instance)
 
 
@@ -80,21 +160,70 @@ def delete(instance_id: Optional[str] = None, env: Optional[str] = None):
         --instance-id: The instance ID to delete.
         --env: The environment name to filter instances.
     """
-    manager = ClaudeCodeManager()
+    manager = _manager()
     manager.delete_environment_instance(instance_id, env)
 
 
+@cli.command("refresh")
+@click.option("--instance-id", "-i", help="The instance ID to refresh")
+@click.option("--env", "-e", help="The environment name to filter instances")
+def refresh(instance_id: Optional[str] = None, env: Optional[str] = None):
+    """
+    Update an instance in place instead of scaffolding a new one.
+
+    Fetches and fast-forwards its repositories, rewrites claude.md if the template
+    changed and re-runs the scaffold commands whose inputs changed.
+
+    Parameters:
+        --instance-id: The instance ID to refresh.
+        --env: The environment name to filter instances.
+    """
+    manager = _manager()
+    manager.refresh_instance(instance_id, env)
+
+
 @cli.command("list")
 @click.option("--env-name", "-e", help="The environment name to filter instances")
-def list_instances(env_name: Optional[str] = None):
+@click.option("--limit", "-n", type=click.IntRange(min=0), help="Maximum number of instances to show")
+@click.option("--offset", type=click.IntRange(min=0), default=0, help="Number of instances to skip")
+@click.option(
+    "--sort",
+    type=click.Choice(["created", "env", "size"]),
+    default="created",
+    show_default=True,
+    help="Order of the instances; size measures every directory and lists the largest first",
+)
+@click.option("--since", help="Only instances created at or after this ISO date/time or age (e.g. 2h, 3d, 1w)")
+@click.option("--before", help="Only instances created before this ISO date/time or age")
+@click.option(
+    "--format",
+    "output_format",
+    type=click.Choice(["table", "plain", "ndjson"]),
+    default="table",
+    show_default=True,
+    help="plain (tab-separated) and ndjson print each instance as soon as it is read",
+)
+def list_instances(
+    env_name: Optional[str] = None,
+    limit: Optional[int] = None,
+    offset: int = 0,
+    sort: str = "created",
+    since: Optional[str] = None,
+    before: Optional[str] = None,
+    output_format: str = "table",
+):
     """
     Show existing environment instances.
 
     Parameters:
         --env-name: The environment name to filter instances.
+        --limit / --offset: Page through the instances.
+        --sort: Order by creation time, environment or size on disk.
+        --since / --before: Filter by creation time.
+        --format: table, or plain / ndjson for scripts.
     """
-    manager = ClaudeCodeManager()
-    manager.list_instances(env_name)
+    manager = _manager()
+    manager.list_instances(env_name, limit, offset, sort, since, before, output_format)
 
 
 @cli.command("envs")
@@ -102,15 +231,127 @@ def list_environments():
     """
     List all configured environment types.
     """
-    manager = ClaudeCodeManager()
+    manager = _manager()
     manager.list_env_types()
 
+
+@cli.command("cache")
+@click.option("--prune", is_flag=True, help="Evict expired and least recently used entries down to the size limits")
+@click.option("--max-size", type=int, help="Size limit in MB for each cache (defaults to the configured limits)")
+@click.option("--clear", is_flag=True, help="Remove all repository mirrors and cached command outputs")
+def cache(prune: bool = False, max_size: Optional[int] = None, clear: bool = False):
+    """
+    Show and prune the repository mirror and command output caches.
+
+    Parameters:
+        --prune: Evict expired and least recently used entries down to the size limits.
+        --max-size: Size limit in MB to prune each cache to.
+        --clear: Remove all repository mirrors and cached command outputs.
+    """
+    manager = _manager()
+    manager.show_cache(prune=prune or max_size is not None, clear=clear, max_size_mb=max_size)
+
+
+@cli.command("dedupe")
+@click.option("--instance-id", "-i", help="Deduplicate the files of an existing instance")
+@click.option("--all", "all_instances", is_flag=True, help="Deduplicate every instance not deduplicated yet")
+@click.option("--stats", is_flag=True, help="Report the files and bytes the dedupe store saves")
+def dedupe(instance_id: Optional[str] = None, all_instances: bool = False, stats: bool = False):
+    """
+    Deduplicate identical instance files and report the space saved.
+
+    New instances are deduplicated when they are scaffolded if dedupe_enabled is set in
+    config.yaml; this command deduplicates instances created before that.
+
+    Parameters:
+        --instance-id: Deduplicate the files of an existing instance.
+        --all: Deduplicate every instance not deduplicated yet.
+        --stats: Report the files and bytes the dedupe store saves.
+    """
+    manager = _manager()
+    manager.deduplicate(instance_id, all_instances, stats)
+
+
+@cli.group("pool", invoke_without_command=True)
+@click.pass_context
+def pool(ctx: click.Context):
+    """
+    Manage warm pools of pre-scaffolded instances.
+
+    Without a subcommand, shows the pool status of every pooled environment.
+    """
+    if ctx.invoked_subcommand is None:
+        manager = _manager()
+        manager.show_pool()
+
+
+@pool.command("fill")
+@click.option("--env-name", "-e", help="The environment whose pool to fill (all pooled environments if omitted)")
+def pool_fill(env_name: Optional[str] = None):
+    """
+    Build ready instances until the pool is full.
+
+    Parameters:
+        --env-name: The environment whose pool to fill.
+    """
+    manager = _manager()
+    manager.fill_pool(env_name)
+
+
+@pool.command("drain")
+@click.option("--env-name", "-e", help="The environment whose pool to drain (all pooled environments if omitted)")
+def pool_drain(env_name: Optional[str] = None):
+    """
+    Remove all ready instances from the pool.
+
+    Parameters:
+        --env-name: The environment whose pool to drain.
+    """
+    manager = _manager()
+    manager.drain_pool(env_name)
+
+
+@cli.command("stats")
+@click.option("--env", "-e", help="The environment name to filter scaffolds")
+def stats(env: Optional[str] = None):
+    """
+    Show how long scaffolds spend in each phase, repository and command.
+
+    Reports p50, p95 and max wall time across all recorded scaffolds.
+
+    Parameters:
+        --env: The environment name to filter scaffolds.
+    """
+    manager = _manager()
+    manager.show_stats(env)
+
+
+@cli.command("gc")
+@click.option("--dry-run", is_flag=True, help="Only report what would be removed and the reclaimable space")
+@click.option("--jobs", "-j", type=click.IntRange(min=1), help="Number of directories removed at once")
+def gc(dry_run: bool = False, jobs: Optional[int] = None):
+    """
+    Remove expired, excess and orphaned instances.
+
+    Applies each environment's gc.ttl_hours and gc.max_instances policy, removes
+    instance records whose directory is gone and instance directories in the work
+    directory that have no record, and finishes removing deleted instances from the trash.
+
+    Parameters:
+        --dry-run: Only report what would be removed and the reclaimable space.
+        --jobs: The number of directories removed at once.
+    """
+    manager = _manager()
+    manager.collect_garbage(jobs, dry_run)
+
+
 @cli.command("mcp")
 def mcp():
     """
     Start the MCP server.
     """
     from .mcp.server import main
+
     main()
 
 
@@ -121,9 +362,13 @@ def main():
     try:
         cli()
     except KeyboardInterrupt:
+        from .utils import print_info
+
         print_info("\nOperation cancelled by user")
         sys.exit(1)
     except Exception as e:
+        from .utils import print_error
+
         print_error(f"Error: {str(e)}")
         sys.exit(1)
 
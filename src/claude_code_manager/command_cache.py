@@ -0,0 +1,255 @@
+"""
+Content-addressed cache of scaffold command outputs for Claude Code Manager.
+Restores a command's declared outputs instead of re-running it when its inputs are unchanged.
+
+Outputs are restored into other instances than the one they were produced in, so outputs
+that contain the producing instance's path (such as the scripts of a Python virtualenv)
+are not cached; the command runs in every instance instead.
+"""
+
+import glob
+import hashlib
+import json
+import os
+import shutil
+import time
+import uuid
+from typing import Any, Dict, List, Optional
+
+from .config import ConfigManager
+from .fileops import SizeLedger, copy_tree, dir_size, mentions_path
+
+DEFAULT_COMMAND_CACHE_MAX_SIZE_MB = 20480
+DEFAULT_COMMAND_CACHE_MAX_AGE_DAYS = 14
+
+
+def hash_inputs(patterns: List[str], cwd: str) -> Optional[Dict[str, str]]:
+    """
+    Hash every file matched by a command's input globs.
+
+    Args:
+        patterns: Glob patterns relative to the command's working directory
+        cwd: Working directory of the command
+
+    Returns:
+        Mapping of relative path to SHA-256 digest, or None if nothing matched
+    """
+    paths = set()
+    for pattern in patterns:
+        for path in glob.glob(pattern, root_dir=cwd, recursive=True):
+            if os.path.isfile(os.path.join(cwd, path)):
+                paths.add(os.path.normpath(path))
+    if not paths:
+        return None
+
+    digests = {}
+    for path in sorted(paths):
+        digest = hashlib.sha256()
+        with open(os.path.join(cwd, path), "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(chunk)
+        digests[path] = digest.hexdigest()
+    return digests
+
+
+class CommandCache:
+    """Stores outputs of scaffold commands keyed by their command string and input file contents."""
+
+    def __init__(self, config_manager: ConfigManager):
+        """
+        Initialize the command output cache.
+
+        Args:
+            config_manager: Configuration manager instance
+        """
+        self.config_manager = config_manager
+        self.cache_dir = os.path.join(config_manager.config_dir, "command_cache")
+        self._ledger = SizeLedger(os.path.join(self.cache_dir, ".sizes.json"))
+
+    @property
+    def max_size_bytes(self) -> int:
+        """Size limit of the cache before least recently used entries are evicted."""
+        max_size_mb = self.config_manager.config.get("command_cache_max_size_mb", DEFAULT_COMMAND_CACHE_MAX_SIZE_MB)
+        return int(max_size_mb) * 1024 * 1024
+
+    @property
+    def max_age_seconds(self) -> float:
+        """Age after which unused entries are evicted."""
+        max_age_days = self.config_manager.config.get("command_cache_max_age_days", DEFAULT_COMMAND_CACHE_MAX_AGE_DAYS)
+        return float(max_age_days) * 86400
+
+    @staticmethod
+    def cacheable(node: Dict[str, Any]) -> bool:
+        """Whether a scaffold command node declares both inputs and outputs."""
+        return bool(node.get("inputs")) and bool(node.get("outputs"))
+
+    def compute_key(self, node: Dict[str, Any], cwd: str) -> Optional[str]:
+        """
+        Compute the cache key of a scaffold command node.
+
+        Args:
+            node: Command node with command, inputs and outputs keys
+            cwd: Working directory of the command
+
+        Returns:
+            Hex digest or None if the inputs matched no files
+        """
+        input_digests = hash_inputs(node["inputs"], cwd)
+        if input_digests is None:
+            return None
+        payload = {"command": node["command"], "outputs": sorted(node["outputs"]), "inputs": input_digests}
+        return hashlib.sha256(json.dumps(payload, sort_keys=True).encode("utf-8")).hexdigest()
+
+    def _entry_path(self, key: str) -> str:
+        """Get the directory of a cache entry."""
+        return os.path.join(self.cache_dir, key[:2], key)
+
+    def restore(self, key: str, outputs: List[str], cwd: str) -> bool:
+        """
+        Restore a command's outputs from the cache.
+
+        Args:
+            key: Cache key
+            outputs: Output paths relative to the working directory
+            cwd: Working directory of the command
+
+        Returns:
+            True on a cache hit, False otherwise
+        """
+        entry_path = self._entry_path(key)
+        if not os.path.isdir(entry_path):
+            return False
+
+        try:
+            for output in outputs:
+                source = os.path.join(entry_path, "files", output)
+                target = os.path.join(cwd, output)
+                if os.path.isdir(target) and not os.path.islink(target):
+                    shutil.rmtree(target)
+                elif os.path.lexists(target):
+                    os.remove(target)
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                if os.path.isdir(source) and not os.path.islink(source):
+                    copy_tree(source, target)
+                else:
+                    shutil.copy2(source, target, follow_symlinks=False)
+        except FileNotFoundError:
+            # Evicted while we were copying; fall back to running the command
+            return False
+
+        os.utime(entry_path)
+        return True
+
+    def store(self, key: str, outputs: List[str], cwd: str) -> bool:
+        """
+        Store a command's outputs in the cache.
+
+        Args:
+            key: Cache key
+            outputs: Output paths relative to the working directory
+            cwd: Working directory of the command
+
+        Returns:
+            True if stored, False if an output is missing or contains the working directory's path
+        """
+        if not all(os.path.lexists(os.path.join(cwd, output)) for output in outputs):
+            return False
+        entry_path = self._entry_path(key)
+        if os.path.isdir(entry_path):
+            return True
+        if mentions_path(cwd, outputs):
+            print(f"Not caching {', '.join(outputs)}: the outputs contain the instance path {cwd}")
+            return False
+
+        partial_path = os.path.join(self.cache_dir, f".partial-{uuid.uuid4().hex}")
+        try:
+            for output in outputs:
+                source = os.path.join(cwd, output)
+                target = os.path.join(partial_path, "files", output)
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                if os.path.isdir(source) and not os.path.islink(source):
+                    copy_tree(source, target)
+                else:
+                    shutil.copy2(source, target, follow_symlinks=False)
+            size = dir_size(partial_path)
+            os.makedirs(os.path.dirname(entry_path), exist_ok=True)
+            os.rename(partial_path, entry_path)
+        except OSError:
+            # Another process stored the same key first, or the copy failed
+            shutil.rmtree(partial_path, ignore_errors=True)
+            return os.path.isdir(entry_path)
+
+        # Only walk the whole cache when the recorded sizes say it is over its limit, or once in a while
+        self._ledger.record(key, size)
+        if self._ledger.prune_due(self.max_size_bytes):
+            self.prune()
+        return True
+
+    def list_entries(self) -> List[Dict[str, Any]]:
+        """
+        List all cache entries, most recently used first.
+
+        Returns:
+            List of dictionaries with key, path, size and last_used keys
+        """
+        if not os.path.isdir(self.cache_dir):
+            return []
+
+        entries = []
+        for shard in os.scandir(self.cache_dir):
+            if not shard.is_dir() or shard.name.startswith("."):
+                continue
+            for entry in os.scandir(shard.path):
+                entries.append(
+                    {
+                        "key": entry.name,
+                        "path": entry.path,
+                        "size": dir_size(entry.path),
+                        "last_used": entry.stat().st_mtime,
+                    }
+                )
+        entries.sort(key=lambda entry: entry["last_used"], reverse=True)
+        return entries
+
+    def prune(self, max_size_bytes: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Evict entries unused for longer than the maximum age, then least recently used
+        entries until the cache fits its size limit.
+
+        Args:
+            max_size_bytes: Size limit to prune to; defaults to the configured limit
+
+        Returns:
+            List of evicted entry dictionaries
+        """
+        if max_size_bytes is None:
+            max_size_bytes = self.max_size_bytes
+
+        entries = self.list_entries()
+        total = sum(entry["size"] for entry in entries)
+        now = time.time()
+        evicted = []
+        for entry in reversed(entries):
+            if total <= max_size_bytes and now - entry["last_used"] <= self.max_age_seconds:
+                continue
+            removing_path = os.path.join(self.cache_dir, f".removing-{uuid.uuid4().hex}")
+            try:
+                os.rename(entry["path"], removing_path)
+            except FileNotFoundError:
+                continue
+            shutil.rmtree(removing_path, ignore_errors=True)
+            total -= entry["size"]
+            evicted.append(entry)
+
+        evicted_keys = {entry["key"] for entry in evicted}
+        self._ledger.reset({entry["key"]: entry["size"] for entry in entries if entry["key"] not in evicted_keys})
+        return evicted
+
+    def clear(self) -> List[Dict[str, Any]]:
+        """
+        Remove every cache entry.
+
+        Returns:
+            List of removed entry dictionaries
+        """
+        return self.prune(max_size_bytes=0)
@@ -0,0 +1,380 @@
+"""
+Scaffold command execution for Claude Code Manager.
+Runs an environment's scaffold_commands as a dependency graph on a worker pool.
+"""
+
+import hashlib
+import json
+import os
+import signal
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional
+
+from .command_cache import hash_inputs
+from .output import command_environment, is_routed
+from .tracing import propagate, span
+
+if TYPE_CHECKING:
+    from .command_cache import CommandCache
+    from .progress import ScaffoldProgress
+
+DEFAULT_MAX_PARALLEL_COMMANDS = 4
+# How often a running command checks for cancellation
+CANCEL_POLL_INTERVAL = 0.2
+
+
+def _as_list(value: Any) -> List[str]:
+    """Accept a single string or a list of strings from YAML."""
+    if value is None:
+        return []
+    if isinstance(value, str):
+        return [value]
+    return [str(item) for item in value]
+
+
+def normalize_commands(command_configs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Resolve scaffold command configs into graph nodes.
+
+    Every command gets a name (``command_<n>`` by default), the commands it depends on
+    and the commands it runs after. A command without ``depends_on`` runs after the
+    command before it, unless it sets ``parallel: true``. That ordering edge only waits
+    for the previous command to finish: like plain ``{"command": ...}`` lists always did,
+    the command still runs when the previous one failed.
+
+    Args:
+        command_configs: The environment's scaffold_commands
+
+    Returns:
+        List of node dictionaries with name, command, depends_on, after, timeout, inputs and outputs keys
+
+    Raises:
+        ValueError: If names are duplicated, a dependency is unknown or the graph has a cycle
+    """
+    nodes = []
+    previous_name = None
+    for index, command_config in enumerate(command_configs):
+        if not command_config.get("command"):
+            continue
+        name = str(command_config.get("name") or f"command_{index + 1}")
+        depends_on = command_config.get("depends_on")
+        after = []
+        if depends_on is None:
+            depends_on = []
+            if not command_config.get("parallel") and previous_name is not None:
+                after = [previous_name]
+        elif isinstance(depends_on, str):
+            depends_on = [depends_on]
+        timeout = command_config.get("timeout")
+        nodes.append(
+            {
+                "name": name,
+                "command": command_config["command"],
+                "depends_on": [str(dependency) for dependency in depends_on],
+                "after": after,
+                "timeout": float(timeout) if timeout is not None else None,
+                "inputs": _as_list(command_config.get("inputs")),
+                "outputs": _as_list(command_config.get("outputs")),
+            }
+        )
+        previous_name = name
+
+    names = [node["name"] for node in nodes]
+    duplicates = sorted({name for name in names if names.count(name) > 1})
+    if duplicates:
+        raise ValueError(f"Duplicate scaffold command names: {', '.join(duplicates)}")
+    for node in nodes:
+        unknown = [dependency for dependency in node["depends_on"] if dependency not in names]
+        if unknown:
+            raise ValueError(f"Scaffold command '{node['name']}' depends on unknown command(s): {', '.join(unknown)}")
+
+    # Kahn's algorithm: anything left over sits on a cycle
+    remaining = {node["name"]: set(node["depends_on"]) | set(node["after"]) for node in nodes}
+    while True:
+        ready = [name for name, dependencies in remaining.items() if not dependencies]
+        if not ready:
+            break
+        for name in ready:
+            del remaining[name]
+        for dependencies in remaining.values():
+            dependencies.difference_update(ready)
+    if remaining:
+        raise ValueError(f"Scaffold commands form a dependency cycle: {', '.join(sorted(remaining))}")
+
+    return nodes
+
+
+def inputs_digest(node: Dict[str, Any], cwd: str) -> Optional[str]:
+    """
+    Digest a command node's command string and the contents of its declared inputs.
+
+    Args:
+        node: Command node from normalize_commands
+        cwd: Working directory of the command
+
+    Returns:
+        Hex digest, or None if the node declares no inputs or they match no files
+    """
+    if not node["inputs"]:
+        return None
+    input_digests = hash_inputs(node["inputs"], cwd)
+    if input_digests is None:
+        return None
+    payload = {"command": node["command"], "inputs": input_digests}
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def _kill_process_group(process: subprocess.Popen) -> None:
+    """Kill a command started by run_command together with everything it spawned."""
+    try:
+        os.killpg(process.pid, signal.SIGKILL)
+    except ProcessLookupError:
+        pass
+    process.wait()
+
+
+def run_command(
+    command: str,
+    cwd: str,
+    timeout: Optional[float] = None,
+    cancel_event: Optional[threading.Event] = None,
+) -> Dict[str, Any]:
+    """
+    Run a single shell command in its own process group.
+
+    On timeout or cancellation the whole process group is killed, including anything
+    the shell spawned. While output is routed to a daemon client (see output.routed),
+    the command runs with the client's environment and its output is forwarded to it.
+
+    Args:
+        command: Shell command
+        cwd: Working directory
+        timeout: Optional timeout in seconds
+        cancel_event: Optional event that aborts the command when set
+
+    Returns:
+        Dictionary with status, returncode, duration and error keys
+    """
+    start = time.monotonic()
+    forwarder = None
+    if is_routed():
+        process = subprocess.Popen(
+            command,
+            shell=True,
+            cwd=cwd,
+            env=command_environment(),
+            start_new_session=True,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+        )
+        forwarder = threading.Thread(target=propagate(_forward_output), args=(process,), name="ccm-command-output")
+        forwarder.start()
+    else:
+        process = subprocess.Popen(command, shell=True, cwd=cwd, start_new_session=True)
+    try:
+        return _wait(process, start, timeout, cancel_event)
+    finally:
+        if forwarder is not None:
+            forwarder.join()
+
+
+def _forward_output(process: subprocess.Popen) -> None:
+    """Copy a command's piped output to sys.stdout, line by line, until the command exits."""
+    for line in iter(process.stdout.readline, b""):
+        sys.stdout.write(line.decode("utf-8", errors="replace"))
+    process.stdout.close()
+
+
+def _wait(
+    process: subprocess.Popen, start: float, timeout: Optional[float], cancel_event: Optional[threading.Event]
+) -> Dict[str, Any]:
+    """Wait for a command started by run_command and report how it ended."""
+    deadline = start + timeout if timeout is not None else None
+    while True:
+        wait_timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+        if cancel_event is not None:
+            wait_timeout = CANCEL_POLL_INTERVAL if wait_timeout is None else min(wait_timeout, CANCEL_POLL_INTERVAL)
+        try:
+            returncode = process.wait(timeout=wait_timeout)
+            break
+        except subprocess.TimeoutExpired:
+            if cancel_event is not None and cancel_event.is_set():
+                _kill_process_group(process)
+                return {
+                    "status": "cancelled",
+                    "returncode": None,
+                    "duration": time.monotonic() - start,
+                    "error": "Cancelled",
+                }
+            if deadline is not None and time.monotonic() >= deadline:
+                _kill_process_group(process)
+                return {
+                    "status": "timed_out",
+                    "returncode": None,
+                    "duration": time.monotonic() - start,
+                    "error": f"Timed out after {timeout:g}s",
+                }
+
+    duration = time.monotonic() - start
+    if returncode != 0:
+        return {
+            "status": "failed",
+            "returncode": returncode,
+            "duration": duration,
+            "error": f"Exited with status {returncode}",
+        }
+    return {"status": "succeeded", "returncode": 0, "duration": duration, "error": None}
+
+
+def _run_node(
+    node: Dict[str, Any],
+    cwd: str,
+    render: Optional[Callable[[str], str]],
+    cache: Optional["CommandCache"],
+    progress: Optional["ScaffoldProgress"] = None,
+    should_run: Optional[Callable[[Dict[str, Any]], bool]] = None,
+) -> Dict[str, Any]:
+    """
+    Run one command node, restoring its outputs from the cache when its inputs are unchanged.
+
+    Args:
+        node: Command node from normalize_commands
+        cwd: Working directory of the command
+        render: Optional function substituting placeholders in the command
+        cache: Optional command output cache
+        progress: Optional progress tracker to report to and take cancellation from
+        should_run: Optional predicate deciding, once the node's dependencies are done, whether it runs
+
+    Returns:
+        Result dictionary from run_command, with status "cached" on a cache hit and
+        "unchanged" when should_run declined the node
+    """
+    command = render(node["command"]) if render else node["command"]
+    if should_run is not None and not should_run(node):
+        return {"status": "unchanged", "returncode": None, "duration": 0.0, "error": None}
+    if progress is not None:
+        progress.update_command(node["name"], "running")
+    with span("command", name=node["name"], command=command) as command_span:
+        key = None
+        if cache is not None and cache.cacheable(node):
+            start = time.monotonic()
+            key = cache.compute_key(node, cwd)
+            if key is not None and cache.restore(key, node["outputs"], cwd):
+                command_span.set(status="cached")
+                return {"status": "cached", "returncode": None, "duration": time.monotonic() - start, "error": None}
+
+        result = run_command(command, cwd, node["timeout"], progress.cancel_event if progress is not None else None)
+        if key is not None and result["status"] == "succeeded":
+            cache.store(key, node["outputs"], cwd)
+        command_span.set(status=result["status"], returncode=result["returncode"])
+        return result
+
+
+def run_scaffold_commands(
+    nodes: List[Dict[str, Any]],
+    cwd: str,
+    max_workers: int = DEFAULT_MAX_PARALLEL_COMMANDS,
+    render: Optional[Callable[[str], str]] = None,
+    cache: Optional["CommandCache"] = None,
+    progress: Optional["ScaffoldProgress"] = None,
+    should_run: Optional[Callable[[Dict[str, Any]], bool]] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Run scaffold command nodes as a dependency graph.
+
+    A node starts as soon as all of its dependencies have succeeded (or were restored
+    from the cache, or left unchanged) and the nodes it runs after have finished, whatever
+    their status. When a node fails or times out, every node that depends on it, directly
+    or transitively, is skipped; nodes that only run after it are not. Once the progress tracker is cancelled, running
+    commands are killed and commands that have not started are marked cancelled.
+
+    Args:
+        nodes: Nodes from normalize_commands
+        cwd: Working directory of the commands
+        max_workers: Maximum number of commands running at once
+        render: Optional function substituting placeholders in each command; cache keys
+            are computed from the unrendered command so they are stable across instances
+        cache: Optional command output cache for nodes declaring inputs and outputs
+        progress: Optional progress tracker updated as commands start and finish
+        should_run: Optional predicate called with each node when its dependencies are done;
+            nodes it declines are not run and are reported with status "unchanged"
+
+    Returns:
+        One result dictionary per node, in node order, with name, command, status,
+        returncode, duration and error keys
+    """
+    results: Dict[str, Dict[str, Any]] = {}
+    pending = {node["name"]: set(node["depends_on"]) | set(node["after"]) for node in nodes}
+    dependents: Dict[str, List[str]] = {node["name"]: [] for node in nodes}
+    followers: Dict[str, List[str]] = {node["name"]: [] for node in nodes}
+    for node in nodes:
+        for dependency in node["depends_on"]:
+            dependents[dependency].append(node["name"])
+        for previous in node["after"]:
+            followers[previous].append(node["name"])
+    nodes_by_name = {node["name"]: node for node in nodes}
+    if progress is not None:
+        for node in nodes:
+            progress.update_command(node["name"], "pending")
+
+    def release_followers(name: str) -> None:
+        for follower in followers[name]:
+            if follower in pending:
+                pending[follower].discard(name)
+
+    def skip_dependents(name: str) -> None:
+        for dependent in dependents[name]:
+            if dependent in pending:
+                del pending[dependent]
+                results[dependent] = {
+                    "status": "skipped",
+                    "returncode": None,
+                    "duration": 0.0,
+                    "error": f"Dependency '{name}' did not succeed",
+                }
+                if progress is not None:
+                    progress.update_command(dependent, "skipped")
+                skip_dependents(dependent)
+                release_followers(dependent)
+
+    running: Dict[Future, str] = {}
+    run_node = propagate(_run_node)
+    with ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix="ccm-command") as executor:
+        while pending or running:
+            if progress is not None and progress.cancelled:
+                for name in list(pending):
+                    del pending[name]
+                    results[name] = {"status": "cancelled", "returncode": None, "duration": 0.0, "error": "Cancelled"}
+                    progress.update_command(name, "cancelled")
+                if not running:
+                    break
+            for name in [name for name, dependencies in pending.items() if not dependencies]:
+                del pending[name]
+                node = nodes_by_name[name]
+                running[executor.submit(run_node, node, cwd, render, cache, progress, should_run)] = name
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                try:
+                    results[name] = future.result()
+                except Exception as e:
+                    results[name] = {"status": "failed", "returncode": None, "duration": 0.0, "error": str(e)}
+                if progress is not None:
+                    progress.update_command(name, results[name]["status"], results[name]["duration"])
+                if results[name]["status"] in ("succeeded", "cached", "unchanged"):
+                    for dependent in dependents[name]:
+                        if dependent in pending:
+                            pending[dependent].discard(name)
+                else:
+                    skip_dependents(name)
+                release_followers(name)
+
+    return [
+        dict(name=node["name"], command=render(node["command"]) if render else node["command"], **results[node["name"]])
+        for node in nodes
+    ]
@@ -1,7 +1,11 @@
+import copy
 import os
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, Iterator, List, Optional
 
-import yaml
+from .filecache import FileCache
+from .registry import InstanceRegistry
+from .serialization import FORMATS, dump_file, load_file
+from .tracing import span
 
 
 class ConfigManager:
@@ -12,17 +16,26 @@ class ConfigManager:
         Initialize the configuration manager.
 
         Args:
-            config_dir: Custom configuration directory path. If None, uses ~/.claude_code
+            config_dir: Custom configuration directory path. If None, uses $CCM_CONFIG_DIR or ~/.claude_code
         """
         if config_dir is None:
-            self.config_dir = os.path.expanduser("~/.claude_code")
+            self.config_dir = os.path.expanduser(os.environ.get("CCM_CONFIG_DIR", "~/.claude_code"))
         else:
             self.config_dir = os.path.expanduser(config_dir)
 
-        self.config_file = os.path.join(self.config_dir, "config.yaml")
+        # config.json takes precedence, so switching config_format to json moves the settings there
+        self.config_file = os.path.join(self.config_dir, "config.json")
+        if not os.path.exists(self.config_file):
+            self.config_file = os.path.join(self.config_dir, "config.yaml")
         self.environments_dir = os.path.join(self.config_dir, "environments")
         self.instances_dir = os.path.join(self.config_dir, "instances")
         self.templates_dir = os.path.join(self.config_dir, "templates")
+        self.registry_file = os.path.join(self.config_dir, "instances.db")
+        self._registry: Optional[InstanceRegistry] = None
+        # (mtime_ns, size) of the config file when it was last read or written, for reload
+        self._config_signature: Optional[tuple] = None
+        # Parsed environment configs and claude.md templates, reused until the file changes
+        self.file_cache = FileCache()
 
         # Ensure directories exist
         os.makedirs(self.config_dir, exist_ok=True)
@@ -36,22 +49,83 @@ class ConfigManager:
     def _load_config(self) -> Dict[str, Any]:
         """Load configuration from file or create default."""
         if os.path.exists(self.config_file):
-            with open(self.config_file, "r") as f:
-                return yaml.safe_load(f) or {}
+            self._config_signature = _file_signature(self.config_file)
+            config = load_file(self.config_file) or {}
+            if not self.config_file.endswith(self._file_extension(config)):
+                # config_format was changed by hand: move the settings to the selected format
+                self._save_config(config)
+            return config
         else:
-            default_config = {"default_work_dir": os.path.expanduser("~/claude_code_work"), "environments": {}}
+            default_config = {
+                "default_work_dir": os.path.expanduser("~/claude_code_work"),
+                "max_parallel_clones": 4,
+                "max_parallel_commands": 4,
+                "mirror_cache_enabled": True,
+                "mirror_cache_max_size_mb": 10240,
+                "environments": {},
+            }
             self._save_config(default_config)
             return default_config
 
     def _save_config(self, config: Dict[str, Any]) -> None:
-        """Save configuration to file."""
-        with open(self.config_file, "w") as f:
-            yaml.dump(config, f)
+        """Save configuration to file, in the format selected by its config_format setting."""
+        config_file = os.path.join(self.config_dir, "config" + self._file_extension(config))
+        dump_file(config, config_file)
+        if config_file != self.config_file:
+            if os.path.exists(self.config_file):
+                os.remove(self.config_file)
+            self.config_file = config_file
+        self._config_signature = _file_signature(config_file)
+
+    def reload(self) -> bool:
+        """
+        Re-read the configuration file if another process changed it since it was last read or written.
+
+        Returns:
+            True if the configuration was re-read
+        """
+        signature = _file_signature(self.config_file)
+        if signature is None or signature == self._config_signature:
+            return False
+        self.config = self._load_config()
+        return True
+
+    @staticmethod
+    def _file_extension(config: Dict[str, Any]) -> str:
+        """Get the file extension of the configured storage format (yaml or json)."""
+        return FORMATS.get(str(config.get("config_format", "yaml")).lower(), FORMATS["yaml"])
+
+    def _environment_files(self, env_name: str) -> List[str]:
+        """Get the possible files of an environment config, in the configured format first."""
+        extensions = sorted(FORMATS.values(), key=lambda extension: extension != self._file_extension(self.config))
+        return [os.path.join(self.environments_dir, f"{env_name}{extension}") for extension in extensions]
+
+    def get_environment_file(self, env_name: str) -> str:
+        """
+        Get the file an environment config is stored in.
+
+        Args:
+            env_name: Name of the environment
+
+        Returns:
+            Path of the existing YAML or JSON file, or of the file to create in the configured format
+        """
+        env_files = self._environment_files(env_name)
+        return next((env_file for env_file in env_files if os.path.exists(env_file)), env_files[0])
 
     def save(self) -> None:
         """Save current configuration."""
         self._save_config(self.config)
 
+    def get_default_work_dir(self) -> str:
+        """
+        Get the directory new instances are created in.
+
+        Returns:
+            Path to the default work directory
+        """
+        return os.path.expanduser(self.config.get("default_work_dir", "~/claude_code_work"))
+
     def get_environment_config(self, env_name: str) -> Optional[Dict[str, Any]]:
         """
         Get configuration for a specific environment.
@@ -62,11 +136,11 @@ class ConfigManager:
         Returns:
             Environment configuration dictionary or None if not found
         """
-        env_file = os.path.join(self.environments_dir, f"{env_name}.yaml")
-        if os.path.exists(env_file):
-            with open(env_file, "r") as f:
-                return yaml.safe_load(f)
-        return None
+        with span("config.load", environment=env_name):
+            env_file = self.get_environment_file(env_name)
+            env_config = self.file_cache.get(env_file, load_file)
+            # Callers may modify the returned config; keep the cached copy pristine
+            return copy.deepcopy(env_config)
 
     def save_environment_config(self, env_name: str, config: Dict[str, Any]) -> None:
         """
@@ -76,11 +150,13 @@ class ConfigManager:
             env_name: Name of the environment
             config: Environment configuration dictionary
         """
-        env_file = os.path.join(self.environments_dir, f"{env_name}.yaml")
-
-        # Use safe_dump to preserve formatting
-        with open(env_file, "w") as f:
-            yaml.safe_dump(config, f, default_flow_style=False)
+        env_file, *other_files = self._environment_files(env_name)
+        dump_file(config, env_file)
+        self.file_cache.invalidate(env_file)
+        for other_file in other_files:
+            if os.path.exists(other_file):
+                os.remove(other_file)
+                self.file_cache.invalidate(other_file)
 
         # Update main config with environment reference
         self.config.setdefault("environments", {})
@@ -102,9 +178,10 @@ class ConfigManager:
         Returns:
             True if deleted, False if not found
         """
-        env_file = os.path.join(self.environments_dir, f"{env_name}.yaml")
+        env_file = self.get_environment_file(env_name)
         if os.path.exists(env_file):
             os.remove(env_file)
+            self.file_cache.invalidate(env_file)
 
             # Remove from main config
             if env_name in self.config.get("environments", {}):
@@ -122,9 +199,19 @@ class ConfigManager:
         """
         return self.config.get("environments", {})
 
+    @property
+    def registry(self) -> InstanceRegistry:
+        """Instance registry, opened (and migrated from per-instance YAML files) on first use."""
+        if self._registry is None:
+            self._registry = InstanceRegistry(self.registry_file, legacy_dir=self.instances_dir)
+        return self._registry
+
     def get_instance_file(self, instance_id: str) -> str:
         """
-        Get the path to an instance file.
+        Get the path to a legacy per-instance YAML file.
+
+        Instances are stored in the registry database; these files are only read to
+        migrate older configuration directories.
 
         Args:
             instance_id: Instance identifier
@@ -142,9 +229,7 @@ class ConfigManager:
             instance_id: Instance identifier
             instance_data: Instance data dictionary
         """
-        instance_file = self.get_instance_file(instance_id)
-        with open(instance_file, "w") as f:
-            yaml.dump(instance_data, f)
+        self.registry.save(instance_id, instance_data)
 
     def get_instance(self, instance_id: str) -> Optional[Dict[str, Any]]:
         """
@@ -156,11 +241,7 @@ class ConfigManager:
         Returns:
             Instance data dictionary or None if not found
         """
-        instance_file = self.get_instance_file(instance_id)
-        if os.path.exists(instance_file):
-            with open(instance_file, "r") as f:
-                return yaml.safe_load(f)
-        return None
+        return self.registry.get(instance_id)
 
     def delete_instance(self, instance_id: str) -> bool:
         """
@@ -172,11 +253,19 @@ class ConfigManager:
         Returns:
             True if deleted, False if not found
         """
-        instance_file = self.get_instance_file(instance_id)
-        if os.path.exists(instance_file):
-            os.remove(instance_file)
-            return True
-        return False
+        return self.registry.delete(instance_id)
+
+    def delete_instances(self, instance_ids: List[str]) -> int:
+        """
+        Delete the data of several instances at once.
+
+        Args:
+            instance_ids: Instance identifiers
+
+        Returns:
+            Number of instances deleted
+        """
+        return self.registry.delete_many(instance_ids)
 
     def list_instances(self, env_name: Optional[str] = None) -> List[Dict[str, Any]]:
         """
@@ -188,15 +277,32 @@ class ConfigManager:
         Returns:
             List of instance data dictionaries
         """
-        instances = []
-        for filename in os.listdir(self.instances_dir):
-            if filename.endswith(".yaml"):
-                instance_file = os.path.join(self.instances_dir, filename)
-                with open(instance_file, "r") as f:
-                    instance_data = yaml.safe_load(f)
-                    if env_name is None or instance_data.get("environment") == env_name:
-                        instances.append(instance_data)
-        return instances
+        return self.registry.list(env_name)
+
+    def query_instances(
+        self,
+        env_name: Optional[str] = None,
+        since: Optional[str] = None,
+        before: Optional[str] = None,
+        order: str = "created",
+        limit: Optional[int] = None,
+        offset: int = 0,
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Iterate over the id, environment, path and created_at of matching instances.
+
+        Args:
+            env_name: Optional environment name to filter by
+            since: Optional ISO time; only instances created at or after it
+            before: Optional ISO time; only instances created before it
+            order: "created" or "env"
+            limit: Maximum number of instances
+            offset: Number of matching instances to skip
+
+        Returns:
+            Iterator reading instances from the registry as it is consumed
+        """
+        return self.registry.query(env_name, since, before, order, limit, offset)
 
     def save_claude_md_template(self, env_name: str, content: str) -> str:
         """
@@ -212,6 +318,7 @@ class ConfigManager:
         template_path = os.path.join(self.templates_dir, f"{env_name}.md")
         with open(template_path, "w") as f:
             f.write(content)
+        self.file_cache.invalidate(template_path)
         return template_path
 
     def get_claude_md_template(self, env_name: str) -> Optional[str]:
@@ -225,7 +332,19 @@ class ConfigManager:
             Template content or None if not found
         """
         template_path = os.path.join(self.templates_dir, f"{env_name}.md")
-        if os.path.exists(template_path):
-            with open(template_path, "r") as f:
-                return f.read()
+        return self.file_cache.get(template_path, _read_text)
+
+
+def _read_text(path: str) -> str:
+    """Read a text file."""
+    with open(path, "r") as f:
+        return f.read()
+
+
+def _file_signature(path: str) -> Optional[tuple]:
+    """Get the (mtime_ns, size) of a file, or None if it does not exist."""
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
         return None
+    return (stat.st_mtime_ns, stat.st_size)
@@ -1,15 +1,21 @@
 """
 Core functionality for Claude Code Manager.
 Provides high-level operations for the CLI interface.
+
+inquirer is imported inside the interactive methods so non-interactive commands start fast,
+and the environment manager is only created when a command needs more than the
+configuration and the instance registry.
 """
 
+import json
+import math
 import os
-from typing import Optional
-
-import inquirer
+import sys
+from datetime import datetime
+from functools import cached_property
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
 
-from .config import ConfigManager
-from .environment import EnvironmentManager
+from .checkout import SUBMODULE_POLICIES
 from .utils import (
     format_time_ago,
     open_editor,
@@ -21,6 +27,10 @@ from .utils import (
     with_spinner,
 )
 
+if TYPE_CHECKING:
+    from .daemon.client import DaemonClient
+    from .environment import EnvironmentManager
+
 
 class ClaudeCodeManager:
     """
@@ -28,15 +38,29 @@ class ClaudeCodeManager:
     Provides high-level operations for the CLI interface.
     """
 
-    def __init__(self, config_dir: Optional[str] = None):
+    def __init__(self, config_dir: Optional[str] = None, daemon: Optional["DaemonClient"] = None):
         """
         Initialize the Claude Code Manager.
 
         Args:
             config_dir: Custom configuration directory path
+            daemon: Connection to a running ccm daemon; when given, the config and environment
+                managers are the daemon's and only prompts and output happen in this process
         """
-        self.config_manager = ConfigManager(config_dir)
-        self.env_manager = EnvironmentManager(self.config_manager)
+        if daemon is not None:
+            self.config_manager = daemon.remote("config_manager")
+            self.env_manager = daemon.remote("env_manager")
+        else:
+            from .config import ConfigManager
+
+            self.config_manager = ConfigManager(config_dir)
+
+    @cached_property
+    def env_manager(self) -> "EnvironmentManager":
+        """Environment manager of this process, created on first use."""
+        from .environment import EnvironmentManager
+
+        return EnvironmentManager(self.config_manager)
 
     def setup_environment(self, env_name: Optional[str] = None) -> bool:
         """
@@ -48,6 +72,8 @@ class ClaudeCodeManager:
         Returns:
             True if successful, False otherwise
         """
+        import inquirer
+
         # If environment name is not provided, ask for it
         if env_name is None:
             questions = [
@@ -94,6 +120,13 @@ class ClaudeCodeManager:
                 inquirer.Text("url", message="Repository URL:", validate=lambda _, x: len(x) > 0),
                 inquirer.Text("path", message="Local path (relative to work dir, leave empty for root):"),
                 inquirer.Text("branch", message="Branch (leave empty for default):"),
+                inquirer.Text(
+                    "filter", message="Partial clone filter, e.g. blob:none (leave empty to fetch everything):"
+                ),
+                inquirer.Text(
+                    "sparse_paths", message="Directories to check out, comma-separated (leave empty for all):"
+                ),
+                inquirer.List("submodules", message="Submodules:", choices=SUBMODULE_POLICIES, default="none"),
             ]
             repo_answers = inquirer.prompt(questions)
             if not repo_answers:
@@ -104,11 +137,22 @@ class ClaudeCodeManager:
                 "path": repo_answers["path"] or ".",
                 "branch": repo_answers["branch"] or None,
             }
+            # Only write the clone options that differ from a full clone
+            if repo_answers["filter"]:
+                repo_config["filter"] = repo_answers["filter"].strip()
+            sparse_paths = [path.strip() for path in repo_answers["sparse_paths"].split(",") if path.strip()]
+            if sparse_paths:
+                repo_config["sparse_paths"] = sparse_paths
+            if repo_answers["submodules"] != "none":
+                repo_config["submodules"] = repo_answers["submodules"]
             env_config["repositories"].append(repo_config)
 
         # Configure scaffold commands
         print_info("Configure commands to run during scaffolding:")
-        print_info("You can use ${WORK_DIR} as a placeholder for the work directory")
+        print_info(
+            "You can use placeholders such as ${WORK_DIR}, ${INSTANCE_ID}, ${ENV_NAME} and "
+            "${REPO_<PATH>_PATH} / ${REPO_<PATH>_SHA} (see Templates in the README)"
+        )
         while True:
             questions = [inquirer.Confirm("add_command", message="Add a scaffold command?", default=True)]
             answers = inquirer.prompt(questions)
@@ -163,11 +207,19 @@ class ClaudeCodeManager:
             print_error(f"Environment '{env_name}' does not exist")
             return False
 
+        # The daemon resolves relative paths against its own working directory
+        if work_dir:
+            work_dir = os.path.abspath(os.path.expanduser(work_dir))
+
         # Scaffold environment
         print_info(f"Scaffolding environment '{env_name}'...")
         print("GOT HERE 2")
         instance_dir = with_spinner(
-            f"Scaffolding environment '{env_name}'...", self.env_manager.scaffold_environment, env_name, work_dir
+            f"Scaffolding environment '{env_name}'...",
+            self.env_manager.scaffold_environment,
+            env_name,
+            work_dir,
+            env_config=env_config,
         )
         print("GOT HERE 3")
         if not instance_dir:
@@ -177,6 +229,61 @@ class ClaudeCodeManager:
         print_success(f"Environment '{env_name}' scaffolded successfully at: {instance_dir}")
         return True
 
+    def scaffold_many(
+        self, env_name: str, count: int, jobs: Optional[int] = None, work_dir: Optional[str] = None
+    ) -> bool:
+        """
+        Scaffold several instances of an environment concurrently.
+
+        Args:
+            env_name: Name of the environment
+            count: Number of instances to create
+            jobs: Maximum number of instances built at once
+            work_dir: Optional directory to create the instances in
+
+        Returns:
+            True if every instance was scaffolded successfully, False otherwise
+        """
+        from .environment import DEFAULT_MAX_PARALLEL_SCAFFOLDS
+
+        if work_dir:
+            work_dir = os.path.abspath(os.path.expanduser(work_dir))
+        results = with_spinner(
+            f"Scaffolding {count} instances of '{env_name}'...",
+            self.env_manager.scaffold_many,
+            env_name,
+            count,
+            jobs or DEFAULT_MAX_PARALLEL_SCAFFOLDS,
+            work_dir,
+        )
+        if results is None:
+            print_error(f"Environment '{env_name}' does not exist")
+            return False
+
+        columns = [
+            {"key": "id", "header": "ID", "style": "cyan"},
+            {"key": "path", "header": "Path", "style": "blue"},
+            {"key": "status", "header": "Status", "style": "bold"},
+            {"key": "error", "header": "Error", "style": "red"},
+        ]
+        table_data = [
+            {
+                "id": result["id"] or "",
+                "path": result["path"] or "",
+                "status": result["status"],
+                "error": result["error"] or "",
+            }
+            for result in results
+        ]
+        print_table(f"Scaffolded Instances of '{env_name}'", table_data, columns)
+
+        failed = [result for result in results if result["status"] != "succeeded"]
+        if failed:
+            print_error(f"{len(failed)} of {count} instances of '{env_name}' failed")
+            return False
+        print_success(f"{count} instances of '{env_name}' scaffolded successfully")
+        return True
+
     def choose_environment(self, env_name: Optional[str] = None, instance_id: Optional[str] = None) -> bool:
         """
         Choose an environment instance to work with.
@@ -188,6 +295,8 @@ class ClaudeCodeManager:
         Returns:
             True if successful, False otherwise
         """
+        import inquirer
+
         # If both env_name and instance_id are None, list all environments
         if env_name is None and instance_id is None:
             environments = self.env_manager.list_environments()
@@ -302,6 +411,8 @@ class ClaudeCodeManager:
         Returns:
             True if deleted, False otherwise
         """
+        import inquirer
+
         # If instance_id is None, list instances to select from
         if instance_id is None:
             instances = self.env_manager.list_instances(env_name)
@@ -353,6 +464,82 @@ class ClaudeCodeManager:
 
         return success
 
+    def refresh_instance(self, instance_id: Optional[str] = None, env_name: Optional[str] = None) -> bool:
+        """
+        Update an environment instance in place from its repositories and environment config.
+
+        Args:
+            instance_id: Optional instance identifier
+            env_name: Optional environment name to filter instances
+
+        Returns:
+            True if every repository and re-run command succeeded, False otherwise
+        """
+        if instance_id is None:
+            import inquirer
+
+            instances = self.env_manager.list_instances(env_name)
+            if not instances:
+                print_error("No instances found")
+                return False
+
+            formatted_instances = []
+            for instance in instances:
+                env = instance.get("environment", "")
+                created_at = format_time_ago(instance.get("created_at", ""))
+                choice_text = f"{instance.get('id', '')[:8]} - {env} - {instance.get('path', '')} ({created_at})"
+                formatted_instances.append((choice_text, instance.get("id", "")))
+
+            questions = [
+                inquirer.List("instance_id", message="Select an instance to refresh:", choices=formatted_instances)
+            ]
+            answers = inquirer.prompt(questions)
+            if not answers:
+                return False
+            instance_id = answers["instance_id"]
+
+        if not self.env_manager.get_instance(instance_id):
+            print_error(f"Instance not found: {instance_id}")
+            return False
+
+        report = with_spinner(
+            f"Refreshing instance {instance_id[:8]}...", self.env_manager.refresh_instance, instance_id
+        )
+        if report is None:
+            print_error(f"Failed to refresh instance {instance_id[:8]}")
+            return False
+
+        repository_data = []
+        for result in report["repositories"]:
+            before = (result["before"] or "")[:8]
+            after = (result["after"] or "")[:8]
+            repository_data.append(
+                {
+                    "path": os.path.relpath(result["path"], report["path"]),
+                    "status": result["status"],
+                    "commit": f"{before} -> {after}" if result["status"] == "updated" else after,
+                }
+            )
+        columns = [
+            {"key": "path", "header": "Repository", "style": "bold"},
+            {"key": "status", "header": "Status"},
+            {"key": "commit", "header": "Commit"},
+        ]
+        print_table(f"Refreshed instance {instance_id[:8]}", repository_data, columns)
+
+        if report["claude_md"] == "updated":
+            print_info("claude.md updated from the changed template")
+        rerun = [result for result in report["commands"] if result["status"] != "unchanged"]
+        print_info(f"Re-ran {len(rerun)} of {len(report['commands'])} scaffold command(s)")
+
+        failed = [result for result in report["repositories"] if result["status"] == "failed"]
+        failed += [result for result in rerun if result["status"] not in ("succeeded", "cached")]
+        if failed:
+            print_warning("Instance refreshed with errors")
+            return False
+        print_success("Instance refreshed successfully")
+        return True
+
     def list_env_types(self) -> bool:
         """
         List all configured environments.
@@ -360,7 +547,7 @@ class ClaudeCodeManager:
         Returns:
             True if environments exist, False otherwise
         """
-        environments = self.env_manager.list_environments()
+        environments = self.config_manager.list_environments()
         if not environments:
             print_info("No environments configured")
             return False
@@ -380,35 +567,77 @@ class ClaudeCodeManager:
         print_table("Configured Environments", env_data, columns)
         return True
 
-    def list_instances(self, env_name: Optional[str] = None) -> bool:
+    def list_instances(
+        self,
+        env_name: Optional[str] = None,
+        limit: Optional[int] = None,
+        offset: int = 0,
+        sort: str = "created",
+        since: Optional[str] = None,
+        before: Optional[str] = None,
+        output_format: str = "table",
+    ) -> bool:
         """
-        List all environment instances.
+        List environment instances.
+
+        The plain (tab-separated) and ndjson formats print each instance as soon as it is
+        read from the registry, with full IDs and ISO timestamps, and print nothing else.
 
         Args:
             env_name: Optional environment name to filter instances
+            limit: Maximum number of instances to show
+            offset: Number of matching instances to skip
+            sort: "created", "env" or "size" (largest first)
+            since: Only instances created at or after this ISO date/time or age (e.g. 3d)
+            before: Only instances created before this ISO date/time or age
+            output_format: "table", "plain" or "ndjson"
 
         Returns:
             True if instances exist, False otherwise
         """
-        instances = self.env_manager.list_instances(env_name)
-        if not instances:
-            if env_name:
-                print_info(f"No instances found for environment '{env_name}'")
-            else:
-                print_info("No instances found")
+        from .registry import parse_time_bound
+
+        try:
+            since = parse_time_bound(since) if since else None
+            before = parse_time_bound(before) if before else None
+        except ValueError as e:
+            print_error(str(e))
             return False
+        if sort == "size":
+            instances = self.env_manager.query_instances(env_name, since, before, sort, limit, offset)
+        else:
+            # Other orders are streamed straight from the registry
+            instances = self.config_manager.query_instances(env_name, since, before, sort, limit, offset)
+
+        if output_format != "table":
+            count = 0
+            for instance in instances:
+                if output_format == "ndjson":
+                    line = json.dumps(instance)
+                else:
+                    line = "\t".join(str(value) for value in instance.values())
+                sys.stdout.write(line + "\n")
+                count += 1
+            return count > 0
 
         # Format data for table
         instance_data = []
         for instance in instances:
-            instance_data.append(
-                {
-                    "id": instance.get("id", "")[:8],  # Show first 8 chars of UUID
-                    "environment": instance.get("environment", ""),
-                    "path": instance.get("path", ""),
-                    "created_at": format_time_ago(instance.get("created_at", "")),
-                }
-            )
+            row = {
+                "id": instance.get("id", "")[:8],  # Show first 8 chars of UUID
+                "environment": instance.get("environment", ""),
+                "path": instance.get("path", ""),
+                "created_at": format_time_ago(instance.get("created_at", "")),
+            }
+            if "size" in instance:
+                row["size"] = f"{instance['size'] / (1024 * 1024):.1f} MB"
+            instance_data.append(row)
+        if not instance_data:
+            if env_name:
+                print_info(f"No instances found for environment '{env_name}'")
+            else:
+                print_info("No instances found")
+            return False
 
         # Print table
         columns = [
@@ -417,5 +646,299 @@ class ClaudeCodeManager:
             {"key": "path", "header": "Path"},
             {"key": "created_at", "header": "Created", "style": "italic"},
         ]
+        if sort == "size":
+            columns.append({"key": "size", "header": "Size"})
         print_table("Environment Instances", instance_data, columns)
         return True
+
+    def show_cache(self, prune: bool = False, clear: bool = False, max_size_mb: Optional[int] = None) -> bool:
+        """
+        Show the repository mirror cache and the command output cache, optionally pruning them.
+
+        Args:
+            prune: Evict least recently used entries until each cache fits its size limit
+            clear: Remove all cached mirrors and command outputs
+            max_size_mb: Size limit to prune each cache to instead of the configured one
+
+        Returns:
+            True if successful, False otherwise
+        """
+        mirror_cache = self.env_manager.mirror_cache
+        command_cache = self.env_manager.command_cache
+        if clear or prune:
+            max_size_bytes = max_size_mb * 1024 * 1024 if max_size_mb is not None else None
+            for label, cache in (("mirror(s)", mirror_cache), ("command output(s)", command_cache)):
+                evicted = cache.clear() if clear else cache.prune(max_size_bytes)
+                freed_mb = sum(entry["size"] for entry in evicted) / (1024 * 1024)
+                print_success(f"Removed {len(evicted)} {label}, freed {freed_mb:.1f} MB")
+
+        mirrors = mirror_cache.list_mirrors()
+        if mirrors:
+            mirror_data = []
+            for mirror in mirrors:
+                last_used = datetime.fromtimestamp(mirror["last_used"]).strftime("%Y-%m-%dT%H:%M:%S.%f")
+                mirror_data.append(
+                    {
+                        "url": mirror["url"],
+                        "size": f"{mirror['size'] / (1024 * 1024):.1f} MB",
+                        "last_used": format_time_ago(last_used),
+                    }
+                )
+
+            total_mb = sum(mirror["size"] for mirror in mirrors) / (1024 * 1024)
+            limit_mb = mirror_cache.max_size_bytes / (1024 * 1024)
+            columns = [
+                {"key": "url", "header": "Repository", "style": "bold"},
+                {"key": "size", "header": "Size"},
+                {"key": "last_used", "header": "Last Used", "style": "italic"},
+            ]
+            print_table(f"Repository Mirrors ({total_mb:.1f} / {limit_mb:.0f} MB)", mirror_data, columns)
+        else:
+            print_info("Mirror cache is empty")
+
+        entries = command_cache.list_entries()
+        total_mb = sum(entry["size"] for entry in entries) / (1024 * 1024)
+        limit_mb = command_cache.max_size_bytes / (1024 * 1024)
+        print_info(
+            f"Command output cache: {len(entries)} entr{'y' if len(entries) == 1 else 'ies'}, "
+            f"{total_mb:.1f} / {limit_mb:.0f} MB"
+        )
+        return True
+
+    def deduplicate(self, instance_id: Optional[str] = None, all_instances: bool = False, stats: bool = False) -> bool:
+        """
+        Link the files of existing instances to the dedupe store and show how much space it saves.
+
+        Args:
+            instance_id: Instance to deduplicate
+            all_instances: Deduplicate every instance not deduplicated yet
+            stats: Show the store's statistics after deduplicating; always shown when no
+                instance is deduplicated
+
+        Returns:
+            True if successful, False otherwise
+        """
+        dedupe = self.env_manager.dedupe
+        if instance_id or all_instances:
+            if instance_id:
+                instance = self.env_manager.get_instance(instance_id)
+                if not instance:
+                    print_error(f"Instance not found: {instance_id}")
+                    return False
+                instances = [instance]
+            else:
+                instances = self.env_manager.list_instances()
+
+            files = bytes_saved = missing = 0
+            for instance in instances:
+                if not os.path.isdir(instance.get("path", "")):
+                    missing += 1
+                    continue
+                report = with_spinner(
+                    f"Deduplicating instance {instance['id'][:8]}...", dedupe.dedupe, instance["id"], instance["path"]
+                )
+                files += report["files"]
+                bytes_saved += report["bytes_saved"]
+            if missing:
+                print_warning(f"Skipped {missing} instance(s) whose directory does not exist (see ccm gc)")
+            print_success(
+                f"Deduplicated {files} file(s) of {len(instances) - missing} instance(s), "
+                f"saving {bytes_saved / (1024 * 1024):.1f} MB"
+            )
+            if not stats:
+                return True
+
+        store = dedupe.stats()
+        if not store["blobs"]:
+            state = "enabled" if dedupe.enabled else "disabled (set dedupe_enabled: true in config.yaml)"
+            print_info(f"Dedupe store is empty; deduplication is {state}")
+            return True
+        stats_data = [
+            {"metric": "Instances", "value": str(store["instances"])},
+            {"metric": "Files", "value": str(store["files"])},
+            {"metric": "Distinct blobs", "value": str(store["blobs"])},
+            {"metric": "Logical size", "value": f"{store['logical_bytes'] / (1024 * 1024):.1f} MB"},
+            {"metric": "Stored size", "value": f"{store['stored_bytes'] / (1024 * 1024):.1f} MB"},
+            {"metric": "Saved", "value": f"{store['bytes_saved'] / (1024 * 1024):.1f} MB"},
+        ]
+        columns = [
+            {"key": "metric", "header": "Metric", "style": "bold"},
+            {"key": "value", "header": "Value"},
+        ]
+        print_table("Dedupe Store", stats_data, columns)
+        return True
+
+    def show_pool(self) -> bool:
+        """
+        Show the warm pool status of every pooled environment.
+
+        Returns:
+            True if any environment has a pool, False otherwise
+        """
+        status = self.env_manager.pool.status()
+        if not status:
+            print_info("No environments have a pool configured (set pool.size in the environment YAML)")
+            return False
+
+        pool_data = []
+        for entry in status:
+            pool_data.append(
+                {
+                    "environment": entry["environment"],
+                    "ready": f"{entry['ready']} / {entry['size']}",
+                    "max_age": f"{entry['max_age_hours']:g}h",
+                    "oldest": format_time_ago(entry["oldest"]) if entry["oldest"] else "",
+                }
+            )
+
+        columns = [
+            {"key": "environment", "header": "Environment", "style": "bold"},
+            {"key": "ready", "header": "Ready"},
+            {"key": "max_age", "header": "Max Age"},
+            {"key": "oldest", "header": "Oldest", "style": "italic"},
+        ]
+        print_table("Instance Pools", pool_data, columns)
+        return True
+
+    def fill_pool(self, env_name: Optional[str] = None) -> bool:
+        """
+        Build ready instances until the pool is full.
+
+        Args:
+            env_name: Optional environment name; fills every pooled environment if None
+
+        Returns:
+            True if successful, False otherwise
+        """
+        if env_name is None:
+            env_names = [entry["environment"] for entry in self.env_manager.pool.status()]
+        else:
+            if not self.config_manager.get_environment_config(env_name):
+                print_error(f"Environment '{env_name}' does not exist")
+                return False
+            env_names = [env_name]
+
+        for name in env_names:
+            built = with_spinner(f"Filling pool for '{name}'...", self.env_manager.pool.fill, name)
+            print_success(f"Built {built} pooled instance(s) for '{name}'")
+        return True
+
+    def drain_pool(self, env_name: Optional[str] = None) -> bool:
+        """
+        Remove ready instances from the pool.
+
+        Args:
+            env_name: Optional environment name; drains every pooled environment if None
+
+        Returns:
+            True if successful, False otherwise
+        """
+        if env_name is None:
+            env_names = [entry["environment"] for entry in self.env_manager.pool.status()]
+        else:
+            env_names = [env_name]
+
+        for name in env_names:
+            removed = self.env_manager.pool.drain(name)
+            print_success(f"Removed {removed} pooled instance(s) for '{name}'")
+        return True
+
+    def collect_garbage(self, jobs: Optional[int] = None, dry_run: bool = False) -> bool:
+        """
+        Remove expired, excess and orphaned instances and empty the trash.
+
+        Args:
+            jobs: Maximum number of directories removed at once
+            dry_run: Only report what would be removed and how many bytes it would free
+
+        Returns:
+            True if successful, False otherwise
+        """
+        from .garbage import DEFAULT_MAX_PARALLEL_DELETES, REASONS
+
+        jobs = jobs or DEFAULT_MAX_PARALLEL_DELETES
+        garbage = self.env_manager.garbage
+        candidates = with_spinner("Looking for instances to collect...", garbage.plan)
+
+        if dry_run:
+            candidates = with_spinner("Measuring reclaimable space...", garbage.measure, candidates, jobs)
+            summary_data = []
+            for reason, description in REASONS.items():
+                matching = [candidate for candidate in candidates if candidate["reason"] == reason]
+                summary_data.append(
+                    {
+                        "reason": description,
+                        "count": str(len(matching)),
+                        "size": f"{sum(candidate['size'] for candidate in matching) / (1024 * 1024):.1f} MB",
+                    }
+                )
+            columns = [
+                {"key": "reason", "header": "Reason", "style": "bold"},
+                {"key": "count", "header": "Count"},
+                {"key": "size", "header": "Reclaimable"},
+            ]
+            print_table("Garbage Collection (dry run)", summary_data, columns)
+            total_mb = sum(candidate["size"] for candidate in candidates) / (1024 * 1024)
+            print_info(f"{len(candidates)} item(s) would be removed, freeing {total_mb:.1f} MB")
+            return True
+
+        removed = with_spinner("Removing instances...", garbage.collect, candidates, jobs)
+        for reason, description in REASONS.items():
+            count = sum(1 for candidate in candidates if candidate["reason"] == reason)
+            if count:
+                print_info(f"{description}: {count}")
+        print_success(f"Removed {removed} instance(s) and emptied the trash")
+        return True
+
+    def show_stats(self, env_name: Optional[str] = None) -> bool:
+        """
+        Show p50/p95/max scaffold times per phase, repository and command across past scaffolds.
+
+        Args:
+            env_name: Optional environment name to filter by
+
+        Returns:
+            True if there is any history, False otherwise
+        """
+        history = self.config_manager.registry.timing_history(env_name)
+        if not history:
+            print_info("No scaffold timings recorded yet")
+            return False
+
+        durations: Dict[Tuple[str, str], List[float]] = {}
+        for row in history:
+            durations.setdefault((row["kind"], row["name"]), []).append(row["duration"])
+
+        # Group by kind; within a kind keep the order scaffolds recorded them in (phases in execution order)
+        kind_order = {"total": 0, "phase": 1, "repository": 2, "command": 3}
+        stats_data = []
+        for (kind, name), values in sorted(durations.items(), key=lambda item: kind_order.get(item[0][0], 4)):
+            values.sort()
+            stats_data.append(
+                {
+                    "kind": kind,
+                    "name": name,
+                    "count": str(len(values)),
+                    "p50": f"{_percentile(values, 0.50):.2f}s",
+                    "p95": f"{_percentile(values, 0.95):.2f}s",
+                    "max": f"{values[-1]:.2f}s",
+                }
+            )
+
+        columns = [
+            {"key": "kind", "header": "Kind", "style": "bold"},
+            {"key": "name", "header": "Name", "style": "cyan"},
+            {"key": "count", "header": "Count"},
+            {"key": "p50", "header": "p50"},
+            {"key": "p95", "header": "p95"},
+            {"key": "max", "header": "Max"},
+        ]
+        title = f"Scaffold Timings for '{env_name}'" if env_name else "Scaffold Timings"
+        print_table(title, stats_data, columns)
+        return True
+
+
+def _percentile(sorted_values: List[float], fraction: float) -> float:
+    """Get a nearest-rank percentile of a sorted, non-empty list."""
+    index = max(0, math.ceil(fraction * len(sorted_values)) - 1)
+    return sorted_values[index]
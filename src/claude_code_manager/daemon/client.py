@@ -0,0 +1,286 @@
+"""
+Client of the ccm daemon (ccmd).
+
+The daemon serves the methods of its ConfigManager and EnvironmentManager over a Unix
+socket in the configuration directory. Each request and response is one JSON object
+per line:
+
+- request: ``{"id": 1, "call": "env_manager.get_instance", "args": [...], "kwargs": {...}}``
+- response: ``{"id": 1, "result": ...}`` or ``{"id": 1, "error": {"type": ..., "message": ...}}``
+- a call returning an iterator is answered with one ``{"id": 1, "item": ...}`` line per
+  item followed by ``{"id": 1, "end": true}``
+- scaffolds and refreshes (POOLED_CALLS) are sent with the client's environment under
+  ``env``, which their scaffold commands run with; what they print, including the output of
+  their commands, arrives as ``{"id": 1, "output": "..."}`` lines before the response and
+  is written to the client's stdout
+
+This module only uses the standard library, so connecting to a running daemon
+costs the CLI no more than a socket round trip; without a daemon socket it does not
+even import socket.
+"""
+
+import json
+import os
+import sys
+import threading
+from typing import TYPE_CHECKING, Any, Dict, Iterator, Optional, Set
+
+from .. import __version__
+
+if TYPE_CHECKING:
+    import socket
+
+SOCKET_NAME = "ccmd.sock"
+# Set to any non-empty value to make ccm ignore a running daemon
+NO_DAEMON_ENV = "CCM_NO_DAEMON"
+CONNECT_TIMEOUT_SECONDS = 1.0
+
+# Members served by the daemon, by object path; names not listed here are refused
+EXPORTS: Dict[str, Set[str]] = {
+    "config_manager": {"get_environment_config", "list_environments", "query_instances"},
+    "config_manager.registry": {"timing_history"},
+    "env_manager": {
+        "create_environment_config",
+        "scaffold_environment",
+        "scaffold_many",
+        "refresh_instance",
+        "list_environments",
+        "list_instances",
+        "query_instances",
+        "get_instance",
+        "delete_instance",
+    },
+    "env_manager.pool": {"status", "fill", "drain"},
+    "env_manager.mirror_cache": {"list_mirrors", "prune", "clear", "max_size_bytes"},
+    "env_manager.command_cache": {"list_entries", "prune", "clear", "max_size_bytes"},
+    "env_manager.garbage": {"plan", "measure", "collect"},
+    "env_manager.dedupe": {"dedupe", "stats", "enabled"},
+}
+# Calls that scaffold; the daemon runs them on its worker pool, with the client's environment and output
+POOLED_CALLS = {
+    "env_manager.scaffold_environment",
+    "env_manager.scaffold_many",
+    "env_manager.refresh_instance",
+    "env_manager.pool.fill",
+    "env_manager.dedupe.dedupe",
+}
+# Listing calls, whose results are printed as they arrive rather than once all were received
+STREAMED_CALLS = {
+    "config_manager.query_instances",
+    "env_manager.query_instances",
+}
+# Exported members that are values rather than methods; reading one is a request
+ATTRIBUTES = {
+    "env_manager.mirror_cache.max_size_bytes",
+    "env_manager.command_cache.max_size_bytes",
+    "env_manager.dedupe.enabled",
+}
+
+
+class DaemonError(Exception):
+    """An exception raised by the daemon while serving a call."""
+
+    def __init__(self, error_type: str, message: str):
+        """
+        Initialize the error.
+
+        Args:
+            error_type: Class name of the exception raised in the daemon
+            message: Its message
+        """
+        super().__init__(message)
+        self.error_type = error_type
+
+
+def default_socket_path(config_dir: Optional[str] = None) -> str:
+    """
+    Get the socket the daemon of a configuration directory listens on.
+
+    Args:
+        config_dir: Configuration directory; defaults to $CCM_CONFIG_DIR or ~/.claude_code,
+            like ConfigManager
+
+    Returns:
+        Path of the socket
+    """
+    config_dir = config_dir or os.environ.get("CCM_CONFIG_DIR", "~/.claude_code")
+    return os.path.join(os.path.expanduser(config_dir), SOCKET_NAME)
+
+
+class DaemonClient:
+    """Connection to a running daemon; calls are sent one at a time."""
+
+    def __init__(self, sock: "socket.socket"):
+        """
+        Initialize the client.
+
+        Args:
+            sock: Socket connected to the daemon
+        """
+        self._socket = sock
+        self._reader = sock.makefile("r", encoding="utf-8")
+        self._lock = threading.Lock()
+        self._next_id = 1
+
+    def close(self) -> None:
+        """Close the connection."""
+        self._reader.close()
+        self._socket.close()
+
+    def remote(self, path: str) -> "RemoteObject":
+        """
+        Get a stand-in for one of the daemon's objects.
+
+        Args:
+            path: Object path, e.g. ``env_manager``
+
+        Returns:
+            Object whose exported methods are called in the daemon
+        """
+        return RemoteObject(self, path)
+
+    def call(self, call: str, *args: Any, **kwargs: Any) -> Any:
+        """
+        Call a method of the daemon, or read an exported attribute.
+
+        Args:
+            call: Dotted path of the method, e.g. ``env_manager.get_instance``, or ``ping``
+            *args: Positional arguments
+            **kwargs: Keyword arguments
+
+        Returns:
+            The return value; an iterator for methods returning one
+
+        Raises:
+            DaemonError: If the call raised an exception in the daemon
+            ConnectionError: If the daemon went away
+        """
+        responses = list(self._exchange(call, args, kwargs))
+        last = responses[-1]
+        if "error" in last:
+            raise DaemonError(last["error"]["type"], last["error"]["message"])
+        if "end" in last:
+            return iter([response["item"] for response in responses[:-1]])
+        return last.get("result")
+
+    def stream(self, call: str, *args: Any, **kwargs: Any) -> Iterator[Any]:
+        """
+        Call a method returning an iterator and yield its items as they arrive.
+
+        Stopping early closes the connection, since the rest of the stream is still in flight.
+
+        Args:
+            call: Dotted path of the method
+            *args: Positional arguments
+            **kwargs: Keyword arguments
+
+        Yields:
+            The items of the returned iterator, or the single return value of other methods
+
+        Raises:
+            DaemonError: If the call raised an exception in the daemon
+        """
+        for response in self._exchange(call, args, kwargs):
+            if "error" in response:
+                raise DaemonError(response["error"]["type"], response["error"]["message"])
+            if "item" in response:
+                yield response["item"]
+            elif "result" in response:
+                yield response["result"]
+
+    def _exchange(self, call: str, args: tuple, kwargs: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+        """Send a request and yield its response lines, up to the final one."""
+        with self._lock:
+            request = {"id": self._next_id, "call": call, "args": list(args), "kwargs": kwargs}
+            if call in POOLED_CALLS:
+                request["env"] = dict(os.environ)
+            self._next_id += 1
+            self._socket.sendall((json.dumps(request, default=str) + "\n").encode("utf-8"))
+            finished = False
+            try:
+                while not finished:
+                    response = self._receive()
+                    if "output" in response:
+                        sys.stdout.write(response["output"])
+                        sys.stdout.flush()
+                        continue
+                    finished = "item" not in response
+                    yield response
+            finally:
+                if not finished:
+                    # Stopped in the middle of a stream, whose remaining lines are still in flight
+                    self.close()
+
+    def _receive(self) -> Dict[str, Any]:
+        """Read one response line."""
+        line = self._reader.readline()
+        if not line:
+            raise ConnectionError("The ccm daemon closed the connection")
+        return json.loads(line)
+
+
+class RemoteObject:
+    """Stand-in for a manager object of the daemon; its exported methods are called remotely."""
+
+    def __init__(self, client: DaemonClient, path: str):
+        """
+        Initialize the stand-in.
+
+        Args:
+            client: Connection to the daemon
+            path: Object path in EXPORTS
+        """
+        self._client = client
+        self._path = path
+
+    def __getattr__(self, name: str) -> Any:
+        path = f"{self._path}.{name}"
+        if path in EXPORTS:
+            return RemoteObject(self._client, path)
+        if path in ATTRIBUTES:
+            return self._client.call(path)
+        if name in EXPORTS.get(self._path, ()):
+            if path in STREAMED_CALLS:
+                return lambda *args, **kwargs: self._client.stream(path, *args, **kwargs)
+            return lambda *args, **kwargs: self._client.call(path, *args, **kwargs)
+        raise AttributeError(f"{path} is not served by the ccm daemon")
+
+
+def connect(config_dir: Optional[str] = None) -> Optional[DaemonClient]:
+    """
+    Connect to the daemon of a configuration directory, if one is running.
+
+    Args:
+        config_dir: Configuration directory; defaults to $CCM_CONFIG_DIR or ~/.claude_code
+
+    Returns:
+        A client, or None if $CCM_NO_DAEMON is set, no daemon is listening or the daemon
+        runs another version of ccm
+    """
+    if os.environ.get(NO_DAEMON_ENV):
+        return None
+    path = default_socket_path(config_dir)
+    if not os.path.exists(path):
+        return None
+    import socket
+
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.settimeout(CONNECT_TIMEOUT_SECONDS)
+    try:
+        sock.connect(path)
+    except OSError:
+        # A socket left behind by a daemon that did not shut down cleanly
+        sock.close()
+        return None
+    # Calls such as scaffolds take as long as they take
+    sock.settimeout(None)
+    client = DaemonClient(sock)
+    try:
+        info = client.call("ping")
+    except (OSError, ValueError, DaemonError):
+        client.close()
+        return None
+    if info.get("version") != __version__:
+        client.close()
+        return None
+    return client
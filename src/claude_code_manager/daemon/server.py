@@ -0,0 +1,279 @@
+"""
+The ccm daemon (ccmd).
+
+Keeps one ConfigManager and EnvironmentManager (with the registry connection, the
+parsed config cache, the mirror and command caches and the pool) alive across ccm
+invocations and serves them over a Unix socket, with the protocol described in
+daemon.client. Scaffolds and refreshes run on a bounded worker pool, with their output
+routed back to the client (see output.routed); other calls are answered on the
+connection's own thread.
+"""
+
+import collections.abc
+import json
+import os
+import signal
+import socket
+import socketserver
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+import click
+
+from .. import __version__
+from ..config import ConfigManager
+from ..environment import DEFAULT_MAX_PARALLEL_SCAFFOLDS, EnvironmentManager
+from ..output import RoutedStream, routed
+from .client import ATTRIBUTES, EXPORTS, POOLED_CALLS, default_socket_path
+
+
+class _Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """Unix socket server handling each connection on its own thread."""
+
+    daemon_threads = True
+
+    def __init__(self, path: str, daemon: "CcmDaemon"):
+        self.daemon = daemon
+        super().__init__(path, _Handler)
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    """Answers the requests of one client connection, in order."""
+
+    server: _Server
+
+    def setup(self) -> None:
+        super().setup()
+        # Routed output is sent from the threads of the scaffold being served
+        self._send_lock = threading.Lock()
+
+    def handle(self) -> None:
+        for line in self.rfile:
+            try:
+                request = json.loads(line)
+            except ValueError:
+                return
+            try:
+                self.server.daemon.serve(request, self._send)
+            except (BrokenPipeError, ConnectionResetError):
+                return
+
+    def _send(self, response: Dict[str, Any]) -> None:
+        data = (json.dumps(response, default=str) + "\n").encode("utf-8")
+        with self._send_lock:
+            self.wfile.write(data)
+
+
+class CcmDaemon:
+    """Serves the managers of one configuration directory over a Unix socket."""
+
+    def __init__(self, config_dir: Optional[str] = None, max_workers: Optional[int] = None):
+        """
+        Initialize the daemon and its managers.
+
+        Args:
+            config_dir: Configuration directory; defaults to $CCM_CONFIG_DIR or ~/.claude_code
+            max_workers: Maximum number of scaffolds and refreshes run at once; defaults to
+                the ``daemon_max_parallel_scaffolds`` setting in config.yaml
+        """
+        self.config_manager = ConfigManager(config_dir)
+        self.env_manager = EnvironmentManager(self.config_manager)
+        if max_workers is None:
+            max_workers = self.config_manager.config.get(
+                "daemon_max_parallel_scaffolds", DEFAULT_MAX_PARALLEL_SCAFFOLDS
+            )
+        self.max_workers = max(1, int(max_workers))
+        self.socket_path = default_socket_path(self.config_manager.config_dir)
+        self.started_at = time.time()
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="ccmd-worker")
+        self._server: Optional[_Server] = None
+
+    def info(self) -> Dict[str, Any]:
+        """
+        Describe the daemon, as answered to ``ping``.
+
+        Returns:
+            Dictionary with version, pid, config_dir, workers, uptime and file_cache (hits,
+            misses and entries of the parsed configuration file cache) keys
+        """
+        return {
+            "version": __version__,
+            "pid": os.getpid(),
+            "config_dir": self.config_manager.config_dir,
+            "workers": self.max_workers,
+            "uptime": round(time.time() - self.started_at, 3),
+            "file_cache": self.config_manager.file_cache.stats(),
+        }
+
+    def resolve(self, call: str) -> Any:
+        """
+        Look up an exported member.
+
+        Args:
+            call: Dotted path of the member, e.g. ``env_manager.pool.fill``
+
+        Returns:
+            The bound method or attribute value
+
+        Raises:
+            AttributeError: If the member is not exported
+        """
+        path, _, name = call.rpartition(".")
+        if name not in EXPORTS.get(path, ()):
+            raise AttributeError(f"{call} is not served by the ccm daemon")
+        target: Any = self
+        for part in path.split("."):
+            target = getattr(target, part)
+        return getattr(target, name)
+
+    def serve(self, request: Dict[str, Any], send: Callable[[Dict[str, Any]], None]) -> None:
+        """
+        Answer one request.
+
+        Args:
+            request: Decoded request line
+            send: Writes one response line to the client
+        """
+        request_id = request.get("id")
+        call = str(request.get("call", ""))
+        try:
+            if call == "ping":
+                result = self.info()
+            elif call == "shutdown":
+                result = self.info()
+                threading.Thread(target=self.stop, name="ccmd-shutdown").start()
+            else:
+                # Pick up settings edited by hand since the last call
+                self.config_manager.reload()
+                member = self.resolve(call)
+                if call in ATTRIBUTES:
+                    result = member
+                elif call in POOLED_CALLS:
+
+                    def forward(text: str) -> None:
+                        try:
+                            send({"id": request_id, "output": text})
+                        except (BrokenPipeError, ConnectionResetError):
+                            # The client went away; the scaffold still finishes and is registered
+                            pass
+
+                    def run() -> Any:
+                        with routed(forward, request.get("env")):
+                            return member(*request.get("args", []), **request.get("kwargs", {}))
+
+                    result = self._executor.submit(run).result()
+                else:
+                    result = member(*request.get("args", []), **request.get("kwargs", {}))
+            if isinstance(result, collections.abc.Iterator):
+                for item in result:
+                    send({"id": request_id, "item": item})
+                send({"id": request_id, "end": True})
+            else:
+                send({"id": request_id, "result": result})
+        except (BrokenPipeError, ConnectionResetError):
+            raise
+        except Exception as e:
+            send({"id": request_id, "error": {"type": type(e).__name__, "message": str(e)}})
+
+    def run(self) -> None:
+        """
+        Listen on the socket until stopped by a ``shutdown`` request, SIGTERM or SIGINT.
+
+        Raises:
+            RuntimeError: If another daemon is already listening on the socket
+        """
+        if os.path.exists(self.socket_path):
+            probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                probe.connect(self.socket_path)
+            except OSError:
+                # Left behind by a daemon that did not shut down cleanly
+                os.remove(self.socket_path)
+            else:
+                raise RuntimeError(f"A ccm daemon is already listening on {self.socket_path}")
+            finally:
+                probe.close()
+
+        # Only the owner of the configuration directory may connect
+        previous_umask = os.umask(0o077)
+        try:
+            self._server = _Server(self.socket_path, self)
+        finally:
+            os.umask(previous_umask)
+        # Print from scaffolds served for a client to that client
+        sys.stdout = RoutedStream(sys.stdout)
+        for signum in (signal.SIGTERM, signal.SIGINT):
+            signal.signal(signum, lambda *_: threading.Thread(target=self.stop, name="ccmd-shutdown").start())
+
+        print(f"ccmd {__version__} listening on {self.socket_path} (pid {os.getpid()}, {self.max_workers} workers)")
+        sys.stdout.flush()
+        try:
+            self._server.serve_forever()
+        finally:
+            self._server.server_close()
+            if os.path.exists(self.socket_path):
+                os.remove(self.socket_path)
+            self._executor.shutdown(wait=True)
+            print("ccmd stopped")
+
+    def stop(self) -> None:
+        """Stop accepting connections; running scaffolds are allowed to finish."""
+        if self._server is not None:
+            self._server.shutdown()
+
+
+def _request(socket_path: str, call: str) -> Optional[Dict[str, Any]]:
+    """Send a single request to a running daemon, returning None if none is listening."""
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(socket_path)
+        sock.sendall((json.dumps({"id": 1, "call": call}) + "\n").encode("utf-8"))
+        line = sock.makefile("r", encoding="utf-8").readline()
+    except OSError:
+        return None
+    finally:
+        sock.close()
+    return json.loads(line).get("result") if line else None
+
+
+@click.command(context_settings=dict(help_option_names=["-h", "--help"]))
+@click.option("--workers", "-j", type=click.IntRange(min=1), help="Number of scaffolds and refreshes run at once")
+@click.option("--status", is_flag=True, help="Show whether a daemon is running and exit")
+@click.option("--stop", is_flag=True, help="Stop the running daemon and exit")
+def main(workers: Optional[int] = None, status: bool = False, stop: bool = False):
+    """
+    Run the ccm daemon in the foreground.
+
+    While it runs, ccm commands are served by it instead of loading the configuration,
+    registry and caches themselves. Set CCM_NO_DAEMON=1 to bypass it.
+    """
+    socket_path = default_socket_path()
+    if status or stop:
+        info = _request(socket_path, "shutdown" if stop else "ping")
+        if info is None:
+            print(f"No ccm daemon is listening on {socket_path}")
+            sys.exit(1)
+        action = "Stopping" if stop else "Running:"
+        print(
+            f"{action} ccmd {info['version']} (pid {info['pid']}, {info['workers']} workers, up {info['uptime']:.0f}s)"
+        )
+        if status:
+            file_cache = info["file_cache"]
+            print(
+                f"Configuration file cache: {file_cache['hits']} hits, {file_cache['misses']} misses, "
+                f"{file_cache['entries']} files"
+            )
+        return
+
+    try:
+        CcmDaemon(max_workers=workers).run()
+    except RuntimeError as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,409 @@
+"""
+Content-addressed store deduplicating identical files across instances for Claude Code Manager.
+
+After a scaffold, each file of the instance is hashed and linked to the store's copy of
+its content, so N instances of an environment keep one copy of every file they share.
+Files are reflinked where the filesystem supports it; copy-on-write makes that safe for
+any file. Otherwise only files that are never modified in place (git objects, and paths
+matching ``dedupe_hardlink_paths``) are hardlinked, since an edit through one hardlink
+would change every instance.
+
+Blobs are reference counted per instance in a SQLite database; deleting or collecting
+an instance releases its references and removes the blobs no instance uses anymore.
+"""
+
+import fnmatch
+import hashlib
+import os
+import sqlite3
+import stat
+import threading
+import time
+import uuid
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from .config import ConfigManager
+from .fileops import reflink_file
+from .golden import _is_immutable
+
+DEFAULT_DEDUPE_MIN_FILE_SIZE_KB = 4
+# References added more recently than this are kept by release_unknown, so scaffolds
+# that have not saved their instance yet are not released from under them
+RELEASE_GRACE_SECONDS = 3600
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS blobs (
+    hash TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    refcount INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS instance_blobs (
+    instance_id TEXT NOT NULL,
+    hash TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    added_at REAL NOT NULL,
+    PRIMARY KEY (instance_id, hash)
+);
+"""
+
+
+def hash_file(path: str) -> str:
+    """
+    Hash the contents of a file.
+
+    Args:
+        path: File path
+
+    Returns:
+        SHA-256 hex digest
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class DedupeStore:
+    """Stores one copy of each distinct file of the instances, linked into every instance that has it."""
+
+    def __init__(self, config_manager: ConfigManager):
+        """
+        Initialize the dedupe store.
+
+        Args:
+            config_manager: Configuration manager instance
+        """
+        self.config_manager = config_manager
+        self.store_dir = os.path.join(config_manager.config_dir, "dedupe")
+        self.blobs_dir = os.path.join(self.store_dir, "blobs")
+        self.db_path = os.path.join(self.store_dir, "dedupe.db")
+        self._local = threading.local()
+        # Link method by (store device, instance device), probed once per pair
+        self._methods: Dict[Tuple[int, int], Optional[str]] = {}
+        self._methods_lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        """Whether scaffolds deduplicate their files into the store."""
+        return bool(self.config_manager.config.get("dedupe_enabled", False))
+
+    @property
+    def min_file_size(self) -> int:
+        """Size below which files are left alone, in bytes."""
+        min_size_kb = self.config_manager.config.get("dedupe_min_file_size_kb", DEFAULT_DEDUPE_MIN_FILE_SIZE_KB)
+        return int(float(min_size_kb) * 1024)
+
+    @property
+    def hardlink_paths(self) -> List[str]:
+        """Globs of instance-relative paths, besides git objects, that may be hardlinked."""
+        return list(self.config_manager.config.get("dedupe_hardlink_paths") or [])
+
+    def _connection(self) -> sqlite3.Connection:
+        """Get this thread's database connection, creating the store on first use."""
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            os.makedirs(self.store_dir, exist_ok=True)
+            connection = sqlite3.connect(self.db_path, timeout=30)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.executescript(_SCHEMA)
+            self._local.connection = connection
+        return connection
+
+    def _blob_path(self, blob: str) -> str:
+        """Get the file of a blob."""
+        return os.path.join(self.blobs_dir, blob[:2], blob)
+
+    def _link_method(self, instance_dir: str) -> Optional[str]:
+        """
+        Find how files of an instance directory can be linked to the store.
+
+        Returns:
+            "reflink", "hardlink", or None if the store is on another filesystem
+        """
+        os.makedirs(self.blobs_dir, exist_ok=True)
+        devices = (os.stat(self.blobs_dir).st_dev, os.stat(instance_dir).st_dev)
+        with self._methods_lock:
+            if devices in self._methods:
+                return self._methods[devices]
+            if devices[0] != devices[1]:
+                method = None
+            else:
+                probe = os.path.join(self.blobs_dir, f".probe-{uuid.uuid4().hex[:8]}")
+                clone = os.path.join(instance_dir, f".ccm-probe-{uuid.uuid4().hex[:8]}")
+                try:
+                    with open(probe, "wb") as f:
+                        f.write(b"ccm")
+                    method = "reflink" if reflink_file(probe, clone) else "hardlink"
+                finally:
+                    for path in (probe, clone):
+                        if os.path.exists(path):
+                            os.remove(path)
+            self._methods[devices] = method
+            return method
+
+    def _can_hardlink(self, rel_path: str) -> bool:
+        """Whether an instance file is never modified in place and can share an inode with the store."""
+        return _is_immutable(rel_path) or any(fnmatch.fnmatch(rel_path, pattern) for pattern in self.hardlink_paths)
+
+    def _candidates(self, instance_dir: str, method: str) -> Iterable[Tuple[str, os.stat_result]]:
+        """Yield the path and status of every instance file that may be linked with a method."""
+        min_size = self.min_file_size
+        for root, _, files in os.walk(instance_dir):
+            for name in files:
+                path = os.path.join(root, name)
+                try:
+                    st = os.lstat(path)
+                except OSError:
+                    continue
+                if not stat.S_ISREG(st.st_mode) or st.st_size < min_size:
+                    continue
+                if method == "hardlink" and not self._can_hardlink(os.path.relpath(path, instance_dir)):
+                    continue
+                yield path, st
+
+    def dedupe(self, instance_id: str, instance_dir: str) -> Dict[str, int]:
+        """
+        Replace an instance's files by links to the store's copies of their contents.
+
+        Files whose content is not in the store yet are added to it. The references are
+        recorded before any file is linked, so a concurrent release never removes a blob
+        this instance is being linked to. Instances that already hold references are skipped.
+
+        Args:
+            instance_id: Instance identifier the references are recorded under
+            instance_dir: Instance directory
+
+        Returns:
+            Dictionary with files (files deduplicated), stored (blobs added to the store)
+            and bytes_saved (size of the files now sharing an existing blob) keys
+        """
+        report = {"files": 0, "stored": 0, "bytes_saved": 0}
+        if self.has_references(instance_id):
+            return report
+        method = self._link_method(instance_dir)
+        if method is None:
+            print(f"Not deduplicating {instance_dir}: the dedupe store {self.store_dir} is on another filesystem")
+            return report
+
+        # Blobs are keyed by content and mode; hardlinked files share their mode with the blob
+        files = []
+        for path, st in self._candidates(instance_dir, method):
+            try:
+                blob = f"{hash_file(path)}-{stat.S_IMODE(st.st_mode):o}"
+            except OSError:
+                continue
+            files.append((path, st, blob))
+        if not files:
+            return report
+
+        self._add_references(instance_id, files)
+        failed: Counter = Counter()
+        for path, st, blob in files:
+            try:
+                stored = self._link(path, st, blob, method)
+            except OSError:
+                failed[blob] += 1
+                continue
+            report["files"] += 1
+            if stored:
+                report["stored"] += 1
+            else:
+                report["bytes_saved"] += st.st_size
+        if failed:
+            self._release_references(instance_id, failed)
+        return report
+
+    def has_references(self, instance_id: str) -> bool:
+        """
+        Whether an instance has been deduplicated.
+
+        Args:
+            instance_id: Instance identifier
+
+        Returns:
+            True if the instance holds references to blobs
+        """
+        if not os.path.exists(self.db_path):
+            return False
+        connection = self._connection()
+        row = connection.execute(
+            "SELECT 1 FROM instance_blobs WHERE instance_id = ? LIMIT 1", (instance_id,)
+        ).fetchone()
+        return row is not None
+
+    def _link(self, path: str, st: os.stat_result, blob: str, method: str) -> bool:
+        """
+        Link one instance file to its blob, adding the blob to the store if it is missing.
+
+        Returns:
+            True if the file's content was added to the store, False if it is now linked to an existing blob
+        """
+        blob_path = self._blob_path(blob)
+        if not os.path.exists(blob_path):
+            os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+            if method == "hardlink":
+                try:
+                    os.link(path, blob_path)
+                    return True
+                except FileExistsError:
+                    pass
+            else:
+                temp_path = os.path.join(self.blobs_dir, f".adding-{uuid.uuid4().hex[:8]}")
+                reflink_file(path, temp_path)
+                os.replace(temp_path, blob_path)
+                return True
+        elif method == "hardlink" and os.stat(blob_path).st_ino == st.st_ino:
+            # Already linked, e.g. copied from a golden image that was deduplicated
+            return False
+
+        # Swap the file for a link to the blob with a single rename, keeping its timestamps
+        temp_path = os.path.join(os.path.dirname(path), f".{os.path.basename(path)}.ccm-dedupe")
+        try:
+            if method == "hardlink":
+                os.link(blob_path, temp_path)
+            else:
+                reflink_file(blob_path, temp_path)
+                os.utime(temp_path, ns=(st.st_atime_ns, st.st_mtime_ns))
+            os.replace(temp_path, path)
+        except OSError:
+            if os.path.lexists(temp_path):
+                os.remove(temp_path)
+            raise
+        return False
+
+    def _add_references(self, instance_id: str, files: List[Tuple[str, os.stat_result, str]]) -> None:
+        """Record an instance's references to the blobs of its files."""
+        counts = Counter(blob for _, _, blob in files)
+        sizes = {blob: st.st_size for _, st, blob in files}
+        now = time.time()
+        connection = self._connection()
+        with connection:
+            connection.executemany(
+                "INSERT INTO blobs (hash, size, refcount) VALUES (?, ?, ?) "
+                "ON CONFLICT (hash) DO UPDATE SET refcount = refcount + excluded.refcount",
+                [(blob, sizes[blob], count) for blob, count in counts.items()],
+            )
+            connection.executemany(
+                "INSERT INTO instance_blobs (instance_id, hash, count, added_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (instance_id, hash) "
+                "DO UPDATE SET count = count + excluded.count, added_at = excluded.added_at",
+                [(instance_id, blob, count, now) for blob, count in counts.items()],
+            )
+
+    def _release_references(self, instance_id: str, counts: Counter) -> None:
+        """Drop some of an instance's references, e.g. to files that could not be linked."""
+        connection = self._connection()
+        with connection:
+            connection.executemany(
+                "UPDATE instance_blobs SET count = count - ? WHERE instance_id = ? AND hash = ?",
+                [(count, instance_id, blob) for blob, count in counts.items()],
+            )
+            connection.execute("DELETE FROM instance_blobs WHERE instance_id = ? AND count <= 0", (instance_id,))
+            connection.executemany(
+                "UPDATE blobs SET refcount = refcount - ? WHERE hash = ?",
+                [(count, blob) for blob, count in counts.items()],
+            )
+            unused = self._unused_blobs(connection, list(counts))
+        self._remove_blobs(unused)
+
+    def release(self, instance_ids: List[str]) -> int:
+        """
+        Release every reference of some instances and remove the blobs no instance uses anymore.
+
+        Args:
+            instance_ids: Instance identifiers
+
+        Returns:
+            Number of blobs removed from the store
+        """
+        if not instance_ids or not os.path.exists(self.db_path):
+            return 0
+        connection = self._connection()
+        released: Counter = Counter()
+        with connection:
+            for instance_id in instance_ids:
+                rows = connection.execute(
+                    "SELECT hash, count FROM instance_blobs WHERE instance_id = ?", (instance_id,)
+                ).fetchall()
+                for blob, count in rows:
+                    released[blob] += count
+                connection.execute("DELETE FROM instance_blobs WHERE instance_id = ?", (instance_id,))
+            connection.executemany(
+                "UPDATE blobs SET refcount = refcount - ? WHERE hash = ?",
+                [(count, blob) for blob, count in released.items()],
+            )
+            unused = self._unused_blobs(connection, list(released))
+        self._remove_blobs(unused)
+        return len(unused)
+
+    def release_unknown(self, known_ids: Iterable[str]) -> int:
+        """
+        Release the references of instances that no longer exist, such as discarded pool instances.
+
+        References added within RELEASE_GRACE_SECONDS are kept, since they may belong to
+        a scaffold that has not saved its instance yet.
+
+        Args:
+            known_ids: Identifiers of the registered and pooled instances
+
+        Returns:
+            Number of blobs removed from the store
+        """
+        if not os.path.exists(self.db_path):
+            return 0
+        known_ids = set(known_ids)
+        rows = self._connection().execute(
+            "SELECT instance_id FROM instance_blobs GROUP BY instance_id HAVING MAX(added_at) < ?",
+            (time.time() - RELEASE_GRACE_SECONDS,),
+        )
+        return self.release([instance_id for (instance_id,) in rows if instance_id not in known_ids])
+
+    @staticmethod
+    def _unused_blobs(connection: sqlite3.Connection, blobs: List[str]) -> List[str]:
+        """Delete the rows of blobs without references and return them; the transaction must be open."""
+        unused = []
+        for blob in blobs:
+            row = connection.execute("SELECT refcount FROM blobs WHERE hash = ?", (blob,)).fetchone()
+            if row is not None and row[0] <= 0:
+                unused.append(blob)
+        connection.executemany("DELETE FROM blobs WHERE hash = ?", [(blob,) for blob in unused])
+        return unused
+
+    def _remove_blobs(self, blobs: List[str]) -> None:
+        """Remove blob files; instances still keep their links to the content."""
+        for blob in blobs:
+            try:
+                os.remove(self._blob_path(blob))
+            except FileNotFoundError:
+                pass
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Summarize the store.
+
+        Returns:
+            Dictionary with blobs, instances, files (references), stored_bytes (one copy of
+            each blob), logical_bytes (what the files would take without deduplication) and
+            bytes_saved keys
+        """
+        stats = {"blobs": 0, "instances": 0, "files": 0, "stored_bytes": 0, "logical_bytes": 0, "bytes_saved": 0}
+        if not os.path.exists(self.db_path):
+            return stats
+        connection = self._connection()
+        blobs, files, stored_bytes, logical_bytes = connection.execute(
+            "SELECT COUNT(*), COALESCE(SUM(refcount), 0), COALESCE(SUM(size), 0), COALESCE(SUM(size * refcount), 0) "
+            "FROM blobs"
+        ).fetchone()
+        (instances,) = connection.execute("SELECT COUNT(DISTINCT instance_id) FROM instance_blobs").fetchone()
+        stats.update(
+            blobs=blobs,
+            instances=instances,
+            files=files,
+            stored_bytes=stored_bytes,
+            logical_bytes=logical_bytes,
+            bytes_saved=logical_bytes - stored_bytes,
+        )
+        return stats
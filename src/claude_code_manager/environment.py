@@ -1,18 +1,41 @@
 """
 Environment management for Claude Code Manager.
 Handles environment creation, configuration, and scaffolding.
+
+The caches, stores and scaffolding helpers are imported when first used, so commands
+that only read the configuration and the registry, like `ccm list`, start fast.
 """
 
+import hashlib
 import os
 import shutil
-import subprocess
 import uuid
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from typing import Any, Dict, List, Optional
-
-import git
+from functools import cached_property
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterator, List, Optional, Set
 
+from .checkout import clone_options, complete_checkout, defers_checkout, update_submodules
 from .config import ConfigManager
+from .fileops import dir_size, mentions_path
+from .garbage import write_instance_marker
+from .progress import ScaffoldCancelled, ScaffoldProgress
+from .templates import compile_template, instance_variables, is_instance_specific, render_template
+from .tracing import propagate, span
+
+if TYPE_CHECKING:
+    from .command_cache import CommandCache
+    from .dedupe import DedupeStore
+    from .garbage import GarbageCollector
+    from .golden import GoldenImageStore
+    from .mirrors import MirrorCache
+    from .pool import InstancePool
+    from .trash import Trash
+
+DEFAULT_MAX_PARALLEL_CLONES = 4
+DEFAULT_MAX_PARALLEL_SCAFFOLDS = 4
+# How many instance directories are measured at once when listing by size
+DEFAULT_MAX_PARALLEL_MEASUREMENTS = 8
 
 
 class EnvironmentManager:
@@ -27,6 +50,55 @@ class EnvironmentManager:
         """
         self.config_manager = config_manager or ConfigManager()
 
+    @cached_property
+    def mirror_cache(self) -> "MirrorCache":
+        """Repository mirrors scaffolds clone through."""
+        from .mirrors import MirrorCache
+
+        return MirrorCache(self.config_manager)
+
+    @cached_property
+    def pool(self) -> "InstancePool":
+        """Pre-built instances handed out by scaffolds of pooled environments."""
+        from .pool import InstancePool
+
+        return InstancePool(self)
+
+    @cached_property
+    def golden(self) -> "GoldenImageStore":
+        """Golden images instances of an unchanged environment are copied from."""
+        from .golden import GoldenImageStore
+
+        return GoldenImageStore(self)
+
+    @cached_property
+    def command_cache(self) -> "CommandCache":
+        """Cached outputs of scaffold commands."""
+        from .command_cache import CommandCache
+
+        return CommandCache(self.config_manager)
+
+    @cached_property
+    def trash(self) -> "Trash":
+        """Trash directories deleted instances are moved to before they are removed."""
+        from .trash import Trash
+
+        return Trash(self.config_manager)
+
+    @cached_property
+    def dedupe(self) -> "DedupeStore":
+        """Content-addressed store instance files are linked to."""
+        from .dedupe import DedupeStore
+
+        return DedupeStore(self.config_manager)
+
+    @cached_property
+    def garbage(self) -> "GarbageCollector":
+        """Collector of abandoned instances."""
+        from .garbage import GarbageCollector
+
+        return GarbageCollector(self)
+
     def create_environment_config(
         self, env_name: str, config: Dict[str, Any], claude_md_content: Optional[str] = None
     ) -> None:
@@ -55,79 +127,691 @@ class EnvironmentManager:
         # Save to config
         self.config_manager.save_environment_config(env_name, config)
 
-    def scaffold_environment(self, env_name: str, work_dir: Optional[str] = None) -> Optional[str]:
+    def scaffold_environment(
+        self, env_name: str, work_dir: Optional[str] = None, env_config: Optional[Dict[str, Any]] = None
+    ) -> Optional[str]:
         """
         Scaffold a new environment instance.
 
         Args:
             env_name: Name of the environment
             work_dir: Working directory for the environment
+            env_config: Already loaded environment configuration, to skip loading it again
 
         Returns:
             Path to the scaffolded environment or None if failed
         """
+        instance_info = self.scaffold_instance(env_name, work_dir, env_config=env_config)
+        return instance_info["path"] if instance_info else None
+
+    def scaffold_instance(
+        self,
+        env_name: str,
+        work_dir: Optional[str] = None,
+        progress: Optional[ScaffoldProgress] = None,
+        env_config: Optional[Dict[str, Any]] = None,
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Scaffold a new environment instance and return its record.
+
+        Args:
+            env_name: Name of the environment
+            work_dir: Working directory for the environment
+            progress: Optional tracker reporting the phase, repositories and commands; when it
+                is cancelled the scaffold stops and removes the directory it created
+            env_config: Already loaded environment configuration, to skip loading it again
+
+        The record includes the wall time of each phase, repository and command under
+        ``timings``; the same timings are appended to the history shown by ``ccm stats``.
+
+        Returns:
+            Instance data dictionary or None if the environment does not exist
+
+        Raises:
+            ScaffoldCancelled: If the progress tracker was cancelled before the instance was saved
+        """
+        with span("scaffold", environment=env_name) as scaffold_span:
+            instance_info = self._scaffold_instance(env_name, work_dir, progress, env_config)
+            if instance_info is not None:
+                scaffold_span.set(instance_id=instance_info["id"], path=instance_info["path"])
+            return instance_info
+
+    def _scaffold_instance(
+        self,
+        env_name: str,
+        work_dir: Optional[str],
+        progress: Optional[ScaffoldProgress],
+        env_config: Optional[Dict[str, Any]],
+    ) -> Optional[Dict[str, Any]]:
+        """Scaffold a new environment instance; see scaffold_instance."""
+        if progress is None:
+            progress = ScaffoldProgress()
+
         # Load environment config
-        env_config = self.config_manager.get_environment_config(env_name)
+        progress.set_phase("config")
+        if env_config is None:
+            env_config = self.config_manager.get_environment_config(env_name)
         if env_config is None:
             return None
 
+        # Hand out a ready-made instance from the warm pool when one is available
+        if work_dir is None:
+            progress.set_phase("pool_claim")
+            instance_info = self.pool.claim(env_name, env_config)
+            if instance_info is not None:
+                progress.set_instance(instance_info["id"], instance_info["path"])
+                # The pooled claude.md was rendered before the instance had its id and path
+                variables = self._instance_variables(env_name, env_config, instance_info["path"], instance_info["id"])
+                claude_md_hash = self._write_claude_md(env_name, instance_info["path"], variables)
+                if claude_md_hash:
+                    instance_info["claude_md_hash"] = claude_md_hash
+                self._save_with_timings(instance_info, progress)
+                return instance_info
+
         # Create a unique ID for this instance
         instance_id = str(uuid.uuid4())
 
         # Determine work directory
         if work_dir is None:
-            default_work_dir = self.config_manager.config.get(
-                "default_work_dir", os.path.expanduser("~/claude_code_work")
+            instance_dir = os.path.join(self.config_manager.get_default_work_dir(), f"{env_name}_{instance_id[:8]}")
+        else:
+            instance_dir = os.path.abspath(os.path.expanduser(work_dir))
+
+        progress.set_instance(instance_id, instance_dir)
+        created_dir = not os.path.exists(instance_dir)
+        try:
+            build_report = self._populate_instance(env_name, env_config, instance_dir, progress, instance_id)
+            progress.check_cancelled()
+            if created_dir:
+                # Written after the build, since git only clones into empty directories
+                write_instance_marker(instance_dir, instance_id)
+            self._dedupe_instance(instance_id, instance_dir, progress)
+        except ScaffoldCancelled:
+            # Only remove what this scaffold created; an existing work_dir may hold the user's files
+            if created_dir:
+                shutil.rmtree(instance_dir, ignore_errors=True)
+            raise
+
+        # Save instance info
+        instance_info = {
+            "id": instance_id,
+            "environment": env_name,
+            "path": instance_dir,
+            "created_at": datetime.now().isoformat(),
+        }
+        if build_report["failed_repositories"]:
+            instance_info["failed_repositories"] = build_report["failed_repositories"]
+        if build_report["commands"]:
+            instance_info["scaffold_commands"] = [
+                {"name": result["name"], "status": result["status"], "duration": round(result["duration"], 3)}
+                for result in build_report["commands"]
+            ]
+        if build_report["claude_md_hash"]:
+            # Lets refresh tell a changed template or variables from local edits to claude.md
+            instance_info["claude_md_hash"] = build_report["claude_md_hash"]
+        self._save_with_timings(instance_info, progress)
+
+        return instance_info
+
+    def _save_with_timings(self, instance_info: Dict[str, Any], progress: ScaffoldProgress) -> None:
+        """Add the scaffold's timings to an instance record, save it and append the timings to the history."""
+        progress.finish()
+        timings = progress.timings()
+        instance_info["timings"] = timings
+        with span("instance.save", instance_id=instance_info["id"]):
+            self.config_manager.save_instance(instance_info["id"], instance_info)
+            try:
+                self.config_manager.registry.record_timings(instance_info, timings)
+            except Exception as e:
+                print(f"Error recording scaffold timings: {e}")
+
+    def _dedupe_instance(
+        self, instance_id: str, instance_dir: str, progress: Optional[ScaffoldProgress] = None
+    ) -> None:
+        """Link an instance's files to the dedupe store, if it is enabled."""
+        if not self.dedupe.enabled:
+            return
+        if progress is not None:
+            progress.set_phase("dedupe")
+        with span("dedupe", instance_id=instance_id) as dedupe_span:
+            try:
+                dedupe_span.set(**self.dedupe.dedupe(instance_id, instance_dir))
+            except Exception as e:
+                print(f"Error deduplicating instance files: {e}")
+
+    def scaffold_many(
+        self,
+        env_name: str,
+        count: int,
+        max_workers: int = DEFAULT_MAX_PARALLEL_SCAFFOLDS,
+        parent_dir: Optional[str] = None,
+    ) -> Optional[List[Dict[str, Any]]]:
+        """
+        Scaffold several instances of an environment concurrently.
+
+        The environment config is loaded once for the whole batch, and each repository
+        mirror is fetched once and then cloned from by every instance.
+
+        Args:
+            env_name: Name of the environment
+            count: Number of instances to create
+            max_workers: Maximum number of instances built at once
+            parent_dir: Directory to create the instances in as ``<env_name>_<n>``; defaults
+                to the configured work directory (and the warm pool, if the environment has one)
+
+        Returns:
+            One result dictionary per instance, in batch order, with index, id, path, status
+            ("succeeded" or "failed") and error keys, or None if the environment does not exist
+        """
+        env_config = self.config_manager.get_environment_config(env_name)
+        if env_config is None:
+            return None
+
+        if parent_dir:
+            parent_dir = os.path.abspath(os.path.expanduser(parent_dir))
+
+        def scaffold_one(index: int) -> Dict[str, Any]:
+            work_dir = os.path.join(parent_dir, f"{env_name}_{index + 1}") if parent_dir else None
+            try:
+                instance_info = self.scaffold_instance(env_name, work_dir, env_config=env_config)
+            except Exception as e:
+                return {"index": index, "id": None, "path": work_dir, "status": "failed", "error": str(e)}
+            errors = scaffold_errors(instance_info)
+            return {
+                "index": index,
+                "id": instance_info["id"],
+                "path": instance_info["path"],
+                "status": "failed" if errors else "succeeded",
+                "error": "; ".join(errors) or None,
+            }
+
+        max_workers = max(1, min(int(max_workers), count))
+        with self.mirror_cache.shared_fetches():
+            with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ccm-scaffold") as executor:
+                return list(executor.map(propagate(scaffold_one), range(count)))
+
+    def refresh_instance(self, instance_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Update an existing instance in place instead of scaffolding a new one.
+
+        Every configured repository is fetched and fast-forwarded, in parallel; repositories
+        missing from the instance are cloned. claude.md is rewritten only if the template
+        changed since the instance was scaffolded or last refreshed. Scaffold commands are
+        re-run only if their declared inputs changed, which includes changes made by commands
+        re-run before them; commands that never succeeded, or are new, run as well.
+
+        The commit of each repository and the refresh time are saved in the instance record
+        under ``commits`` and ``refreshed_at``.
+
+        Args:
+            instance_id: Instance identifier
+
+        Returns:
+            Report with id, path, repositories (url, path, status, before, after and error per
+            repository), claude_md ("updated", "unchanged" or "none") and commands keys, or None
+            if the instance or its environment does not exist
+        """
+        instance_info = self.config_manager.get_instance(instance_id)
+        if instance_info is None:
+            return None
+        env_name = instance_info.get("environment", "")
+        env_config = self.config_manager.get_environment_config(env_name)
+        if env_config is None:
+            print(f"Environment '{env_name}' of instance {instance_id} does not exist")
+            return None
+        instance_dir = instance_info["path"]
+
+        from .commands import inputs_digest, normalize_commands
+
+        with span("refresh", instance_id=instance_id, environment=env_name):
+            try:
+                nodes = normalize_commands(env_config.get("scaffold_commands", []))
+            except ValueError as e:
+                print(f"Error in scaffold commands, none were run: {e}")
+                nodes = []
+            # Input digests before the repositories move, to compare with when each command is due. The
+            # commands are rendered like _run_scaffold_commands renders them, with the commits checked out now
+            variables_before = self._instance_variables(
+                env_name, env_config, instance_dir, instance_id, instance_info.get("commits")
             )
-            instance_dir = os.path.join(default_work_dir, f"{env_name}_{instance_id[:8]}")
+            digests_before = {
+                node["name"]: inputs_digest(node, instance_dir) for node in _render_shared(nodes, variables_before)
+            }
+
+            repositories = self._refresh_repositories(env_config.get("repositories", []), instance_dir)
+            commits = {
+                os.path.relpath(result["path"], instance_dir): result["after"]
+                for result in repositories
+                if result["after"]
+            }
+            variables = self._instance_variables(env_name, env_config, instance_dir, instance_id, commits)
+
+            claude_md_status = self._refresh_claude_md(env_name, instance_info, variables)
+
+            previous = {command["name"]: command for command in instance_info.get("scaffold_commands", [])}
+            # Instances from a golden image or the pool ran their commands when the template was built
+            # and record none; only treat commands as new when the instance recorded its commands
+            recorded_commands = "scaffold_commands" in instance_info
+
+            def should_run(node: Dict[str, Any]) -> bool:
+                if node["name"] in previous:
+                    if previous[node["name"]]["status"] not in ("succeeded", "cached", "unchanged"):
+                        return True
+                elif recorded_commands:
+                    return True
+                digest = inputs_digest(node, instance_dir)
+                return digest is not None and digest != digests_before[node["name"]]
+
+            command_results = self._run_scaffold_commands(
+                env_config.get("scaffold_commands", []), instance_dir, variables, should_run=should_run
+            )
+
+            commands = []
+            for result in command_results:
+                if result["status"] == "unchanged" and result["name"] in previous:
+                    commands.append(previous[result["name"]])
+                else:
+                    commands.append(
+                        {"name": result["name"], "status": result["status"], "duration": round(result["duration"], 3)}
+                    )
+            if commands:
+                instance_info["scaffold_commands"] = commands
+            failed_repositories = [result["url"] for result in repositories if result["status"] == "failed"]
+            if failed_repositories:
+                instance_info["failed_repositories"] = failed_repositories
+            else:
+                instance_info.pop("failed_repositories", None)
+            instance_info["commits"] = commits
+            instance_info["refreshed_at"] = datetime.now().isoformat()
+            with span("instance.save", instance_id=instance_id):
+                self.config_manager.save_instance(instance_id, instance_info)
+
+        return {
+            "id": instance_id,
+            "path": instance_dir,
+            "repositories": repositories,
+            "claude_md": claude_md_status,
+            "commands": command_results,
+        }
+
+    def _refresh_repositories(self, repositories: List[Dict[str, Any]], instance_dir: str) -> List[Dict[str, Any]]:
+        """
+        Fetch and fast-forward the repositories of an instance concurrently.
+
+        Args:
+            repositories: Repository configurations from the environment config
+            instance_dir: Instance directory the repository paths are relative to
+
+        Returns:
+            One result dictionary per repository from _refresh_repository, in configuration order
+        """
+        repositories = [repo_config for repo_config in repositories if repo_config.get("url")]
+        if not repositories:
+            return []
+        max_workers = self.config_manager.config.get("max_parallel_clones", DEFAULT_MAX_PARALLEL_CLONES)
+        max_workers = max(1, min(int(max_workers), len(repositories)))
+        refresh = propagate(self._refresh_repository)
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ccm-refresh") as executor:
+            return list(executor.map(lambda repo_config: refresh(repo_config, instance_dir), repositories))
+
+    def _refresh_repository(self, repo_config: Dict[str, Any], instance_dir: str) -> Dict[str, Any]:
+        """
+        Fetch a repository of an instance and fast-forward its checked out branch, or clone it if it is missing.
+
+        Args:
+            repo_config: Repository configuration
+            instance_dir: Instance directory the repository path is relative to
+
+        Returns:
+            Dictionary with url, path, status ("updated", "unchanged", "cloned" or "failed"),
+            before and after commits and error keys
+        """
+        import git
+
+        repo_url = repo_config["url"]
+        target_path = os.path.join(instance_dir, repo_config.get("path", ""))
+        result: Dict[str, Any] = {"url": repo_url, "path": target_path, "before": None, "after": None, "error": None}
+        with span("fetch", url=repo_url, path=target_path) as fetch_span:
+            if not os.path.exists(os.path.join(target_path, ".git")):
+                if self._clone_repository(repo_url, target_path, repo_config.get("branch"), repo_config):
+                    result["status"] = "cloned"
+                    result["after"] = git.Repo(target_path).head.commit.hexsha
+                else:
+                    result["status"] = "failed"
+                    result["error"] = "Clone failed"
+            else:
+                try:
+                    repo = git.Repo(target_path)
+                    result["before"] = repo.head.commit.hexsha
+                    repo.git.fetch("origin")
+                    repo.git.merge("--ff-only", "@{upstream}")
+                    result["after"] = repo.head.commit.hexsha
+                    if result["after"] != result["before"]:
+                        update_submodules(repo, clone_options(repo_config))
+                    result["status"] = "updated" if result["after"] != result["before"] else "unchanged"
+                except Exception as e:
+                    result["status"] = "failed"
+                    result["error"] = str(e)
+                    result["after"] = result["before"]
+            fetch_span.set(status=result["status"])
+        if result["status"] == "failed":
+            print(f"Error refreshing repository {repo_url}: {result['error']}")
+        return result
+
+    def _refresh_claude_md(self, env_name: str, instance_info: Dict[str, Any], variables: Dict[str, str]) -> str:
+        """
+        Rewrite an instance's claude.md if the environment's template or the variables it uses changed.
+
+        Args:
+            env_name: Name of the environment
+            instance_info: Instance data; its claude_md_hash is updated
+            variables: Template variables of the instance
+
+        Returns:
+            "updated", "unchanged", or "none" if the environment has no template
+        """
+        template = self.config_manager.get_claude_md_template(env_name)
+        if not template:
+            return "none"
+        claude_md_content = render_template(template, variables)
+        template_hash = _content_hash(claude_md_content)
+        claude_md_path = os.path.join(instance_info["path"], "claude.md")
+        if "claude_md_hash" in instance_info:
+            changed = instance_info["claude_md_hash"] != template_hash
         else:
-            instance_dir = os.path.expanduser(work_dir)
+            # Instances from the pool or older versions don't record the hash; compare the file instead
+            try:
+                with open(claude_md_path, "r") as f:
+                    changed = f.read() != claude_md_content
+            except OSError:
+                changed = True
+        if changed:
+            with span("claude_md.write"):
+                with open(claude_md_path, "w") as f:
+                    f.write(claude_md_content)
+        instance_info["claude_md_hash"] = template_hash
+        return "updated" if changed else "unchanged"
+
+    def _populate_instance(
+        self,
+        env_name: str,
+        env_config: Dict[str, Any],
+        instance_dir: str,
+        progress: Optional[ScaffoldProgress] = None,
+        instance_id: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """
+        Populate an instance directory, from the golden image when the environment uses one.
 
+        Args:
+            env_name: Name of the environment
+            env_config: Environment configuration
+            instance_dir: Directory to populate
+            progress: Optional progress tracker
+            instance_id: Instance identifier for the template variables, if known yet
+
+        Returns:
+            Build report with failed_repositories, commands and claude_md_hash keys
+        """
+        if self.golden.enabled(env_config):
+            if progress is not None:
+                progress.set_phase("golden_image")
+            with span("golden_image.materialize", environment=env_name):
+                materialized = self.golden.materialize(env_name, env_config, instance_dir)
+            if materialized:
+                # The image's claude.md was rendered for the directory the image was built in
+                variables = self._instance_variables(env_name, env_config, instance_dir, instance_id)
+                claude_md_hash = self._write_claude_md(env_name, instance_dir, variables)
+                return {"failed_repositories": [], "commands": [], "claude_md_hash": claude_md_hash}
+        return self._build_instance(env_name, env_config, instance_dir, progress, instance_id)
+
+    def _build_instance(
+        self,
+        env_name: str,
+        env_config: Dict[str, Any],
+        instance_dir: str,
+        progress: Optional[ScaffoldProgress] = None,
+        instance_id: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """
+        Populate an instance directory: clone repositories, write claude.md and run scaffold commands.
+
+        Args:
+            env_name: Name of the environment
+            env_config: Environment configuration
+            instance_dir: Directory to build the instance in
+            progress: Optional progress tracker, checked for cancellation between phases
+            instance_id: Instance identifier for the template variables, if known yet
+
+        Returns:
+            Build report with the URLs of repositories that failed to clone under
+            failed_repositories, the scaffold command results under commands and the
+            hash of the rendered claude.md (None without a template) under claude_md_hash
+
+        Raises:
+            ScaffoldCancelled: If the progress tracker was cancelled
+        """
         # Create directory
         os.makedirs(instance_dir, exist_ok=True)
 
         # Clone repositories
-        for repo_config in env_config.get("repositories", []):
-            repo_url = repo_config.get("url")
-            repo_path = repo_config.get("path", "")
-            repo_branch = repo_config.get("branch")
+        if progress is not None:
+            progress.set_phase("cloning")
+        failed_repositories = self._clone_repositories(env_config.get("repositories", []), instance_dir, progress)
+        if progress is not None:
+            progress.check_cancelled()
+            progress.set_phase("claude_md")
 
-            if repo_url:
-                target_path = os.path.join(instance_dir, repo_path)
-                self._clone_repository(repo_url, target_path, repo_branch)
-
-        # Create claude.md from template
-        claude_md_content = self.config_manager.get_claude_md_template(env_name)
-        if claude_md_content:
-            claude_md_path = os.path.join(instance_dir, "claude.md")
-            with open(claude_md_path, "w") as f:
-                f.write(claude_md_content)
+        # Create claude.md from template, with the commits the repositories were cloned at
+        variables = self._instance_variables(env_name, env_config, instance_dir, instance_id)
+        claude_md_hash = self._write_claude_md(env_name, instance_dir, variables)
 
         # Run scaffold commands
+        if progress is not None:
+            progress.set_phase("commands")
+        command_results = self._run_scaffold_commands(
+            env_config.get("scaffold_commands", []), instance_dir, variables, progress
+        )
+        if progress is not None:
+            progress.check_cancelled()
+
+        return {
+            "failed_repositories": failed_repositories,
+            "commands": command_results,
+            "claude_md_hash": claude_md_hash,
+        }
+
+    def _instance_variables(
+        self,
+        env_name: str,
+        env_config: Dict[str, Any],
+        instance_dir: str,
+        instance_id: Optional[str] = None,
+        commits: Optional[Dict[str, str]] = None,
+    ) -> Dict[str, str]:
+        """
+        Build the variables claude.md and the scaffold commands of an instance are rendered with.
+
+        Args:
+            env_name: Name of the environment
+            env_config: Environment configuration
+            instance_dir: Instance directory
+            instance_id: Instance identifier, if known yet
+            commits: Already known commit SHAs by repository path relative to the instance directory
+
+        Returns:
+            Variable values by name, see templates.instance_variables
+        """
+        names: Set[str] = set()
+        template = self.config_manager.get_claude_md_template(env_name)
+        if template:
+            names.update(compile_template(template).names)
         for command_config in env_config.get("scaffold_commands", []):
-            command = command_config.get("command", "")
-            if command:
-                # Replace placeholders
-                command = command.replace("${WORK_DIR}", instance_dir)
+            command = command_config.get("command") if isinstance(command_config, dict) else command_config
+            if isinstance(command, str):
+                names.update(compile_template(command).names)
+        return instance_variables(env_name, env_config, instance_dir, instance_id, names, commits)
 
-                # Run command
-                try:
-                    subprocess.run(command, shell=True, check=True, cwd=instance_dir)
-                except subprocess.CalledProcessError as e:
-                    print(f"Error running scaffold command: {e}")
+    def _write_claude_md(self, env_name: str, instance_dir: str, variables: Dict[str, str]) -> Optional[str]:
+        """
+        Render the environment's claude.md template into an instance directory.
 
-        # Save instance info
-        instance_info = {
-            "id": instance_id,
-            "environment": env_name,
-            "path": instance_dir,
-            "created_at": datetime.now().isoformat(),
-        }
-        self.config_manager.save_instance(instance_id, instance_info)
+        Args:
+            env_name: Name of the environment
+            instance_dir: Instance directory
+            variables: Template variables of the instance
+
+        Returns:
+            Hash of the written content, or None if the environment has no template
+        """
+        with span("claude_md.write"):
+            template = self.config_manager.get_claude_md_template(env_name)
+            if not template:
+                return None
+            claude_md_content = render_template(template, variables)
+            with open(os.path.join(instance_dir, "claude.md"), "w") as f:
+                f.write(claude_md_content)
+            return _content_hash(claude_md_content)
+
+    def _run_scaffold_commands(
+        self,
+        command_configs: List[Dict[str, Any]],
+        instance_dir: str,
+        variables: Dict[str, str],
+        progress: Optional[ScaffoldProgress] = None,
+        should_run: Optional[Callable[[Dict[str, Any]], bool]] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Run an environment's scaffold commands as a dependency graph and report each one.
+
+        Independent commands run concurrently, bounded by the ``max_parallel_commands``
+        setting in config.yaml.
+
+        Args:
+            command_configs: The environment's scaffold_commands
+            instance_dir: Instance directory the commands run in
+            variables: Template variables of the instance
+            progress: Optional progress tracker
+            should_run: Optional predicate selecting the commands to run, see run_scaffold_commands
+
+        Returns:
+            Result dictionaries from run_scaffold_commands
+        """
+        from .commands import DEFAULT_MAX_PARALLEL_COMMANDS, normalize_commands, run_scaffold_commands
+
+        try:
+            nodes = normalize_commands(command_configs)
+        except ValueError as e:
+            print(f"Error in scaffold commands, none were run: {e}")
+            return []
+        if not nodes:
+            return []
+
+        nodes = _render_shared(nodes, variables)
+
+        max_workers = self.config_manager.config.get("max_parallel_commands", DEFAULT_MAX_PARALLEL_COMMANDS)
+        results = run_scaffold_commands(
+            nodes,
+            instance_dir,
+            int(max_workers),
+            render=lambda command: render_template(command, variables),
+            cache=self.command_cache,
+            progress=progress,
+            should_run=should_run,
+        )
+        for result in results:
+            if result["status"] == "unchanged":
+                continue
+            if result["status"] == "cached":
+                print(f"Scaffold command '{result['name']}' restored from cache in {result['duration']:.2f}s")
+            elif result["status"] == "succeeded":
+                print(f"Scaffold command '{result['name']}' finished in {result['duration']:.2f}s")
+            else:
+                print(f"Scaffold command '{result['name']}' {result['status']}: {result['error']}")
+        return results
+
+    def _clone_repositories(
+        self,
+        repositories: List[Dict[str, Any]],
+        instance_dir: str,
+        progress: Optional[ScaffoldProgress] = None,
+    ) -> List[str]:
+        """
+        Clone all repositories of an environment concurrently.
+
+        The number of clones running at once is bounded by the ``max_parallel_clones``
+        setting in config.yaml. Once the progress tracker is cancelled, clones that have
+        not started yet are not started.
 
-        return instance_dir
+        Args:
+            repositories: Repository configurations from the environment config
+            instance_dir: Instance directory the repository paths are relative to
+            progress: Optional progress tracker
 
-    def _clone_repository(self, repo_url: str, target_path: str, branch: Optional[str] = None) -> bool:
+        Returns:
+            URLs of the repositories that failed to clone
+        """
+        jobs = []
+        for repo_config in repositories:
+            repo_url = repo_config.get("url")
+            if repo_url:
+                target_path = os.path.join(instance_dir, repo_config.get("path", ""))
+                jobs.append((repo_url, target_path, repo_config.get("branch"), repo_config))
+
+        if not jobs:
+            return []
+        if progress is not None:
+            for repo_url, target_path, _, _ in jobs:
+                progress.update_repository(target_path, repo_url, "pending")
+
+        # A repository cloned into a parent directory of another one (e.g. path ".") has to be
+        # cloned first, otherwise git refuses to clone into the now non-empty directory.
+        targets = [os.path.normpath(target_path) for _, target_path, _, _ in jobs]
+        waves: Dict[int, List[int]] = {}
+        for index, target in enumerate(targets):
+            depth = sum(1 for other in targets if other != target and target.startswith(other + os.sep))
+            waves.setdefault(depth, []).append(index)
+
+        max_workers = self.config_manager.config.get("max_parallel_clones", DEFAULT_MAX_PARALLEL_CLONES)
+        max_workers = max(1, min(int(max_workers), len(jobs)))
+        failed = []
+        # Executor threads don't inherit the current span; bind it so clone spans nest under the scaffold
+        clone = propagate(self._clone_tracked_repository)
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ccm-clone") as executor:
+            for depth in sorted(waves):
+                futures = {index: executor.submit(clone, *jobs[index], progress) for index in waves[depth]}
+                failed.extend(index for index, future in futures.items() if not future.result())
+
+        return [jobs[index][0] for index in sorted(failed)]
+
+    def _clone_tracked_repository(
+        self,
+        repo_url: str,
+        target_path: str,
+        branch: Optional[str],
+        repo_config: Dict[str, Any],
+        progress: Optional[ScaffoldProgress],
+    ) -> bool:
+        """Clone a repository, reporting its status to the progress tracker."""
+        if progress is not None and progress.cancelled:
+            progress.update_repository(target_path, repo_url, "cancelled")
+            return False
+        if progress is not None:
+            progress.update_repository(target_path, repo_url, "cloning")
+        with span("clone", url=repo_url, path=target_path, branch=branch) as clone_span:
+            cloned = self._clone_repository(repo_url, target_path, branch, repo_config)
+            clone_span.set(succeeded=cloned)
+        if progress is not None:
+            progress.update_repository(target_path, repo_url, "cloned" if cloned else "failed")
+        return cloned
+
+    def _clone_repository(
+        self,
+        repo_url: str,
+        target_path: str,
+        branch: Optional[str] = None,
+        repo_config: Optional[Dict[str, Any]] = None,
+    ) -> bool:
         """
         Clone a Git repository.
 
@@ -135,25 +819,54 @@ class EnvironmentManager:
             repo_url: Repository URL
             target_path: Target path
             branch: Branch to checkout
+            repo_config: Repository entry whose filter, sparse_paths and submodules options to apply
 
         Returns:
             True if successful, False otherwise
         """
         try:
+            options = clone_options(repo_config or {})
+
             # Create parent directory if needed
             os.makedirs(os.path.dirname(target_path), exist_ok=True)
 
-            # Clone repository
+            # Clone through the local mirror cache when possible
+            if self.mirror_cache.enabled:
+                try:
+                    self.mirror_cache.clone(repo_url, target_path, branch, options)
+                    return True
+                except Exception as e:
+                    print(f"Error cloning {repo_url} from mirror cache, cloning directly: {e}")
+                    if os.path.isdir(target_path):
+                        self._clear_directory(target_path)
+
+            # Clone repository (GitPython is imported lazily to keep CLI startup fast)
+            import git
+
             clone_args = ["--depth", "1"]  # Shallow clone for speed
             if branch:
                 clone_args.extend(["--branch", branch])
+            if options["filter"]:
+                clone_args.append(f"--filter={options['filter']}")
+            if defers_checkout(options):
+                clone_args.append("--no-checkout")
 
-            git.Repo.clone_from(repo_url, target_path, multi_options=clone_args)
+            repo = git.Repo.clone_from(repo_url, target_path, multi_options=clone_args)
+            complete_checkout(repo, options)
             return True
         except Exception as e:
             print(f"Error cloning repository {repo_url}: {e}")
             return False
 
+    @staticmethod
+    def _clear_directory(path: str) -> None:
+        """Remove the contents of a directory left behind by a failed clone."""
+        for entry in os.scandir(path):
+            if entry.is_dir(follow_symlinks=False):
+                shutil.rmtree(entry.path, ignore_errors=True)
+            else:
+                os.remove(entry.path)
+
     def delete_environment(self, env_name: str) -> bool:
         """
         Delete an environment configuration.
@@ -170,6 +883,10 @@ class EnvironmentManager:
         """
         Delete an environment instance.
 
+        The instance directory is renamed into the trash and removed by a detached
+        low-priority reaper, so this returns immediately. When the directory cannot be
+        renamed (e.g. the trash would be on another filesystem) it is removed in place.
+
         Args:
             instance_id: Instance identifier
             remove_files: Whether to remove the instance files
@@ -182,16 +899,26 @@ class EnvironmentManager:
             return False
 
         # Remove instance directory
+        trashed = False
         if remove_files and "path" in instance_data:
             instance_path = instance_data["path"]
             if os.path.exists(instance_path):
                 try:
-                    shutil.rmtree(instance_path)
+                    trashed = self.trash.move(instance_path) is not None
+                    if not trashed:
+                        shutil.rmtree(instance_path)
                 except Exception as e:
                     print(f"Error removing instance directory: {e}")
 
         # Remove instance data
-        return self.config_manager.delete_instance(instance_id)
+        deleted = self.config_manager.delete_instance(instance_id)
+        try:
+            self.dedupe.release([instance_id])
+        except Exception as e:
+            print(f"Error releasing deduplicated files: {e}")
+        if trashed:
+            self.trash.reap_in_background()
+        return deleted
 
     def list_environments(self) -> Dict[str, Dict[str, str]]:
         """
@@ -214,6 +941,46 @@ class EnvironmentManager:
         """
         return self.config_manager.list_instances(env_name)
 
+    def query_instances(
+        self,
+        env_name: Optional[str] = None,
+        since: Optional[str] = None,
+        before: Optional[str] = None,
+        sort: str = "created",
+        limit: Optional[int] = None,
+        offset: int = 0,
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Iterate over matching instances without decoding their full records.
+
+        Sorted by creation time or environment, instances are streamed from the registry.
+        Sorted by size, every matching directory has to be measured first; the largest
+        instance comes first and each instance has a size key in bytes.
+
+        Args:
+            env_name: Optional environment name to filter by
+            since: Optional ISO time; only instances created at or after it
+            before: Optional ISO time; only instances created before it
+            sort: "created", "env" or "size"
+            limit: Maximum number of instances
+            offset: Number of matching instances to skip
+
+        Returns:
+            Iterator of dictionaries with id, environment, path and created_at keys
+        """
+        if sort != "size":
+            return self.config_manager.query_instances(env_name, since, before, sort, limit, offset)
+
+        instances = list(self.config_manager.query_instances(env_name, since, before))
+        with ThreadPoolExecutor(
+            max_workers=DEFAULT_MAX_PARALLEL_MEASUREMENTS, thread_name_prefix="ccm-measure"
+        ) as executor:
+            for instance, size in zip(instances, executor.map(dir_size, [instance["path"] for instance in instances])):
+                instance["size"] = size
+        instances.sort(key=lambda instance: instance["size"], reverse=True)
+        end = None if limit is None else offset + limit
+        return iter(instances[offset:end])
+
     def get_instance(self, instance_id: str) -> Optional[Dict[str, Any]]:
         """
         Get instance data.
@@ -225,3 +992,109 @@ class EnvironmentManager:
             Instance data dictionary or None if not found
         """
         return self.config_manager.get_instance(instance_id)
+
+
+def failed_commands(results: List[Dict[str, Any]]) -> List[str]:
+    """
+    Get the scaffold commands that neither succeeded nor were restored from cache.
+
+    Args:
+        results: Command results of a build report, or the scaffold_commands of an instance record
+
+    Returns:
+        Command names
+    """
+    return [result["name"] for result in results if result["status"] not in ("succeeded", "cached")]
+
+
+def build_errors(failed_repositories: List[str], results: List[Dict[str, Any]]) -> List[str]:
+    """
+    Describe what went wrong while building an instance.
+
+    Args:
+        failed_repositories: URLs of the repositories that failed to clone
+        results: Command results, see failed_commands
+
+    Returns:
+        One message for the repositories that failed to clone and one for the commands that
+        did not succeed; empty if the instance was built completely
+    """
+    errors = []
+    if failed_repositories:
+        errors.append("failed to clone " + ", ".join(failed_repositories))
+    commands = failed_commands(results)
+    if commands:
+        errors.append("scaffold commands did not succeed: " + ", ".join(commands))
+    return errors
+
+
+def scaffold_errors(instance_info: Dict[str, Any]) -> List[str]:
+    """
+    Describe what went wrong while scaffolding an instance.
+
+    Args:
+        instance_info: Instance data returned by scaffold_instance
+
+    Returns:
+        Messages from build_errors
+    """
+    return build_errors(instance_info.get("failed_repositories", []), instance_info.get("scaffold_commands", []))
+
+
+def path_dependent_commands(env_config: Dict[str, Any]) -> List[str]:
+    """
+    Get the scaffold commands that reference a variable differing between instances, e.g. WORK_DIR.
+
+    Golden images and pooled instances are built in a directory of their own and then
+    copied or moved; what such commands produce would describe the build instead.
+
+    Args:
+        env_config: Environment configuration
+
+    Returns:
+        Command names
+    """
+    from .commands import normalize_commands
+
+    try:
+        nodes = normalize_commands(env_config.get("scaffold_commands", []))
+    except ValueError:
+        return []
+    return [
+        node["name"]
+        for node in nodes
+        if any(is_instance_specific(name) for name in compile_template(node["command"]).names)
+    ]
+
+
+def embeds_build_dir(build_dir: str) -> bool:
+    """
+    Check whether a golden image or pooled instance build refers to the directory it was built in.
+
+    Virtualenv scripts, .pth files and generated configs embed the path they were created
+    at and would point at a directory that no longer exists once the build is copied or
+    moved into place. claude.md is not checked; it is rendered again for the final directory.
+
+    Args:
+        build_dir: Directory the instance was built in
+
+    Returns:
+        True if a file or symlink target contains the build directory's path
+    """
+    return mentions_path(build_dir, [entry for entry in os.listdir(build_dir) if entry != "claude.md"])
+
+
+def _content_hash(content: str) -> str:
+    """Get the SHA-256 hex digest of a text."""
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+def _render_shared(nodes: List[Dict[str, Any]], variables: Dict[str, str]) -> List[Dict[str, Any]]:
+    """
+    Render the variables shared by all instances (custom vars, commits) into command nodes.
+
+    Cache keys and input digests come from the command before rendering, so they change with
+    these variables but not with the instance's id and paths, which are rendered when it runs.
+    """
+    shared = {name: value for name, value in variables.items() if not is_instance_specific(name)}
+    return [dict(node, command=render_template(node["command"], shared)) for node in nodes]
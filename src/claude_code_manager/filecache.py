@@ -0,0 +1,73 @@
+"""
+Parsed-file cache for Claude Code Manager.
+Keeps the parsed contents of configuration files in memory until the file changes on disk.
+"""
+
+import os
+import threading
+from typing import Any, Callable, Dict, Optional, Tuple
+
+
+class FileCache:
+    """Caches the result of loading a file, keyed on its path and validated by (mtime_ns, size)."""
+
+    def __init__(self):
+        """Initialize an empty cache."""
+        self._lock = threading.Lock()
+        self._entries: Dict[str, Tuple[Tuple[int, int], Any]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, path: str, load: Callable[[str], Any]) -> Optional[Any]:
+        """
+        Get the loaded contents of a file, loading it only if it changed since the last call.
+
+        Args:
+            path: File path
+            load: Function reading and parsing the file at a path
+
+        Returns:
+            The loaded contents, or None if the file does not exist
+        """
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            with self._lock:
+                self._entries.pop(path, None)
+            return None
+        signature = (stat.st_mtime_ns, stat.st_size)
+
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is not None and entry[0] == signature:
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+
+        value = load(path)
+        with self._lock:
+            self._entries[path] = (signature, value)
+        return value
+
+    def invalidate(self, path: Optional[str] = None) -> None:
+        """
+        Forget the cached contents of a file, or of every file.
+
+        Args:
+            path: File path, or None to clear the whole cache
+        """
+        with self._lock:
+            if path is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(path, None)
+
+    def stats(self) -> Dict[str, int]:
+        """
+        Get the cache counters.
+
+        Returns:
+            Dictionary with hits, misses and entries keys
+        """
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "entries": len(self._entries)}
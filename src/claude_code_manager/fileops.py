@@ -0,0 +1,240 @@
+"""
+Filesystem helpers for Claude Code Manager.
+Provides copy-on-write tree copies and directory size accounting.
+"""
+
+import errno
+import fcntl
+import json
+import os
+import shutil
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+# ioctl request number of Linux FICLONE (_IOW(0x94, 9, int))
+FICLONE = 0x40049409
+
+# How often caches re-measure their entries even while under their size limit, e.g. to evict old entries
+PRUNE_INTERVAL_SECONDS = 3600
+
+# errno values meaning "this filesystem (pair) cannot reflink", as opposed to a real I/O error
+_REFLINK_UNSUPPORTED = {errno.EOPNOTSUPP, errno.ENOTTY, errno.EXDEV, errno.EINVAL, errno.ENOSYS, errno.EPERM}
+
+
+def dir_size(path: str) -> int:
+    """
+    Get the total size of all files below a directory.
+
+    Args:
+        path: Directory path
+
+    Returns:
+        Size in bytes
+    """
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.lstat(os.path.join(root, name)).st_size
+            except OSError:
+                pass
+    return total
+
+
+def mentions_path(directory: str, entries: Optional[List[str]] = None) -> bool:
+    """
+    Check whether files below a directory contain its absolute path.
+
+    Files such as virtualenv scripts, .pth files and generated configs embed the path they
+    were created at and break when their directory is moved or copied elsewhere. Git
+    directories are skipped.
+
+    Args:
+        directory: Directory whose path is searched for
+        entries: Paths relative to the directory to search; defaults to all of it
+
+    Returns:
+        True if a file or symlink target contains the path
+    """
+    needle = os.fsencode(os.path.abspath(directory))
+    paths = []
+    for entry in entries if entries is not None else os.listdir(directory):
+        path = os.path.join(directory, entry)
+        if not os.path.isdir(path) or os.path.islink(path):
+            paths.append(path)
+            continue
+        if entry == ".git":
+            continue
+        for root, dirs, files in os.walk(path):
+            dirs[:] = [name for name in dirs if name != ".git"]
+            # os.walk lists symlinks to directories under dirs without following them
+            paths.extend(os.path.join(root, name) for name in dirs + files)
+
+    for path in paths:
+        if os.path.islink(path):
+            if needle in os.fsencode(os.readlink(path)):
+                return True
+        elif os.path.isfile(path):
+            with open(path, "rb") as f:
+                # Keep the end of the previous chunk so a path split across two chunks is found
+                tail = b""
+                for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                    if needle in tail + chunk:
+                        return True
+                    tail = chunk[1 - len(needle) :]
+    return False
+
+
+def reflink_file(src: str, dst: str) -> bool:
+    """
+    Copy a file as a copy-on-write reflink.
+
+    Args:
+        src: Source file
+        dst: Destination file, created or truncated
+
+    Returns:
+        True if the reflink succeeded, False if the filesystem does not support it
+    """
+    with open(src, "rb") as src_file, open(dst, "wb") as dst_file:
+        try:
+            fcntl.ioctl(dst_file.fileno(), FICLONE, src_file.fileno())
+        except OSError as e:
+            if e.errno in _REFLINK_UNSUPPORTED:
+                return False
+            raise
+    shutil.copystat(src, dst)
+    return True
+
+
+def copy_tree(src: str, dst: str, can_hardlink: Optional[Callable[[str], bool]] = None) -> Dict[str, int]:
+    """
+    Copy a directory tree as cheaply as the filesystem allows.
+
+    Every file is reflinked when possible. Otherwise, files accepted by
+    ``can_hardlink`` (immutable files such as git objects) are hardlinked and all
+    other files are copied. Once a reflink fails the remaining files skip the attempt.
+
+    Args:
+        src: Source directory
+        dst: Destination directory, created if needed
+        can_hardlink: Predicate on the source-relative path of a file
+
+    Returns:
+        Number of files that were reflinked, hardlinked and copied
+    """
+    counts = {"reflinked": 0, "hardlinked": 0, "copied": 0}
+    try_reflink = True
+    copied_dirs = []
+    for root, dirs, files in os.walk(src):
+        rel_root = os.path.relpath(root, src)
+        dst_root = os.path.normpath(os.path.join(dst, rel_root))
+        os.makedirs(dst_root, exist_ok=True)
+        copied_dirs.append((root, dst_root))
+
+        # os.walk lists symlinks to directories under dirs; recreate them as links
+        for name in list(dirs):
+            src_path = os.path.join(root, name)
+            if os.path.islink(src_path):
+                os.symlink(os.readlink(src_path), os.path.join(dst_root, name))
+                dirs.remove(name)
+
+        for name in files:
+            src_path = os.path.join(root, name)
+            dst_path = os.path.join(dst_root, name)
+            if os.path.islink(src_path):
+                os.symlink(os.readlink(src_path), dst_path)
+                continue
+            if try_reflink:
+                if reflink_file(src_path, dst_path):
+                    counts["reflinked"] += 1
+                    continue
+                try_reflink = False
+                os.remove(dst_path)
+            if can_hardlink is not None and can_hardlink(os.path.normpath(os.path.join(rel_root, name))):
+                try:
+                    os.link(src_path, dst_path)
+                    counts["hardlinked"] += 1
+                    continue
+                except OSError:
+                    pass
+            shutil.copy2(src_path, dst_path)
+            counts["copied"] += 1
+
+    # Apply directory modes last so read-only directories can still be filled
+    for src_dir, dst_dir in reversed(copied_dirs):
+        shutil.copystat(src_dir, dst_dir)
+    return counts
+
+
+class SizeLedger:
+    """
+    Sizes of a cache's entries, kept in a small JSON file so the cache need not be walked on every store.
+
+    A cache records the size of each entry it adds and only prunes, measuring every entry,
+    when the recorded total exceeds its limit or PRUNE_INTERVAL_SECONDS have passed since
+    the last prune. Pruning replaces the recorded sizes with the measured ones, which
+    corrects drift such as entries growing or being removed by hand.
+    """
+
+    def __init__(self, path: str):
+        """
+        Initialize the ledger.
+
+        Args:
+            path: JSON file of the ledger, created on first use
+        """
+        self.path = path
+
+    def _update(self, update: Optional[Callable[[Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+        """Read the ledger and apply an update to it, under an exclusive lock."""
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with open(self.path, "a+") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            f.seek(0)
+            try:
+                state = json.loads(f.read() or "{}")
+            except ValueError:
+                state = {}
+            state = {"sizes": state.get("sizes") or {}, "pruned_at": state.get("pruned_at")}
+            if update is not None:
+                update(state)
+                f.seek(0)
+                f.truncate()
+                json.dump(state, f)
+        return state
+
+    def record(self, name: str, size: int) -> None:
+        """
+        Record the size of an added or updated entry.
+
+        Args:
+            name: Entry name
+            size: Size in bytes
+        """
+        self._update(lambda state: state["sizes"].__setitem__(name, size))
+
+    def reset(self, sizes: Dict[str, int]) -> None:
+        """
+        Replace the recorded sizes with measured ones after a prune.
+
+        Args:
+            sizes: Size in bytes by entry name
+        """
+        self._update(lambda state: state.update(sizes=dict(sizes), pruned_at=time.time()))
+
+    def prune_due(self, max_size_bytes: int) -> bool:
+        """
+        Whether the cache should be pruned.
+
+        Args:
+            max_size_bytes: Size limit of the cache
+
+        Returns:
+            True if the cache was never pruned, its recorded total exceeds the limit or
+            the last prune is older than PRUNE_INTERVAL_SECONDS
+        """
+        state = self._update()
+        if state["pruned_at"] is None or time.time() - state["pruned_at"] > PRUNE_INTERVAL_SECONDS:
+            return True
+        return sum(state["sizes"].values()) > max_size_bytes
@@ -0,0 +1,235 @@
+"""
+Instance garbage collection for Claude Code Manager.
+Applies per-environment retention policies and reconciles instance records with the work directory.
+"""
+
+import os
+import re
+import shutil
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import TYPE_CHECKING, Any, Dict, List, Optional
+
+from .fileops import dir_size
+
+if TYPE_CHECKING:
+    from .environment import EnvironmentManager
+
+DEFAULT_MAX_PARALLEL_DELETES = 4
+# Directories younger than this may belong to a scaffold that has not saved its record yet
+ORPHAN_GRACE_SECONDS = 3600
+# Instance directories created in the default work directory are named <env>_<first 8 hex digits of the id>
+_INSTANCE_DIR_PATTERN = re.compile(r".+_([0-9a-f]{8})")
+# File holding the instance id, written into the directories ccm creates for instances
+INSTANCE_MARKER = ".ccm-instance"
+
+# Reasons an instance or directory is collected, in the order they are reported
+REASONS = {
+    "expired": "Older than the environment's gc.ttl_hours",
+    "over_limit": "Beyond the environment's gc.max_instances",
+    "missing_directory": "Instance record whose directory no longer exists",
+    "orphan_directory": "Instance directory in the work directory without an instance record",
+}
+
+
+def write_instance_marker(instance_dir: str, instance_id: str) -> None:
+    """
+    Mark a directory created by ccm as an instance, so ``ccm gc`` may remove it once its record is gone.
+
+    Args:
+        instance_dir: Instance directory
+        instance_id: Instance identifier
+    """
+    with open(os.path.join(instance_dir, INSTANCE_MARKER), "w") as f:
+        f.write(instance_id)
+
+
+def _marked_instance_id(path: str) -> Optional[str]:
+    """Read the instance id from a directory's marker, or None if it has none."""
+    try:
+        with open(os.path.join(path, INSTANCE_MARKER)) as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+
+class GarbageCollector:
+    """Finds and removes expired, excess and orphaned instances."""
+
+    def __init__(self, env_manager: "EnvironmentManager"):
+        """
+        Initialize the garbage collector.
+
+        Args:
+            env_manager: Environment manager owning the instances
+        """
+        self.env_manager = env_manager
+        self.config_manager = env_manager.config_manager
+
+    @staticmethod
+    def get_policy(env_config: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Get the retention policy of an environment.
+
+        Args:
+            env_config: Environment configuration
+
+        Returns:
+            Dictionary with ttl_hours and max_instances keys, None when not limited
+        """
+        settings = env_config.get("gc") or {}
+        ttl_hours = settings.get("ttl_hours")
+        max_instances = settings.get("max_instances")
+        return {
+            "ttl_hours": float(ttl_hours) if ttl_hours is not None else None,
+            "max_instances": int(max_instances) if max_instances is not None else None,
+        }
+
+    def plan(self) -> List[Dict[str, Any]]:
+        """
+        Find everything a collection would remove.
+
+        Returns:
+            List of candidate dictionaries with reason, instance_id, environment and path keys;
+            instance_id is None for orphan directories
+        """
+        now = time.time()
+        instances = self.config_manager.registry.summaries()
+        candidates: List[Dict[str, Any]] = []
+        collected = set()
+
+        def add(reason: str, instance: Dict[str, Any]) -> None:
+            collected.add(instance["id"])
+            candidates.append(
+                {
+                    "reason": reason,
+                    "instance_id": instance["id"],
+                    "environment": instance["environment"],
+                    "path": instance["path"],
+                }
+            )
+
+        # Records without a directory
+        for instance in instances:
+            if not instance["path"] or not os.path.exists(instance["path"]):
+                add("missing_directory", instance)
+
+        # Retention policies, newest instances first so max_instances keeps the most recent ones
+        by_environment: Dict[str, List[Dict[str, Any]]] = {}
+        for instance in reversed(instances):
+            if instance["id"] not in collected:
+                by_environment.setdefault(instance["environment"], []).append(instance)
+        for env_name, env_instances in by_environment.items():
+            env_config = self.config_manager.get_environment_config(env_name)
+            if env_config is None:
+                continue
+            policy = self.get_policy(env_config)
+            kept = 0
+            for instance in env_instances:
+                created = _parse_timestamp(instance["created_at"])
+                if policy["ttl_hours"] is not None and created is not None:
+                    if now - created > policy["ttl_hours"] * 3600:
+                        add("expired", instance)
+                        continue
+                if policy["max_instances"] is not None and kept >= policy["max_instances"]:
+                    add("over_limit", instance)
+                    continue
+                kept += 1
+
+        # Instance directories without a record. Only directories ccm created and marked are
+        # considered, so other directories in the work directory are never removed
+        work_dir = self.config_manager.get_default_work_dir()
+        known_paths = {os.path.abspath(instance["path"]) for instance in instances if instance["path"]}
+        known_ids = {instance["id"] for instance in instances}
+        if os.path.isdir(work_dir):
+            for entry in os.scandir(work_dir):
+                if entry.name.startswith(".") or not entry.is_dir(follow_symlinks=False):
+                    continue
+                match = _INSTANCE_DIR_PATTERN.fullmatch(entry.name)
+                if not match or os.path.abspath(entry.path) in known_paths:
+                    continue
+                marked_id = _marked_instance_id(entry.path)
+                if not marked_id or not marked_id.startswith(match.group(1)) or marked_id in known_ids:
+                    continue
+                if now - entry.stat(follow_symlinks=False).st_ctime < ORPHAN_GRACE_SECONDS:
+                    continue
+                candidates.append(
+                    {"reason": "orphan_directory", "instance_id": None, "environment": None, "path": entry.path}
+                )
+
+        return candidates
+
+    def measure(
+        self, candidates: List[Dict[str, Any]], max_workers: int = DEFAULT_MAX_PARALLEL_DELETES
+    ) -> List[Dict[str, Any]]:
+        """
+        Add the reclaimable bytes of each candidate under its size key.
+
+        Args:
+            candidates: Candidates from plan
+            max_workers: Maximum number of directories measured at once
+
+        Returns:
+            The candidates, for callers that receive a copy of them (such as ccm clients of the daemon)
+        """
+
+        def size(candidate: Dict[str, Any]) -> int:
+            if candidate["reason"] == "missing_directory":
+                return 0
+            return dir_size(candidate["path"])
+
+        with ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix="ccm-gc") as executor:
+            for candidate, candidate_size in zip(candidates, executor.map(size, candidates)):
+                candidate["size"] = candidate_size
+        return candidates
+
+    def collect(self, candidates: List[Dict[str, Any]], max_workers: int = DEFAULT_MAX_PARALLEL_DELETES) -> int:
+        """
+        Remove the candidates' directories and instance records.
+
+        Directories are moved to the trash and reaped in parallel; those that cannot be
+        moved are removed in place. The removed instances' references to the dedupe store
+        are released, along with those of pooled instances discarded since.
+
+        Args:
+            candidates: Candidates from plan
+            max_workers: Maximum number of directories removed at once
+
+        Returns:
+            Number of candidates removed
+        """
+        paths = [candidate["path"] for candidate in candidates if candidate["reason"] != "missing_directory"]
+        with ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix="ccm-gc") as executor:
+            list(executor.map(self._remove_directory, paths))
+
+        instance_ids = [candidate["instance_id"] for candidate in candidates if candidate["instance_id"]]
+        if instance_ids:
+            self.config_manager.delete_instances(instance_ids)
+
+        # Release the deduplicated files of the collected instances, and of pooled instances discarded since
+        try:
+            self.env_manager.dedupe.release(instance_ids)
+            known_ids = [instance["id"] for instance in self.config_manager.registry.summaries()]
+            self.env_manager.dedupe.release_unknown(known_ids + self.env_manager.pool.instance_ids())
+        except Exception as e:
+            print(f"Error releasing deduplicated files: {e}")
+
+        self.env_manager.trash.reap(max_workers)
+        return len(candidates)
+
+    def _remove_directory(self, path: str) -> None:
+        """Trash a directory, or remove it in place when it cannot be renamed."""
+        try:
+            if os.path.exists(path) and self.env_manager.trash.move(path) is None:
+                shutil.rmtree(path, ignore_errors=True)
+        except Exception as e:
+            print(f"Error removing instance directory {path}: {e}")
+
+
+def _parse_timestamp(timestamp: Optional[str]) -> Optional[float]:
+    """Convert a created_at value to an epoch timestamp, or None if it cannot be parsed."""
+    try:
+        return datetime.fromisoformat(str(timestamp)).timestamp()
+    except ValueError:
+        return None
@@ -0,0 +1,245 @@
+"""
+Golden image scaffolding for Claude Code Manager.
+Builds an environment once into a template directory and materializes instances from it copy-on-write.
+"""
+
+import fcntl
+import hashlib
+import json
+import os
+import shutil
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Any, Dict, Iterator, List, Optional
+
+from .fileops import copy_tree
+
+if TYPE_CHECKING:
+    from .environment import EnvironmentManager
+
+
+def _is_immutable(rel_path: str) -> bool:
+    """Whether a template file is never modified in place and can be shared by hardlink."""
+    parts = rel_path.split(os.sep)
+    for index in range(len(parts) - 2):
+        if parts[index] == ".git" and parts[index + 1] == "objects":
+            return True
+    return False
+
+
+class GoldenImageStore:
+    """Manages golden image templates keyed by environment config and repository HEADs."""
+
+    def __init__(self, env_manager: "EnvironmentManager"):
+        """
+        Initialize the golden image store.
+
+        Args:
+            env_manager: Environment manager used to build templates
+        """
+        self.env_manager = env_manager
+        self.config_manager = env_manager.config_manager
+
+    @property
+    def golden_dir(self) -> str:
+        """Root of the templates, inside the work directory so reflinks and hardlinks stay on one filesystem."""
+        return os.path.join(self.config_manager.get_default_work_dir(), ".golden")
+
+    @staticmethod
+    def enabled(env_config: Dict[str, Any]) -> bool:
+        """Whether an environment is scaffolded from golden images."""
+        return bool(env_config.get("golden_image", False))
+
+    def _resolve_heads(self, repositories: List[Dict[str, Any]]) -> List[str]:
+        """
+        Resolve the current remote commit of every repository with ``git ls-remote``.
+
+        Args:
+            repositories: Repository configurations from the environment config
+
+        Returns:
+            Commit SHAs in repository order
+
+        Raises:
+            ValueError: If a repository or branch cannot be resolved
+        """
+
+        import git
+
+        def resolve(repo_config: Dict[str, Any]) -> str:
+            ref = repo_config.get("branch") or "HEAD"
+            output = git.Git().ls_remote(repo_config["url"], ref)
+            for line in output.splitlines():
+                sha, _, name = line.partition("\t")
+                if name in (ref, f"refs/heads/{ref}", f"refs/tags/{ref}"):
+                    return sha
+            raise ValueError(f"Cannot resolve {ref} of {repo_config['url']}")
+
+        repositories = [repo_config for repo_config in repositories if repo_config.get("url")]
+        if not repositories:
+            return []
+        max_workers = max(1, min(int(self.config_manager.config.get("max_parallel_clones", 4)), len(repositories)))
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="ccm-ls-remote") as executor:
+            return list(executor.map(resolve, repositories))
+
+    def template_key(self, env_name: str, env_config: Dict[str, Any]) -> str:
+        """
+        Compute the template key of an environment.
+
+        The key covers the environment config, the claude.md template and the current
+        HEAD of every repository, so any upstream change yields a new template.
+
+        Args:
+            env_name: Name of the environment
+            env_config: Environment configuration
+
+        Returns:
+            Hex digest identifying the template
+        """
+        digest = hashlib.sha256()
+        digest.update(json.dumps(env_config, sort_keys=True, default=str).encode("utf-8"))
+        digest.update((self.config_manager.get_claude_md_template(env_name) or "").encode("utf-8"))
+        for sha in self._resolve_heads(env_config.get("repositories", [])):
+            digest.update(sha.encode("ascii"))
+        return digest.hexdigest()
+
+    def _template_path(self, env_name: str, key: str) -> str:
+        """Get the template directory of an environment for a key."""
+        return os.path.join(self.golden_dir, f"{env_name}-{key[:16]}")
+
+    @contextmanager
+    def _lock(self, template_path: str, exclusive: bool, blocking: bool = True) -> Iterator[bool]:
+        """
+        Hold a lock on a template: shared while copying from it, exclusive while building or removing it.
+
+        Args:
+            template_path: Template directory
+            exclusive: Whether to take an exclusive lock
+            blocking: Whether to wait for the lock
+
+        Yields:
+            True if the lock was acquired, False otherwise (only when not blocking)
+        """
+        os.makedirs(self.golden_dir, exist_ok=True)
+        flags = fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH
+        if not blocking:
+            flags |= fcntl.LOCK_NB
+        with open(f"{template_path}.lock", "a") as lock_file:
+            try:
+                fcntl.flock(lock_file, flags)
+            except BlockingIOError:
+                yield False
+                return
+            try:
+                yield True
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def ensure_template(self, env_name: str, env_config: Dict[str, Any]) -> Optional[str]:
+        """
+        Get the current template of an environment, building it if needed.
+
+        Building replaces older templates of the same environment that are not in use. No
+        template is used for environments whose scaffold commands reference WORK_DIR or other
+        instance-specific variables. A build with a repository that failed to clone or a command
+        that did not succeed is discarded and retried by the next scaffold; a build whose files
+        contain the build directory's path is discarded and not retried until the template key
+        changes, e.g. because a repository moved on.
+
+        Args:
+            env_name: Name of the environment
+            env_config: Environment configuration
+
+        Returns:
+            Path to the template or None if it could not be built
+        """
+        from .environment import build_errors, embeds_build_dir, path_dependent_commands
+
+        commands = path_dependent_commands(env_config)
+        if commands:
+            print(f"Not using a golden image for '{env_name}', these commands use instance paths: {commands}")
+            return None
+        template_path = self._template_path(env_name, self.template_key(env_name, env_config))
+        if os.path.isdir(template_path):
+            return template_path
+        if os.path.exists(f"{template_path}.unusable"):
+            return None
+
+        with self._lock(template_path, exclusive=True):
+            if os.path.isdir(template_path):
+                return template_path
+
+            build_path = f"{template_path}.building"
+            shutil.rmtree(build_path, ignore_errors=True)
+            build_report = self.env_manager._build_instance(env_name, env_config, build_path)
+            errors = build_errors(build_report["failed_repositories"], build_report["commands"])
+            if errors:
+                print(f"Not saving golden image of '{env_name}', {'; '.join(errors)}")
+                shutil.rmtree(build_path, ignore_errors=True)
+                return None
+            if embeds_build_dir(build_path):
+                print(f"Not using a golden image for '{env_name}', the built files contain the build directory")
+                shutil.rmtree(build_path, ignore_errors=True)
+                # Building it again would embed the build directory again
+                with open(f"{template_path}.unusable", "w"):
+                    pass
+                return None
+            os.rename(build_path, template_path)
+
+        self._remove_old_templates(env_name, keep=template_path)
+        return template_path
+
+    def materialize(self, env_name: str, env_config: Dict[str, Any], instance_dir: str) -> bool:
+        """
+        Create an instance directory from the environment's golden image.
+
+        Args:
+            env_name: Name of the environment
+            env_config: Environment configuration
+            instance_dir: Directory of the new instance
+
+        Returns:
+            True if the instance was materialized, False if the caller should build it normally
+        """
+        try:
+            template_path = self.ensure_template(env_name, env_config)
+        except Exception as e:
+            print(f"Error preparing golden image for '{env_name}': {e}")
+            return False
+        if template_path is None:
+            return False
+
+        with self._lock(template_path, exclusive=False):
+            if not os.path.isdir(template_path):
+                return False
+            copy_tree(template_path, instance_dir, can_hardlink=_is_immutable)
+        return True
+
+    def list_templates(self) -> List[Dict[str, Any]]:
+        """
+        List all golden image templates.
+
+        Returns:
+            List of dictionaries with name and path keys
+        """
+        if not os.path.isdir(self.golden_dir):
+            return []
+        return [
+            {"name": entry.name, "path": entry.path}
+            for entry in os.scandir(self.golden_dir)
+            if entry.is_dir() and not entry.name.endswith((".building", ".removing"))
+        ]
+
+    def _remove_old_templates(self, env_name: str, keep: str) -> None:
+        """Remove superseded templates of an environment that no instance is currently copied from."""
+        for template in self.list_templates():
+            name, _, _ = template["name"].rpartition("-")
+            if name != env_name or template["path"] == keep:
+                continue
+            with self._lock(template["path"], exclusive=True, blocking=False) as acquired:
+                if not acquired:
+                    continue
+                removing_path = f"{template['path']}.{uuid.uuid4().hex[:8]}.removing"
+                os.rename(template["path"], removing_path)
+            shutil.rmtree(removing_path, ignore_errors=True)
@@ -0,0 +1,200 @@
+"""
+Background scaffold jobs for the MCP server.
+Lets a client start a scaffold, poll its progress and cancel it without blocking on the tool call.
+"""
+
+import asyncio
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional
+
+from ..environment import EnvironmentManager, failed_commands, scaffold_errors
+from ..profiling import tool_profiler
+from ..progress import ScaffoldCancelled, ScaffoldProgress
+
+DEFAULT_MAX_SCAFFOLD_JOBS = 2
+# Finished jobs kept around for scaffold_status; the oldest are forgotten first
+MAX_FINISHED_JOBS = 100
+
+
+class ScaffoldJob:
+    """A scaffold running (or queued) in the background."""
+
+    def __init__(self, env_name: str, work_dir: Optional[str]):
+        """
+        Initialize a queued job.
+
+        Args:
+            env_name: Name of the environment
+            work_dir: Working directory for the instance
+        """
+        self.id = uuid.uuid4().hex[:12]
+        self.env_name = env_name
+        self.work_dir = work_dir
+        self.progress = ScaffoldProgress()
+        self.status = "queued"
+        self.instance: Optional[Dict[str, Any]] = None
+        self.error: Optional[str] = None
+        self.created = time.monotonic()
+        self.finished: Optional[float] = None
+        self.task: Optional[asyncio.Task] = None
+
+    @property
+    def done(self) -> bool:
+        """Whether the job has finished, successfully or not."""
+        return self.status in ("succeeded", "failed", "cancelled")
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Describe the job for the scaffold_status tool.
+
+        Returns:
+            Dictionary with job_id, env_name, status, phase, elapsed, repositories and commands
+            keys, plus instance once the scaffold finished and error once failed. A scaffold
+            whose repositories failed to clone or whose commands failed also failed; its
+            instance is kept and failed_repositories and failed_commands name what went wrong
+        """
+        progress = self.progress.snapshot()
+        end = self.finished if self.finished is not None else time.monotonic()
+        job = {
+            "job_id": self.id,
+            "env_name": self.env_name,
+            "status": self.status,
+            "phase": progress["phase"] if self.status == "running" else self.status,
+            "elapsed": round(end - self.created, 3),
+            "instance_id": progress["instance_id"],
+            "path": progress["path"],
+            "repositories": progress["repositories"],
+            "commands": progress["commands"],
+        }
+        if self.instance is not None:
+            job["instance"] = self.instance
+            if self.status == "failed":
+                job["failed_repositories"] = self.instance.get("failed_repositories", [])
+                job["failed_commands"] = failed_commands(self.instance.get("scaffold_commands", []))
+        if self.error is not None:
+            job["error"] = self.error
+        return job
+
+
+class ScaffoldJobManager:
+    """Runs scaffold jobs on the event loop, at most ``max_jobs`` at once."""
+
+    def __init__(self, get_manager: Callable[[], EnvironmentManager], max_jobs: Optional[int] = None):
+        """
+        Initialize the job manager.
+
+        Args:
+            get_manager: Returns the environment manager the jobs scaffold with
+            max_jobs: Maximum number of concurrently running scaffolds; defaults to the
+                ``mcp_max_scaffold_jobs`` setting in config.yaml
+        """
+        self._get_manager = get_manager
+        self._max_jobs = max_jobs
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._jobs: "OrderedDict[str, ScaffoldJob]" = OrderedDict()
+
+    def _slots(self) -> asyncio.Semaphore:
+        """Create the concurrency semaphore on first use, inside the running event loop."""
+        if self._semaphore is None:
+            max_jobs = self._max_jobs
+            if max_jobs is None:
+                config = self._get_manager().config_manager.config
+                max_jobs = config.get("mcp_max_scaffold_jobs", DEFAULT_MAX_SCAFFOLD_JOBS)
+            self._semaphore = asyncio.Semaphore(max(1, int(max_jobs)))
+        return self._semaphore
+
+    def start(self, env_name: str, work_dir: Optional[str] = None) -> ScaffoldJob:
+        """
+        Queue a scaffold and return immediately.
+
+        Args:
+            env_name: Name of the environment
+            work_dir: Working directory for the instance
+
+        Returns:
+            The new job
+        """
+        job = ScaffoldJob(env_name, work_dir)
+        self._jobs[job.id] = job
+        job.task = asyncio.get_running_loop().create_task(self._run(job))
+        self._forget_finished()
+        return job
+
+    def get(self, job_id: str) -> Optional[ScaffoldJob]:
+        """
+        Get a job.
+
+        Args:
+            job_id: Job identifier
+
+        Returns:
+            The job or None if unknown
+        """
+        return self._jobs.get(job_id)
+
+    def list(self) -> List[ScaffoldJob]:
+        """
+        List known jobs, oldest first.
+
+        Returns:
+            List of jobs
+        """
+        return list(self._jobs.values())
+
+    def cancel(self, job_id: str) -> Optional[ScaffoldJob]:
+        """
+        Cancel a job. A queued job never starts; a running one stops at its next clone,
+        command or phase boundary, kills its running commands and removes its directory.
+
+        Args:
+            job_id: Job identifier
+
+        Returns:
+            The job or None if unknown
+        """
+        job = self._jobs.get(job_id)
+        if job is None or job.done:
+            return job
+        job.progress.cancel()
+        if job.status == "queued" and job.task is not None:
+            job.task.cancel()
+        return job
+
+    async def _run(self, job: ScaffoldJob) -> None:
+        """Run a job once a slot is free and record its outcome."""
+        try:
+            async with self._slots():
+                if job.progress.cancelled:
+                    raise ScaffoldCancelled("Scaffold cancelled")
+                job.status = "running"
+                instance = await asyncio.to_thread(
+                    tool_profiler.call,
+                    "scaffold_start",
+                    self._get_manager().scaffold_instance,
+                    job.env_name,
+                    job.work_dir,
+                    job.progress,
+                )
+            if instance is None:
+                job.status = "failed"
+                job.error = f"Environment '{job.env_name}' does not exist"
+            else:
+                job.instance = instance
+                errors = scaffold_errors(instance)
+                job.status = "failed" if errors else "succeeded"
+                job.error = "; ".join(errors) or None
+        except (ScaffoldCancelled, asyncio.CancelledError):
+            job.status = "cancelled"
+        except Exception as e:
+            job.status = "failed"
+            job.error = str(e)
+        finally:
+            job.finished = time.monotonic()
+
+    def _forget_finished(self) -> None:
+        """Drop the oldest finished jobs beyond MAX_FINISHED_JOBS."""
+        finished = [job_id for job_id, job in self._jobs.items() if job.done]
+        for job_id in finished[: max(0, len(finished) - MAX_FINISHED_JOBS)]:
+            del self._jobs[job_id]
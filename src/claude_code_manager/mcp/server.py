@@ -1,136 +1,346 @@
+import asyncio
+import io
 import os
-import subprocess
-from collections.abc import Sequence
-from typing import Optional
+import sys
+from typing import Any, Dict, List, Optional
 
+import anyio
 from mcp.server.fastmcp import FastMCP
+from mcp.server.stdio import stdio_server
 
-mcp = FastMCP("claude-code-manager")
+from ..environment import EnvironmentManager
+from ..profiling import tool_profiler
+from ..tracing import span
+from .jobs import ScaffoldJobManager
 
 
-def _subprocess(command: Sequence[str], cwd: str) -> str:
-    """Call to `subprocess.check_output` with exception output exposed.
+class _TracedFastMCP(FastMCP):
+    """FastMCP server recording each tool call as the root span of the work it does."""
 
-    This is used to provide additional context to the `mcp.tool`.
+    async def call_tool(self, name: str, arguments: Dict[str, Any]) -> Any:
+        with span(f"mcp.{name}", tool=name, arguments=arguments):
+            return await super().call_tool(name, arguments)
 
-    Args:
-        command: Sequence of command arguments.
-        cwd: Current working directory.
 
-    Returns:
-        Decoded command output.
-    """
-    try:
-        return subprocess.check_output(
-            command,
-            cwd=cwd,
-            stderr=subprocess.STDOUT,
-        ).decode("utf-8")
-    except subprocess.CalledProcessError as e:
-        raise Exception(e.output)
+mcp = _TracedFastMCP("claude-code-manager")
+
+_env_manager: Optional[EnvironmentManager] = None
+
+
+def _manager() -> EnvironmentManager:
+    """Get the environment manager shared by all tool calls of this server process."""
+    global _env_manager
+    if _env_manager is None:
+        _env_manager = EnvironmentManager()
+    return _env_manager
+
+
+_jobs = ScaffoldJobManager(_manager)
+
+
+def _instance_summary(instance: Dict[str, Any]) -> Dict[str, Any]:
+    """Select the instance fields returned by the tools."""
+    return {
+        "id": instance.get("id", ""),
+        "environment": instance.get("environment", ""),
+        "path": instance.get("path", ""),
+        "created_at": instance.get("created_at", ""),
+    }
+
+
+def _command_help(name: str) -> str:
+    """Render the --help text of a ccm command without spawning the CLI."""
+    import click
+
+    from ..cli import cli
+
+    command = cli.commands[name]
+    with click.Context(command, info_name=f"ccm {name}") as ctx:
+        return command.get_help(ctx)
+
 
 @mcp.tool()
-async def list_environments():
+async def list_environments() -> List[Dict[str, Any]]:
     """
     List all configured environment types.
     """
-    return _subprocess(["ccm", "envs"], cwd=os.getcwd())
+    environments = await asyncio.to_thread(tool_profiler.call, "list_environments", _manager().list_environments)
+    return [{"name": name, "description": env.get("description", "")} for name, env in environments.items()]
+
 
 @mcp.tool()
-async def list_instances(env_name: Optional[str] = None):
+async def list_instances(
+    env_name: Optional[str] = None,
+    limit: Optional[int] = None,
+    offset: int = 0,
+    sort: str = "created",
+    since: Optional[str] = None,
+    before: Optional[str] = None,
+) -> List[Dict[str, Any]]:
     """
     Show existing environment instances.
 
     ENV_NAME is an optional environment name to filter instances.
+    LIMIT and OFFSET page through the instances; SORT is "created" (default), "env" or
+    "size" (largest first, with a size in bytes). SINCE and BEFORE filter by creation time,
+    given as an ISO date/time or an age like "2h", "3d" or "1w".
     """
-    return _subprocess(["ccm", "list", env_name], cwd=os.getcwd())
+    if sort not in ("created", "env", "size"):
+        raise ValueError(f"Invalid sort: {sort}")
+
+    def query() -> List[Dict[str, Any]]:
+        from ..registry import parse_time_bound
+
+        instances = _manager().query_instances(
+            env_name,
+            parse_time_bound(since) if since else None,
+            parse_time_bound(before) if before else None,
+            sort,
+            limit,
+            offset,
+        )
+        return list(instances)
+
+    return await asyncio.to_thread(tool_profiler.call, "list_instances", query)
+
 
 @mcp.tool()
-async def delete(instance_id: Optional[str] = None, env: Optional[str] = None):
+async def delete(instance_id: Optional[str] = None, env: Optional[str] = None) -> Dict[str, Any]:
     """
     Delete an environment instance. Call this when you're done with the environment.
 
     INSTANCE_ID is the ID of the instance to delete.
     ENV is an optional environment name to filter instances.
     """
-    return _subprocess(["ccm", "del", instance_id, "--env", env], cwd=os.getcwd())
+    if not instance_id:
+        instances = await asyncio.to_thread(tool_profiler.call, "delete", _manager().list_instances, env)
+        raise ValueError(
+            "instance_id is required; existing instances: "
+            + ", ".join(f"{instance.get('id')} ({instance.get('path')})" for instance in instances)
+        )
+
+    instance = await asyncio.to_thread(tool_profiler.call, "delete", _manager().get_instance, instance_id)
+    if instance is None or (env and instance.get("environment") != env):
+        raise ValueError(f"Instance not found: {instance_id}")
+
+    deleted = await asyncio.to_thread(tool_profiler.call, "delete", _manager().delete_instance, instance_id)
+    return {"deleted": deleted, "instance": _instance_summary(instance)}
+
 
 @mcp.tool()
-async def setup(env_name: Optional[str] = None):
+async def setup(
+    env_name: str,
+    description: str = "",
+    repositories: Optional[List[Dict[str, Any]]] = None,
+    scaffold_commands: Optional[List[Dict[str, Any]]] = None,
+    claude_md: Optional[str] = None,
+    vars: Optional[Dict[str, str]] = None,
+) -> Dict[str, Any]:
     """
     Setup an environment. Call this when you're ready to start working on a new environment.
+
+    REPOSITORIES is a list of {"url", "path", "branch"} entries to clone. An entry may also set
+    "filter" (a partial clone filter such as "blob:none"), "sparse_paths" (directories to check
+    out) and "submodules" ("none", "recursive", "shallow" or a list of submodule paths).
+    SCAFFOLD_COMMANDS is a list of {"command"} entries run in the instance directory.
+    CLAUDE_MD is the content of the claude.md file written into every instance.
+    Commands and CLAUDE_MD may use the placeholders ${INSTANCE_ID}, ${WORK_DIR}, ${ENV_NAME},
+    ${REPO_<KEY>_PATH} and ${REPO_<KEY>_SHA} (KEY is the repository path upper-cased, with
+    other characters than letters and digits replaced by "_"), and ${NAME} for each entry of VARS.
     """
-    return _subprocess(["ccm", "setup", env_name], cwd=os.getcwd())
+    env_config = {
+        "name": env_name,
+        "description": description,
+        "repositories": repositories or [],
+        "scaffold_commands": scaffold_commands or [],
+        "claude_md": "",
+    }
+    if vars:
+        env_config["vars"] = vars
+    await asyncio.to_thread(
+        tool_profiler.call, "setup", _manager().create_environment_config, env_name, env_config, claude_md
+    )
+    return {"environment": env_name, "description": description}
+
 
 @mcp.tool()
-async def scaffold(env_name: str, dir: Optional[str] = None):
+async def scaffold(env_name: str, dir: Optional[str] = None) -> Dict[str, Any]:
     """
     Scaffold an environment. Call this when you need to create a new environment.
     """
-    params = ["ccm", "scaffold", "--env-name", env_name]
-    if dir:
-        params.extend(["--dir", dir])
-    return _subprocess(params, cwd=os.getcwd())
+    instance = await asyncio.to_thread(tool_profiler.call, "scaffold", _manager().scaffold_instance, env_name, dir)
+    if instance is None:
+        raise ValueError(f"Environment '{env_name}' does not exist")
+    summary = _instance_summary(instance)
+    if instance.get("failed_repositories"):
+        summary["failed_repositories"] = instance["failed_repositories"]
+    if instance.get("scaffold_commands"):
+        summary["scaffold_commands"] = instance["scaffold_commands"]
+    return summary
+
+
+@mcp.tool()
+async def refresh(instance_id: str) -> Dict[str, Any]:
+    """
+    Refresh an instance in place. Call this to bring an existing instance up to date instead of scaffolding a new one.
+
+    Fetches and fast-forwards every repository, rewrites claude.md if the template changed and
+    re-runs only the scaffold commands whose declared inputs changed. Returns the status and
+    commits of each repository, the claude.md status and the commands that were re-run.
+    """
+    report = await asyncio.to_thread(tool_profiler.call, "refresh", _manager().refresh_instance, instance_id)
+    if report is None:
+        raise ValueError(f"Instance not found: {instance_id}")
+    return {
+        "id": report["id"],
+        "path": report["path"],
+        "repositories": [
+            {key: result[key] for key in ("url", "status", "before", "after", "error")}
+            for result in report["repositories"]
+        ],
+        "claude_md": report["claude_md"],
+        "commands": [
+            {key: result[key] for key in ("name", "status", "duration", "error")}
+            for result in report["commands"]
+            if result["status"] != "unchanged"
+        ],
+    }
+
+
+@mcp.tool()
+async def scaffold_start(env_name: str, dir: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Start scaffolding an environment in the background and return its job id immediately.
+
+    Poll scaffold_status with the job id until its status is succeeded, failed or cancelled.
+    """
+    env_config = await asyncio.to_thread(_manager().config_manager.get_environment_config, env_name)
+    if env_config is None:
+        raise ValueError(f"Environment '{env_name}' does not exist")
+    job = _jobs.start(env_name, dir)
+    return {"job_id": job.id, "status": job.status}
+
+
+@mcp.tool()
+async def scaffold_status(job_id: Optional[str] = None) -> Any:
+    """
+    Show the progress of a scaffold job: status, phase, per-repository and per-command progress,
+    and elapsed seconds. The finished instance is included once the job has succeeded, and also
+    when it failed because repositories failed to clone or commands failed, with
+    failed_repositories and failed_commands.
+
+    Without JOB_ID, returns all jobs known to this server.
+    """
+    if job_id is None:
+        return [job.to_dict() for job in _jobs.list()]
+    job = _jobs.get(job_id)
+    if job is None:
+        raise ValueError(f"Scaffold job not found: {job_id}")
+    return job.to_dict()
+
+
+@mcp.tool()
+async def scaffold_cancel(job_id: str) -> Dict[str, Any]:
+    """
+    Cancel a scaffold job. Running commands are killed and the partially built instance is removed.
+    """
+    job = _jobs.cancel(job_id)
+    if job is None:
+        raise ValueError(f"Scaffold job not found: {job_id}")
+    if job.task is not None and not job.done:
+        # Wait for the job to stop and clean up so the caller sees the final state
+        await asyncio.wait([job.task])
+    return job.to_dict()
+
 
 @mcp.tool()
-async def choose(env_name: Optional[str] = None, instance: Optional[str] = None):
+async def choose(env_name: Optional[str] = None, instance: Optional[str] = None) -> Any:
     """
     Choose an environment instance. Call this when you need to start working on an existing environment.
+
+    With INSTANCE, returns that instance's details; otherwise returns the instances
+    of ENV_NAME (or of all environments) to choose from.
     """
-    params = ["ccm", "choose"]
-    if env_name:
-        params.extend(["--env-name", env_name])
     if instance:
-        params.extend(["--instance", instance])
-    return _subprocess(params, cwd=os.getcwd())
+        instance_data = await asyncio.to_thread(tool_profiler.call, "choose", _manager().get_instance, instance)
+        if instance_data is None:
+            raise ValueError(f"Instance not found: {instance}")
+        return instance_data
+    instances = await asyncio.to_thread(tool_profiler.call, "choose", _manager().list_instances, env_name)
+    return [_instance_summary(instance_data) for instance_data in instances]
+
 
 @mcp.tool()
-async def scaffold_help():
+async def profiling(
+    enabled: Optional[bool] = None, directory: Optional[str] = None, top: Optional[int] = None
+) -> Dict[str, Any]:
+    """
+    Show or change cProfile profiling of tool calls.
+
+    With ENABLED, switches profiling on or off; each profiled call writes a .pstats file
+    to DIRECTORY (default: the server's working directory) and prints its TOP entries
+    by cumulative time to the server's stderr. Without arguments, returns the current settings.
+    """
+    if enabled is None:
+        return tool_profiler.settings()
+    return tool_profiler.configure(enabled, directory, top)
+
+
+@mcp.tool()
+async def scaffold_help() -> str:
     """
     Show help for the scaffold command.
     """
-    params = ["ccm", "scaffold", "-h"]
-    return _subprocess(params, cwd=os.getcwd())
+    return _command_help("scaffold")
+
 
 @mcp.tool()
-async def choose_help():
+async def choose_help() -> str:
     """
     Show help for the choose command.
     """
-    params = ["ccm", "choose", "--help"]
-    return _subprocess(params, cwd=os.getcwd())
+    return _command_help("choose")
+
 
 @mcp.tool()
-async def delete_help():
+async def delete_help() -> str:
     """
     Show help for the delete command.
     """
-    params = ["ccm", "del", "--help"]
-    return _subprocess(params, cwd=os.getcwd())
+    return _command_help("del")
+
 
 @mcp.tool()
-async def setup_help():
+async def setup_help() -> str:
     """
     Show help for the setup command.
     """
-    params = ["ccm", "setup", "--help"]
-    return _subprocess(params, cwd=os.getcwd())
+    return _command_help("setup")
+
+
+async def _run_stdio() -> None:
+    """
+    Serve MCP over stdio, keeping the protocol stream separate from tool output.
+
+    Tools run in-process, so anything they print and the output of scaffold commands
+    would otherwise land in the JSON-RPC stream on stdout. File descriptor 1 is
+    pointed at stderr and the protocol writes to a duplicate of the original stdout.
+    """
+    protocol_fd = os.dup(sys.stdout.fileno())
+    sys.stdout.flush()
+    os.dup2(sys.stderr.fileno(), sys.stdout.fileno())
+    protocol_out = anyio.wrap_file(io.TextIOWrapper(os.fdopen(protocol_fd, "wb"), encoding="utf-8"))
+
+    async with stdio_server(stdout=protocol_out) as (read_stream, write_stream):
+        await mcp._mcp_server.run(read_stream, write_stream, mcp._mcp_server.create_initialization_options())
+
 
 def main():
     """
     Main entry point for the MCP server.
     """
-    mcp.run(transport="stdio")
+    anyio.run(_run_stdio)
 
 
 if __name__ == "__main__":
     main()
-
-
-
-
-
-
-
-
-
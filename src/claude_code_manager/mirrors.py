@@ -0,0 +1,274 @@
+"""
+Local repository mirror cache for Claude Code Manager.
+Keeps one bare mirror per repository URL so repeated scaffolds clone from local disk.
+
+GitPython is imported inside the methods that need it to keep CLI startup fast.
+"""
+
+import fcntl
+import hashlib
+import os
+import shutil
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Set
+
+from .checkout import complete_checkout, defers_checkout, enable_partial_clone
+from .config import ConfigManager
+from .fileops import SizeLedger, dir_size
+
+DEFAULT_MIRROR_CACHE_MAX_SIZE_MB = 10240
+
+
+class MirrorCache:
+    """Manages bare repository mirrors under the configuration directory."""
+
+    def __init__(self, config_manager: ConfigManager):
+        """
+        Initialize the mirror cache.
+
+        Args:
+            config_manager: Configuration manager instance
+        """
+        self.config_manager = config_manager
+        self.cache_dir = os.path.join(config_manager.config_dir, "mirrors")
+        self._ledger = SizeLedger(os.path.join(self.cache_dir, ".sizes.json"))
+        # URLs fetched during the current shared_fetches() block, or None outside of one
+        self._fetched: Optional[Set[str]] = None
+        self._batch_depth = 0
+        self._batch_lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        """Whether scaffolds should clone through the mirror cache."""
+        return bool(self.config_manager.config.get("mirror_cache_enabled", True))
+
+    @property
+    def max_size_bytes(self) -> int:
+        """Size limit of the cache before least recently used mirrors are evicted."""
+        max_size_mb = self.config_manager.config.get("mirror_cache_max_size_mb", DEFAULT_MIRROR_CACHE_MAX_SIZE_MB)
+        return int(max_size_mb) * 1024 * 1024
+
+    def mirror_path(self, repo_url: str, filter_spec: Optional[str] = None) -> str:
+        """
+        Get the path of the mirror for a repository URL.
+
+        Args:
+            repo_url: Repository URL
+            filter_spec: Partial clone filter of the mirror; filtered mirrors are kept apart from full ones
+
+        Returns:
+            Path to the bare mirror
+        """
+        key = f"{repo_url}\0{filter_spec}" if filter_spec else repo_url
+        digest = hashlib.sha1(key.encode("utf-8")).hexdigest()[:16]
+        return os.path.join(self.cache_dir, f"{digest}.git")
+
+    @contextmanager
+    def _lock(self, mirror_path: str, exclusive: bool, blocking: bool = True) -> Iterator[bool]:
+        """
+        Hold a lock on a mirror for the duration of the context.
+
+        Clones from a mirror take a shared lock; fetching into or evicting a mirror
+        takes an exclusive one.
+
+        Args:
+            mirror_path: Path to the bare mirror
+            exclusive: Whether to take an exclusive lock
+            blocking: Whether to wait for the lock
+
+        Yields:
+            True if the lock was acquired, False otherwise (only when not blocking)
+        """
+        os.makedirs(self.cache_dir, exist_ok=True)
+        flags = fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH
+        if not blocking:
+            flags |= fcntl.LOCK_NB
+        with open(f"{mirror_path}.lock", "a") as lock_file:
+            try:
+                fcntl.flock(lock_file, flags)
+            except BlockingIOError:
+                yield False
+                return
+            try:
+                yield True
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    @contextmanager
+    def shared_fetches(self) -> Iterator[None]:
+        """
+        Fetch each mirror at most once for the duration of the context.
+
+        Used by batch scaffolds: the first clone of a repository updates its mirror and
+        every other instance of the batch clones from that same fetch.
+        """
+        with self._batch_lock:
+            if self._batch_depth == 0:
+                self._fetched = set()
+            self._batch_depth += 1
+        try:
+            yield
+        finally:
+            with self._batch_lock:
+                self._batch_depth -= 1
+                if self._batch_depth == 0:
+                    self._fetched = None
+
+    def update(self, repo_url: str, filter_spec: Optional[str] = None) -> str:
+        """
+        Create or incrementally fetch the mirror for a repository.
+
+        Inside shared_fetches(), a mirror already fetched by the batch is returned as is.
+
+        Args:
+            repo_url: Repository URL
+            filter_spec: Partial clone filter, e.g. ``blob:none``, to create a partial mirror with
+
+        Returns:
+            Path to the up-to-date mirror
+        """
+        import git
+
+        mirror_path = self.mirror_path(repo_url, filter_spec)
+        with self._lock(mirror_path, exclusive=True):
+            fetched = self._fetched
+            if fetched is not None and mirror_path in fetched and os.path.isdir(mirror_path):
+                return mirror_path
+            if os.path.isdir(mirror_path):
+                try:
+                    git.Repo(mirror_path).git.remote("update", "--prune")
+                except Exception as e:
+                    # A stale mirror is still better than no clone at all
+                    print(f"Error updating mirror for {repo_url}, using cached copy: {e}")
+            else:
+                partial_path = f"{mirror_path}.partial"
+                shutil.rmtree(partial_path, ignore_errors=True)
+                clone_kwargs = {"filter": filter_spec} if filter_spec else {}
+                git.Repo.clone_from(repo_url, partial_path, mirror=True, **clone_kwargs)
+                os.rename(partial_path, mirror_path)
+            os.utime(mirror_path)
+            self._ledger.record(os.path.basename(mirror_path), dir_size(mirror_path))
+            if fetched is not None:
+                fetched.add(mirror_path)
+        return mirror_path
+
+    def clone(
+        self,
+        repo_url: str,
+        target_path: str,
+        branch: Optional[str] = None,
+        options: Optional[Dict[str, Any]] = None,
+    ) -> None:
+        """
+        Clone a repository into a target path through its local mirror.
+
+        Objects are hardlinked from the mirror when it lives on the same filesystem,
+        and the clone's origin points back at the real repository URL. With a filter,
+        the mirror is a partial one and objects it lacks are fetched from origin when
+        the checkout needs them.
+
+        Args:
+            repo_url: Repository URL
+            target_path: Target path
+            branch: Branch to checkout
+            options: Clone options from checkout.clone_options
+        """
+        import git
+
+        filter_spec = options["filter"] if options else None
+        mirror_path = self.update(repo_url, filter_spec)
+        clone_args = ["--branch", branch] if branch else []
+        if options and defers_checkout(options):
+            clone_args.append("--no-checkout")
+        with self._lock(mirror_path, exclusive=False):
+            repo = git.Repo.clone_from(mirror_path, target_path, multi_options=clone_args)
+        repo.remote("origin").set_url(repo_url)
+        if filter_spec:
+            enable_partial_clone(repo, filter_spec)
+        if options:
+            complete_checkout(repo, options)
+        if self._ledger.prune_due(self.max_size_bytes):
+            self.prune(keep=[mirror_path])
+
+    def list_mirrors(self, with_urls: bool = True) -> List[Dict[str, Any]]:
+        """
+        List all cached mirrors, most recently used first.
+
+        Args:
+            with_urls: Whether to read each mirror's repository URL from its git config
+
+        Returns:
+            List of mirror dictionaries with url, path, size and last_used keys
+        """
+        if not os.path.isdir(self.cache_dir):
+            return []
+        if with_urls:
+            import git
+
+        mirrors = []
+        for entry in os.scandir(self.cache_dir):
+            if not entry.name.endswith(".git") or not entry.is_dir():
+                continue
+            url = ""
+            if with_urls:
+                try:
+                    url = git.Repo(entry.path).remote("origin").url
+                except Exception:
+                    pass
+            mirrors.append(
+                {
+                    "url": url,
+                    "path": entry.path,
+                    "size": dir_size(entry.path),
+                    "last_used": entry.stat().st_mtime,
+                }
+            )
+        mirrors.sort(key=lambda mirror: mirror["last_used"], reverse=True)
+        return mirrors
+
+    def prune(self, max_size_bytes: Optional[int] = None, keep: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        """
+        Evict least recently used mirrors until the cache fits its size limit.
+
+        Mirrors that are currently in use by another process are skipped. Clones only call
+        this when the size ledger says a prune is due, so the cache is not measured mirror
+        by mirror on every clone.
+
+        Args:
+            max_size_bytes: Size limit to prune to; defaults to the configured limit
+            keep: Mirror paths that must not be evicted
+
+        Returns:
+            List of evicted mirror dictionaries
+        """
+        if max_size_bytes is None:
+            max_size_bytes = self.max_size_bytes
+        keep = keep or []
+
+        mirrors = self.list_mirrors(with_urls=False)
+        total = sum(mirror["size"] for mirror in mirrors)
+        evicted = []
+        for mirror in reversed(mirrors):
+            if total <= max_size_bytes:
+                break
+            if mirror["path"] in keep:
+                continue
+            with self._lock(mirror["path"], exclusive=True, blocking=False) as acquired:
+                if not acquired:
+                    continue
+                shutil.rmtree(mirror["path"], ignore_errors=True)
+            total -= mirror["size"]
+            evicted.append(mirror)
+        remaining = [mirror for mirror in mirrors if mirror not in evicted]
+        self._ledger.reset({os.path.basename(mirror["path"]): mirror["size"] for mirror in remaining})
+        return evicted
+
+    def clear(self) -> List[Dict[str, Any]]:
+        """
+        Remove every mirror that is not currently in use.
+
+        Returns:
+            List of removed mirror dictionaries
+        """
+        return self.prune(max_size_bytes=0)
@@ -0,0 +1,74 @@
+"""
+Routing of scaffold output to the ccm client that requested the scaffold.
+
+Scaffolds served by the ccm daemon would otherwise print to the daemon's own stdout and
+run their commands with the daemon's environment. While a request is served in
+``routed``, text printed in its context is passed to the request's sink instead, and
+scaffold commands started in that context run with the client's environment and have
+their output piped to the sink. Outside the daemon nothing is routed and commands
+inherit the process's stdout and environment as before.
+"""
+
+import contextvars
+import io
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, Optional, TextIO
+
+_sink: contextvars.ContextVar[Optional[Callable[[str], None]]] = contextvars.ContextVar("ccm_output_sink", default=None)
+_environment: contextvars.ContextVar[Optional[Dict[str, str]]] = contextvars.ContextVar(
+    "ccm_command_environment", default=None
+)
+
+
+class RoutedStream(io.TextIOBase):
+    """Stand-in for sys.stdout passing writes made in a routed context to that context's sink."""
+
+    def __init__(self, stream: TextIO):
+        """
+        Initialize the stream.
+
+        Args:
+            stream: Stream receiving writes made outside routed contexts
+        """
+        self._stream = stream
+
+    def write(self, text: str) -> int:
+        sink = _sink.get()
+        if sink is None:
+            return self._stream.write(text)
+        sink(text)
+        return len(text)
+
+    def flush(self) -> None:
+        self._stream.flush()
+
+    def fileno(self) -> int:
+        return self._stream.fileno()
+
+
+@contextmanager
+def routed(sink: Callable[[str], None], environment: Optional[Dict[str, str]] = None) -> Iterator[None]:
+    """
+    Route the output of the current context, and of threads started with tracing.propagate from it.
+
+    Args:
+        sink: Receives every piece of text printed
+        environment: Environment scaffold commands run with, instead of the process's
+    """
+    sink_token = _sink.set(sink)
+    environment_token = _environment.set(environment)
+    try:
+        yield
+    finally:
+        _environment.reset(environment_token)
+        _sink.reset(sink_token)
+
+
+def is_routed() -> bool:
+    """Whether output of the current context goes to a sink rather than the process's stdout."""
+    return _sink.get() is not None
+
+
+def command_environment() -> Optional[Dict[str, str]]:
+    """Get the environment scaffold commands of the current context run with; None for the process's own."""
+    return _environment.get()
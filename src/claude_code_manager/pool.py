@@ -0,0 +1,323 @@
+"""
+Warm pool of pre-scaffolded instances for Claude Code Manager.
+Ready instances are built ahead of time and handed out with an atomic rename.
+"""
+
+import fcntl
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import sys
+import time
+import uuid
+from datetime import datetime
+from typing import TYPE_CHECKING, Any, Dict, List, Optional
+
+from .garbage import write_instance_marker
+from .tracing import detached_environment
+
+if TYPE_CHECKING:
+    from .environment import EnvironmentManager
+
+DEFAULT_POOL_MAX_AGE_HOURS = 24
+
+
+def _format_timestamp(epoch: float) -> str:
+    """Format an epoch timestamp the way instance records store created_at."""
+    return datetime.fromtimestamp(epoch).strftime("%Y-%m-%dT%H:%M:%S.%f")
+
+
+class InstancePool:
+    """Manages ready-made instances per environment type."""
+
+    def __init__(self, env_manager: "EnvironmentManager"):
+        """
+        Initialize the instance pool.
+
+        Args:
+            env_manager: Environment manager used to build pooled instances
+        """
+        self.env_manager = env_manager
+        self.config_manager = env_manager.config_manager
+
+    @property
+    def pool_dir(self) -> str:
+        """Root of the pool, inside the work directory so claims are same-filesystem renames."""
+        return os.path.join(self.config_manager.get_default_work_dir(), ".pool")
+
+    def get_settings(self, env_config: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Get the pool settings of an environment.
+
+        Args:
+            env_config: Environment configuration
+
+        Returns:
+            Dictionary with size and max_age_hours keys
+        """
+        settings = env_config.get("pool") or {}
+        return {
+            "size": int(settings.get("size", 0)),
+            "max_age_hours": float(settings.get("max_age_hours", DEFAULT_POOL_MAX_AGE_HOURS)),
+        }
+
+    def _env_pool_dir(self, env_name: str) -> str:
+        """Get the pool directory for an environment."""
+        return os.path.join(self.pool_dir, env_name)
+
+    def _ready_entries(self, env_name: str) -> List[Dict[str, Any]]:
+        """
+        List the ready instances of an environment, oldest first.
+
+        Ready entries are named ``<built-at epoch>-<instance id>``; entries still being
+        built carry a leading dot and are ignored.
+
+        Args:
+            env_name: Name of the environment
+
+        Returns:
+            List of dictionaries with id, path and built_at keys
+        """
+        env_pool_dir = self._env_pool_dir(env_name)
+        if not os.path.isdir(env_pool_dir):
+            return []
+
+        entries = []
+        for entry in os.scandir(env_pool_dir):
+            if entry.name.startswith(".") or not entry.is_dir():
+                continue
+            built_at, _, instance_id = entry.name.partition("-")
+            if not built_at.isdigit() or not instance_id:
+                continue
+            entries.append({"id": instance_id, "path": entry.path, "built_at": int(built_at)})
+        entries.sort(key=lambda entry: entry["built_at"])
+        return entries
+
+    def claim(self, env_name: str, env_config: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        Claim a ready instance from the pool and register it as a new instance.
+
+        The ready directory is moved into place with a single rename, so concurrent
+        claimers can never receive the same instance. A background refill is started
+        whenever an instance was claimed or the pool is short.
+
+        Args:
+            env_name: Name of the environment
+            env_config: Environment configuration
+
+        Returns:
+            Instance data dictionary or None if no ready instance was available
+        """
+        settings = self.get_settings(env_config)
+        if settings["size"] <= 0:
+            return None
+
+        max_age_seconds = settings["max_age_hours"] * 3600
+        instance_info = None
+        for entry in self._ready_entries(env_name):
+            if time.time() - entry["built_at"] > max_age_seconds:
+                self._discard(entry["path"])
+                continue
+
+            instance_dir = os.path.join(self.config_manager.get_default_work_dir(), f"{env_name}_{entry['id'][:8]}")
+            if os.path.exists(instance_dir):
+                continue
+            try:
+                os.rename(entry["path"], instance_dir)
+            except FileNotFoundError:
+                # Claimed by another process in the meantime
+                continue
+            write_instance_marker(instance_dir, entry["id"])
+
+            instance_info = {
+                "id": entry["id"],
+                "environment": env_name,
+                "path": instance_dir,
+                "created_at": datetime.now().isoformat(),
+                "pool_built_at": _format_timestamp(entry["built_at"]),
+            }
+            self.config_manager.save_instance(entry["id"], instance_info)
+            break
+
+        self.refill_in_background(env_name)
+        return instance_info
+
+    def fill(self, env_name: str, env_config: Optional[Dict[str, Any]] = None) -> int:
+        """
+        Build ready instances until the pool of an environment is full.
+
+        Only one process fills a given environment's pool at a time; if another
+        filler holds the lock this returns immediately.
+
+        A build with a repository that failed to clone or a scaffold command that did not
+        succeed is discarded, and filling stops until the next refill. A claimed instance is
+        moved to another directory, so environments whose scaffold commands reference WORK_DIR
+        or other instance-specific variables are never pooled, and environments whose builds
+        contain the build directory's path are not pooled until their configuration changes.
+
+        Args:
+            env_name: Name of the environment
+            env_config: Environment configuration; loaded if not provided
+
+        Returns:
+            Number of instances built
+        """
+        from .environment import build_errors, embeds_build_dir, path_dependent_commands
+
+        if env_config is None:
+            env_config = self.config_manager.get_environment_config(env_name)
+            if env_config is None:
+                return 0
+        settings = self.get_settings(env_config)
+        commands = path_dependent_commands(env_config)
+        if commands:
+            print(f"Not pooling '{env_name}', these commands use instance paths: {commands}")
+            return 0
+
+        env_pool_dir = self._env_pool_dir(env_name)
+        os.makedirs(env_pool_dir, exist_ok=True)
+        unusable_path = os.path.join(env_pool_dir, ".unusable")
+        config_digest = hashlib.sha256(json.dumps(env_config, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+        if os.path.exists(unusable_path):
+            with open(unusable_path) as f:
+                if f.read() == config_digest:
+                    return 0
+        built = 0
+        with open(os.path.join(env_pool_dir, ".fill.lock"), "a") as lock_file:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return 0
+
+            self._discard_stale(env_name, settings)
+            while len(self._ready_entries(env_name)) < settings["size"]:
+                instance_id = str(uuid.uuid4())
+                build_dir = os.path.join(env_pool_dir, f".building-{instance_id}")
+                build_report = self.env_manager._populate_instance(env_name, env_config, build_dir)
+                errors = build_errors(build_report["failed_repositories"], build_report["commands"])
+                if errors:
+                    # Never hand out a broken instance; try again on the next refill
+                    print(f"Discarding pooled instance of '{env_name}', {'; '.join(errors)}")
+                    self._discard(build_dir)
+                    break
+                if embeds_build_dir(build_dir):
+                    print(f"Not pooling '{env_name}', the built files contain the build directory")
+                    self._discard(build_dir)
+                    # Building it again would embed the build directory again
+                    with open(unusable_path, "w") as f:
+                        f.write(config_digest)
+                    break
+                # Deduplicated under the id the instance keeps when it is claimed
+                self.env_manager._dedupe_instance(instance_id, build_dir)
+                os.rename(build_dir, os.path.join(env_pool_dir, f"{int(time.time())}-{instance_id}"))
+                built += 1
+        return built
+
+    def refill_in_background(self, env_name: str) -> None:
+        """
+        Start a detached ``ccm pool fill`` process for an environment.
+
+        Args:
+            env_name: Name of the environment
+        """
+        env = detached_environment(CCM_CONFIG_DIR=self.config_manager.config_dir)
+        subprocess.Popen(
+            [sys.executable, "-m", "claude_code_manager.cli", "pool", "fill", "--env-name", env_name],
+            env=env,
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            start_new_session=True,
+        )
+
+    def drain(self, env_name: str) -> int:
+        """
+        Remove all ready instances of an environment.
+
+        Args:
+            env_name: Name of the environment
+
+        Returns:
+            Number of instances removed
+        """
+        entries = self._ready_entries(env_name)
+        for entry in entries:
+            self._discard(entry["path"])
+        return len(entries)
+
+    def status(self) -> List[Dict[str, Any]]:
+        """
+        Get the pool status of every environment that has a pool configured.
+
+        Returns:
+            List of dictionaries with environment, ready, size and oldest keys
+        """
+        status = []
+        for env_name in self.config_manager.list_environments():
+            env_config = self.config_manager.get_environment_config(env_name) or {}
+            settings = self.get_settings(env_config)
+            entries = self._ready_entries(env_name)
+            if settings["size"] <= 0 and not entries:
+                continue
+            status.append(
+                {
+                    "environment": env_name,
+                    "ready": len(entries),
+                    "size": settings["size"],
+                    "max_age_hours": settings["max_age_hours"],
+                    "oldest": _format_timestamp(entries[0]["built_at"]) if entries else None,
+                }
+            )
+        return status
+
+    def instance_ids(self) -> List[str]:
+        """
+        Get the identifiers of every pooled instance, ready or being built, of any environment.
+
+        Returns:
+            List of instance identifiers
+        """
+        instance_ids = []
+        if not os.path.isdir(self.pool_dir):
+            return instance_ids
+        for env_entry in os.scandir(self.pool_dir):
+            if not env_entry.is_dir():
+                continue
+            for entry in os.scandir(env_entry.path):
+                if entry.name.startswith(".building-"):
+                    instance_ids.append(entry.name[len(".building-") :])
+                elif not entry.name.startswith("."):
+                    built_at, _, instance_id = entry.name.partition("-")
+                    if built_at.isdigit() and instance_id:
+                        instance_ids.append(instance_id)
+        return instance_ids
+
+    def _discard_stale(self, env_name: str, settings: Dict[str, Any]) -> None:
+        """Remove expired ready instances and leftovers of interrupted builds."""
+        max_age_seconds = settings["max_age_hours"] * 3600
+        for entry in self._ready_entries(env_name):
+            if time.time() - entry["built_at"] > max_age_seconds:
+                self._discard(entry["path"])
+        for entry in os.scandir(self._env_pool_dir(env_name)):
+            if entry.name.startswith((".building-", ".discard-")):
+                self._discard(entry.path)
+
+    @staticmethod
+    def _discard(path: str) -> None:
+        """
+        Remove a pooled instance directory.
+
+        The directory is renamed out of the way first so a concurrent claim either
+        gets the whole instance or nothing.
+
+        Args:
+            path: Path to the pooled instance
+        """
+        discard_path = os.path.join(os.path.dirname(path), f".discard-{uuid.uuid4().hex[:8]}")
+        try:
+            os.rename(path, discard_path)
+        except FileNotFoundError:
+            return
+        shutil.rmtree(discard_path, ignore_errors=True)
@@ -0,0 +1,127 @@
+"""
+cProfile support for Claude Code Manager.
+Profiles whole ccm commands (``ccm --profile``) and individual MCP tool calls.
+"""
+
+import cProfile
+import os
+import pstats
+import re
+import sys
+import threading
+import time
+from typing import IO, Any, Callable, Dict, Optional
+
+DEFAULT_TOP = 25
+# Environment variable naming the directory MCP tool call profiles are written to
+MCP_PROFILE_ENV = "CCM_MCP_PROFILE"
+
+
+def default_profile_path(name: str, directory: str = ".") -> str:
+    """
+    Build a timestamped profile file name.
+
+    Args:
+        name: Command or tool name
+        directory: Directory of the file
+
+    Returns:
+        Path like ``<directory>/ccm-<name>-<timestamp>.pstats``
+    """
+    safe_name = re.sub(r"[^A-Za-z0-9_.-]+", "_", name) or "ccm"
+    timestamp = time.strftime("%Y%m%d-%H%M%S") + f"-{int(time.time() * 1000) % 1000:03d}"
+    return os.path.join(directory, f"ccm-{safe_name}-{timestamp}.pstats")
+
+
+def write_profile(profile: cProfile.Profile, path: str, top: int = DEFAULT_TOP, stream: IO[str] = sys.stderr) -> None:
+    """
+    Save a profile as a .pstats file and print its top entries by cumulative time.
+
+    Args:
+        profile: Stopped profiler
+        path: File to write the stats to
+        top: Number of entries to print; 0 prints none
+        stream: Where to print the entries
+    """
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    profile.dump_stats(path)
+    if top > 0:
+        stats = pstats.Stats(profile, stream=stream)
+        stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(top)
+    print(f"Profile written to {path}", file=stream)
+
+
+class ToolProfiler:
+    """Profiles MCP tool calls while enabled; can be switched on and off at runtime."""
+
+    def __init__(self):
+        """Initialize the profiler, enabled when CCM_MCP_PROFILE names an output directory."""
+        self.directory: Optional[str] = os.environ.get(MCP_PROFILE_ENV) or None
+        self.top = DEFAULT_TOP
+        # Only one cProfile profiler can be active at a time on newer Pythons
+        self._active = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        """Whether tool calls are being profiled."""
+        return self.directory is not None
+
+    def configure(self, enabled: bool, directory: Optional[str] = None, top: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Switch profiling on or off.
+
+        Args:
+            enabled: Whether to profile tool calls
+            directory: Directory to write profiles to; defaults to the current one
+            top: Number of entries to print to stderr for each call
+
+        Returns:
+            The new settings, as returned by settings
+        """
+        self.directory = os.path.expanduser(directory or self.directory or ".") if enabled else None
+        if top is not None:
+            self.top = top
+        return self.settings()
+
+    def settings(self) -> Dict[str, Any]:
+        """
+        Get the current settings.
+
+        Returns:
+            Dictionary with enabled, directory and top keys
+        """
+        return {"enabled": self.enabled, "directory": self.directory, "top": self.top}
+
+    def call(self, name: str, func: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        """
+        Run a function, profiling it when enabled.
+
+        Calls that overlap with one already being profiled run unprofiled.
+
+        Args:
+            name: Tool name, used in the profile file name
+            func: Function to run
+            *args: Positional arguments of the function
+            **kwargs: Keyword arguments of the function
+
+        Returns:
+            The function's return value
+        """
+        directory = self.directory
+        if directory is None or not self._active.acquire(blocking=False):
+            return func(*args, **kwargs)
+        try:
+            profile = cProfile.Profile()
+            profile.enable()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                profile.disable()
+                write_profile(profile, default_profile_path(name, directory), self.top)
+        finally:
+            self._active.release()
+
+
+tool_profiler = ToolProfiler()
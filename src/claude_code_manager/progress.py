@@ -0,0 +1,134 @@
+"""
+Scaffold progress tracking for Claude Code Manager.
+Lets long-running callers observe and cancel a scaffold from another thread, and
+records how long each phase, repository and command took.
+"""
+
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+
+class ScaffoldCancelled(Exception):
+    """Raised inside a scaffold when its progress tracker has been cancelled."""
+
+
+class ScaffoldProgress:
+    """Thread-safe record of where a scaffold is, with a cancellation flag."""
+
+    def __init__(self):
+        """Initialize an empty progress tracker."""
+        self._lock = threading.Lock()
+        self._started = time.monotonic()
+        self.cancel_event = threading.Event()
+        self.phase = "pending"
+        self._phase_started = self._started
+        self._phase_durations: Dict[str, float] = {}
+        self.instance_id: Optional[str] = None
+        self.instance_dir: Optional[str] = None
+        self._repositories: Dict[str, Dict[str, Any]] = {}
+        self._commands: Dict[str, Dict[str, Any]] = {}
+
+    @property
+    def cancelled(self) -> bool:
+        """Whether cancellation has been requested."""
+        return self.cancel_event.is_set()
+
+    def cancel(self) -> None:
+        """Request cancellation; the scaffold stops at the next repository, command or phase boundary."""
+        self.cancel_event.set()
+
+    def check_cancelled(self) -> None:
+        """
+        Raise if cancellation has been requested.
+
+        Raises:
+            ScaffoldCancelled: If the scaffold was cancelled
+        """
+        if self.cancelled:
+            raise ScaffoldCancelled("Scaffold cancelled")
+
+    def set_phase(self, phase: str) -> None:
+        """Record the current phase, e.g. cloning, claude_md or commands, ending the previous one."""
+        with self._lock:
+            self._end_phase()
+            self.phase = phase
+
+    def finish(self) -> None:
+        """End the current phase."""
+        with self._lock:
+            self._end_phase()
+            self.phase = "done"
+
+    def _end_phase(self) -> None:
+        """Add the time spent in the current phase to its duration; the lock must be held."""
+        now = time.monotonic()
+        if self.phase not in ("pending", "done"):
+            self._phase_durations[self.phase] = self._phase_durations.get(self.phase, 0.0) + now - self._phase_started
+        self._phase_started = now
+
+    def set_instance(self, instance_id: str, instance_dir: str) -> None:
+        """Record the instance being built."""
+        with self._lock:
+            self.instance_id = instance_id
+            self.instance_dir = instance_dir
+
+    def update_repository(self, path: str, url: str, status: str) -> None:
+        """Record the clone status of a repository, timing it from "cloning" to its final status."""
+        with self._lock:
+            entry = {"url": url, "path": path, "status": status}
+            previous = self._repositories.get(path)
+            if status == "cloning":
+                entry["_started"] = time.monotonic()
+            elif previous is not None and "_started" in previous:
+                entry["duration"] = round(time.monotonic() - previous["_started"], 3)
+            self._repositories[path] = entry
+
+    def update_command(self, name: str, status: str, duration: Optional[float] = None) -> None:
+        """Record the status of a scaffold command."""
+        with self._lock:
+            entry = {"name": name, "status": status}
+            if duration is not None:
+                entry["duration"] = round(duration, 3)
+            self._commands[name] = entry
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        Get a consistent copy of the progress.
+
+        Returns:
+            Dictionary with phase, elapsed, instance_id, path, repositories and commands keys
+        """
+        with self._lock:
+            repositories: List[Dict[str, Any]] = [
+                {key: value for key, value in entry.items() if not key.startswith("_")}
+                for entry in self._repositories.values()
+            ]
+            commands: List[Dict[str, Any]] = [dict(entry) for entry in self._commands.values()]
+            return {
+                "phase": self.phase,
+                "elapsed": round(time.monotonic() - self._started, 3),
+                "instance_id": self.instance_id,
+                "path": self.instance_dir,
+                "repositories": repositories,
+                "commands": commands,
+            }
+
+    def timings(self) -> Dict[str, Any]:
+        """
+        Get the recorded durations in seconds.
+
+        Returns:
+            Dictionary with total, phases, repositories (by URL) and commands (by name) keys
+        """
+        with self._lock:
+            return {
+                "total": round(time.monotonic() - self._started, 3),
+                "phases": {phase: round(duration, 3) for phase, duration in self._phase_durations.items()},
+                "repositories": {
+                    entry["url"]: entry["duration"] for entry in self._repositories.values() if "duration" in entry
+                },
+                "commands": {
+                    entry["name"]: entry["duration"] for entry in self._commands.values() if "duration" in entry
+                },
+            }
@@ -0,0 +1,319 @@
+"""
+SQLite-backed instance registry for Claude Code Manager.
+Stores instance metadata in a single indexed database instead of one YAML file per instance,
+along with the scaffold timing history, which outlives the instances themselves.
+"""
+
+import json
+import os
+import re
+import sqlite3
+import threading
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterator, List, Optional
+
+from .serialization import load_yaml
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS instances (
+    id TEXT PRIMARY KEY,
+    environment TEXT,
+    path TEXT,
+    created_at TEXT,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_instances_environment ON instances (environment, created_at);
+CREATE INDEX IF NOT EXISTS idx_instances_created_at ON instances (created_at);
+CREATE TABLE IF NOT EXISTS scaffold_timings (
+    instance_id TEXT NOT NULL,
+    environment TEXT,
+    created_at TEXT,
+    kind TEXT NOT NULL,
+    name TEXT NOT NULL,
+    duration REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_scaffold_timings_environment ON scaffold_timings (environment, kind, name);
+"""
+
+# Orders supported by InstanceRegistry.query, served by the indexes above
+QUERY_ORDERS = {"created": "created_at, id", "env": "environment, created_at, id"}
+_AGE_UNITS = {"s": "seconds", "m": "minutes", "h": "hours", "d": "days", "w": "weeks"}
+
+
+def parse_time_bound(value: str) -> str:
+    """
+    Parse a creation time bound given as an ISO date or date and time, or as an age like ``2h`` or ``3d``.
+
+    Args:
+        value: ISO date/time, or a number followed by s, m, h, d or w meaning that long ago
+
+    Returns:
+        Local time in ISO format, comparable with the created_at of instances
+
+    Raises:
+        ValueError: If the value is neither
+    """
+    match = re.fullmatch(r"\s*(\d+(?:\.\d+)?)\s*([smhdw])\s*", value)
+    if match:
+        moment = datetime.now() - timedelta(**{_AGE_UNITS[match.group(2)]: float(match.group(1))})
+    else:
+        try:
+            moment = datetime.fromisoformat(value.strip())
+        except ValueError:
+            raise ValueError(f"Invalid time '{value}': expected an ISO date/time or an age like 2h, 3d or 1w") from None
+        if moment.tzinfo is not None:
+            moment = moment.astimezone().replace(tzinfo=None)
+    return moment.isoformat()
+
+
+class InstanceRegistry:
+    """Stores instance metadata in a SQLite database shared by all ccm processes."""
+
+    def __init__(self, db_path: str, legacy_dir: Optional[str] = None):
+        """
+        Initialize the instance registry.
+
+        Args:
+            db_path: Path to the SQLite database file
+            legacy_dir: Directory of ``<instance id>.yaml`` files to migrate on first use
+        """
+        self.db_path = db_path
+        self.legacy_dir = legacy_dir
+        self._local = threading.local()
+        self._migrate_legacy_files()
+
+    def _connection(self) -> sqlite3.Connection:
+        """Get this thread's database connection, creating the schema on first use."""
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.db_path, timeout=30)
+            # WAL lets readers proceed while another ccm process writes
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.executescript(_SCHEMA)
+            self._local.connection = connection
+        return connection
+
+    def _migrate_legacy_files(self) -> None:
+        """Import ``<instance id>.yaml`` files into the database and move them to ``migrated/``."""
+        if self.legacy_dir is None or not os.path.isdir(self.legacy_dir):
+            return
+        legacy_files = [entry.path for entry in os.scandir(self.legacy_dir) if entry.name.endswith(".yaml")]
+        if not legacy_files:
+            return
+
+        records = []
+        for legacy_file in legacy_files:
+            with open(legacy_file, "r") as f:
+                instance_data = load_yaml(f)
+            if isinstance(instance_data, dict):
+                instance_id = instance_data.get("id") or os.path.basename(legacy_file)[: -len(".yaml")]
+                records.append((instance_id, instance_data))
+
+        connection = self._connection()
+        with connection:
+            connection.executemany(
+                "INSERT OR IGNORE INTO instances (id, environment, path, created_at, data) VALUES (?, ?, ?, ?, ?)",
+                [self._row(instance_id, instance_data) for instance_id, instance_data in records],
+            )
+
+        migrated_dir = os.path.join(self.legacy_dir, "migrated")
+        os.makedirs(migrated_dir, exist_ok=True)
+        for legacy_file in legacy_files:
+            try:
+                os.replace(legacy_file, os.path.join(migrated_dir, os.path.basename(legacy_file)))
+            except FileNotFoundError:
+                # Migrated concurrently by another process
+                pass
+
+    @staticmethod
+    def _row(instance_id: str, instance_data: Dict[str, Any]) -> tuple:
+        """Build the column values of an instance."""
+        return (
+            instance_id,
+            instance_data.get("environment"),
+            instance_data.get("path"),
+            str(instance_data.get("created_at", "")),
+            json.dumps(instance_data, default=str),
+        )
+
+    def save(self, instance_id: str, instance_data: Dict[str, Any]) -> None:
+        """
+        Insert or replace an instance.
+
+        Args:
+            instance_id: Instance identifier
+            instance_data: Instance data dictionary
+        """
+        connection = self._connection()
+        with connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO instances (id, environment, path, created_at, data) VALUES (?, ?, ?, ?, ?)",
+                self._row(instance_id, instance_data),
+            )
+
+    def save_many(self, instances: List[Dict[str, Any]]) -> None:
+        """
+        Insert or replace several instances in one transaction.
+
+        Args:
+            instances: Instance data dictionaries, each with an id key
+        """
+        connection = self._connection()
+        with connection:
+            connection.executemany(
+                "INSERT OR REPLACE INTO instances (id, environment, path, created_at, data) VALUES (?, ?, ?, ?, ?)",
+                [self._row(instance_data["id"], instance_data) for instance_data in instances],
+            )
+
+    def get(self, instance_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Get an instance.
+
+        Args:
+            instance_id: Instance identifier
+
+        Returns:
+            Instance data dictionary or None if not found
+        """
+        row = self._connection().execute("SELECT data FROM instances WHERE id = ?", (instance_id,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def delete(self, instance_id: str) -> bool:
+        """
+        Delete an instance.
+
+        Args:
+            instance_id: Instance identifier
+
+        Returns:
+            True if deleted, False if not found
+        """
+        connection = self._connection()
+        with connection:
+            cursor = connection.execute("DELETE FROM instances WHERE id = ?", (instance_id,))
+        return cursor.rowcount > 0
+
+    def delete_many(self, instance_ids: List[str]) -> int:
+        """
+        Delete several instances in one transaction.
+
+        Args:
+            instance_ids: Instance identifiers
+
+        Returns:
+            Number of instances deleted
+        """
+        connection = self._connection()
+        with connection:
+            cursor = connection.executemany(
+                "DELETE FROM instances WHERE id = ?", [(instance_id,) for instance_id in instance_ids]
+            )
+        return cursor.rowcount
+
+    def summaries(self) -> List[Dict[str, Any]]:
+        """
+        List the indexed columns of every instance without decoding the full records.
+
+        Returns:
+            List of dictionaries with id, environment, path and created_at keys, in creation order
+        """
+        cursor = self._connection().execute(
+            "SELECT id, environment, path, created_at FROM instances ORDER BY created_at"
+        )
+        return [{"id": row[0], "environment": row[1], "path": row[2], "created_at": row[3]} for row in cursor]
+
+    def query(
+        self,
+        env_name: Optional[str] = None,
+        since: Optional[str] = None,
+        before: Optional[str] = None,
+        order: str = "created",
+        limit: Optional[int] = None,
+        offset: int = 0,
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Iterate over the indexed columns of matching instances, reading rows from the database as they are consumed.
+
+        Args:
+            env_name: Optional environment name to filter by
+            since: Optional ISO time; only instances created at or after it
+            before: Optional ISO time; only instances created before it
+            order: Key of QUERY_ORDERS
+            limit: Maximum number of instances
+            offset: Number of matching instances to skip
+
+        Yields:
+            Dictionaries with id, environment, path and created_at keys
+        """
+        clauses = []
+        params: List[Any] = []
+        for clause, value in (("environment = ?", env_name), ("created_at >= ?", since), ("created_at < ?", before)):
+            if value is not None:
+                clauses.append(clause)
+                params.append(value)
+        query = "SELECT id, environment, path, created_at FROM instances"
+        if clauses:
+            query += " WHERE " + " AND ".join(clauses)
+        query += f" ORDER BY {QUERY_ORDERS[order]}"
+        if limit is not None or offset:
+            query += " LIMIT ? OFFSET ?"
+            params.extend([-1 if limit is None else limit, offset])
+        for row in self._connection().execute(query, params):
+            yield {"id": row[0], "environment": row[1], "path": row[2], "created_at": row[3]}
+
+    def list(self, env_name: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        List instances in creation order, optionally filtered by environment type.
+
+        Args:
+            env_name: Optional environment name to filter by
+
+        Returns:
+            List of instance data dictionaries
+        """
+        if env_name is None:
+            cursor = self._connection().execute("SELECT data FROM instances ORDER BY created_at")
+        else:
+            cursor = self._connection().execute(
+                "SELECT data FROM instances WHERE environment = ? ORDER BY created_at", (env_name,)
+            )
+        return [json.loads(row[0]) for row in cursor]
+
+    def record_timings(self, instance_data: Dict[str, Any], timings: Dict[str, Any]) -> None:
+        """
+        Append the timings of a scaffold to the history.
+
+        Args:
+            instance_data: Instance data dictionary
+            timings: Timings with total, phases, repositories and commands keys
+        """
+        rows = [("total", "total", timings["total"])]
+        for kind, key in (("phase", "phases"), ("repository", "repositories"), ("command", "commands")):
+            rows.extend((kind, name, duration) for name, duration in timings.get(key, {}).items())
+
+        instance_columns = (instance_data.get("id"), instance_data.get("environment"), instance_data.get("created_at"))
+        connection = self._connection()
+        with connection:
+            connection.executemany(
+                "INSERT INTO scaffold_timings (instance_id, environment, created_at, kind, name, duration)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                [instance_columns + row for row in rows],
+            )
+
+    def timing_history(self, env_name: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Get the recorded scaffold timings.
+
+        Args:
+            env_name: Optional environment name to filter by
+
+        Returns:
+            List of dictionaries with environment, kind, name and duration keys
+        """
+        query = "SELECT environment, kind, name, duration FROM scaffold_timings"
+        if env_name is None:
+            cursor = self._connection().execute(query)
+        else:
+            cursor = self._connection().execute(f"{query} WHERE environment = ?", (env_name,))
+        return [{"environment": row[0], "kind": row[1], "name": row[2], "duration": row[3]} for row in cursor]
@@ -0,0 +1,79 @@
+"""
+YAML and JSON serialization helpers for Claude Code Manager.
+Uses the libyaml C implementation when PyYAML was built with it.
+"""
+
+import json
+import os
+import threading
+from typing import IO, Any
+
+import yaml
+
+try:
+    from yaml import CSafeDumper as YamlDumper
+    from yaml import CSafeLoader as YamlLoader
+except ImportError:
+    from yaml import SafeDumper as YamlDumper
+    from yaml import SafeLoader as YamlLoader
+
+# Storage formats by file extension
+FORMATS = {"yaml": ".yaml", "json": ".json"}
+
+
+def load_yaml(stream: IO[str]) -> Any:
+    """
+    Parse a YAML document with the safe loader.
+
+    Args:
+        stream: Open text file
+
+    Returns:
+        The parsed document
+    """
+    return yaml.load(stream, Loader=YamlLoader)
+
+
+def dump_yaml(data: Any, stream: IO[str], **kwargs: Any) -> None:
+    """
+    Write a YAML document with the safe dumper.
+
+    Args:
+        data: Document to write
+        stream: Open text file
+        **kwargs: Options passed to yaml.dump, e.g. default_flow_style
+    """
+    yaml.dump(data, stream, Dumper=YamlDumper, **kwargs)
+
+
+def load_file(path: str) -> Any:
+    """
+    Parse a YAML or JSON file, chosen by its extension.
+
+    Args:
+        path: File path
+
+    Returns:
+        The parsed document
+    """
+    with open(path, "r") as f:
+        if path.endswith(FORMATS["json"]):
+            return json.load(f)
+        return load_yaml(f)
+
+
+def dump_file(data: Any, path: str) -> None:
+    """
+    Write a YAML or JSON file, chosen by its extension, replacing it atomically.
+
+    Args:
+        data: Document to write
+        path: File path
+    """
+    temp_path = f"{path}.tmp-{os.getpid()}-{threading.get_ident()}"
+    with open(temp_path, "w") as f:
+        if path.endswith(FORMATS["json"]):
+            json.dump(data, f, indent=2, default=str)
+        else:
+            dump_yaml(data, f, default_flow_style=False)
+    os.replace(temp_path, path)
@@ -0,0 +1,190 @@
+"""
+Templates for claude.md and scaffold commands.
+
+``${NAME}`` placeholders are replaced by instance variables in a single pass; placeholders
+naming no known variable (such as shell variables in commands) are left as they are.
+Templates are parsed once and cached by content hash, so batch scaffolds render the same
+parsed template for every instance.
+"""
+
+import hashlib
+import os
+import re
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, FrozenSet, Iterable, List, Mapping, Optional
+
+MAX_CACHED_TEMPLATES = 256
+
+_PLACEHOLDER = re.compile(r"\$\{([A-Za-z_][A-Za-z0-9_]*)\}")
+
+
+class Template:
+    """A parsed template: literal text alternating with placeholder names."""
+
+    __slots__ = ("_literals", "_names", "names")
+
+    def __init__(self, source: str):
+        """
+        Parse a template.
+
+        Args:
+            source: Template text
+        """
+        # With one capturing group, split alternates literal text and placeholder names
+        parts = _PLACEHOLDER.split(source)
+        self._literals: List[str] = parts[0::2]
+        self._names: List[str] = parts[1::2]
+        self.names: FrozenSet[str] = frozenset(self._names)
+
+    def render(self, variables: Mapping[str, Any]) -> str:
+        """
+        Substitute variables into the template.
+
+        Args:
+            variables: Variable values by name
+
+        Returns:
+            The rendered text; placeholders of missing variables are kept verbatim
+        """
+        if not self._names:
+            return self._literals[0]
+        pieces = [self._literals[0]]
+        for name, literal in zip(self._names, self._literals[1:]):
+            value = variables.get(name)
+            pieces.append("${" + name + "}" if value is None else str(value))
+            pieces.append(literal)
+        return "".join(pieces)
+
+
+_cache: "OrderedDict[str, Template]" = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def compile_template(source: str) -> Template:
+    """
+    Get the parsed template of a text, parsing it only the first time it is seen.
+
+    Args:
+        source: Template text
+
+    Returns:
+        The parsed template
+    """
+    key = hashlib.sha256(source.encode("utf-8")).hexdigest()
+    with _cache_lock:
+        template = _cache.get(key)
+        if template is not None:
+            _cache.move_to_end(key)
+            return template
+    template = Template(source)
+    with _cache_lock:
+        _cache[key] = template
+        while len(_cache) > MAX_CACHED_TEMPLATES:
+            _cache.popitem(last=False)
+    return template
+
+
+def render_template(source: str, variables: Mapping[str, Any]) -> str:
+    """
+    Render a template text.
+
+    Args:
+        source: Template text
+        variables: Variable values by name
+
+    Returns:
+        The rendered text
+    """
+    return compile_template(source).render(variables)
+
+
+def repository_key(repo_config: Dict[str, Any]) -> str:
+    """
+    Get the name a repository's variables are known by.
+
+    Args:
+        repo_config: Repository configuration
+
+    Returns:
+        The repository's path, or the last component of its URL when it is cloned into the
+        instance root, upper-cased with other characters than letters and digits replaced by
+        underscores; e.g. ``services/api`` becomes ``SERVICES_API``
+    """
+    name = repo_config.get("path", "").strip("/")
+    if not name:
+        name = repo_config.get("url", "").rstrip("/").rsplit("/", 1)[-1]
+        name = name[: -len(".git")] if name.endswith(".git") else name
+    return re.sub(r"[^A-Za-z0-9]+", "_", name).strip("_").upper()
+
+
+def instance_variables(
+    env_name: str,
+    env_config: Dict[str, Any],
+    instance_dir: str,
+    instance_id: Optional[str] = None,
+    names: Iterable[str] = (),
+    commits: Optional[Dict[str, str]] = None,
+) -> Dict[str, str]:
+    """
+    Build the template variables of an instance.
+
+    Custom variables come from the environment's ``vars`` mapping; the built-in
+    variables take precedence over custom variables of the same name:
+
+    - INSTANCE_ID, WORK_DIR and ENV_NAME
+    - REPO_<KEY>_PATH and REPO_<KEY>_SHA for each repository, see repository_key
+
+    Args:
+        env_name: Name of the environment
+        env_config: Environment configuration
+        instance_dir: Instance directory
+        instance_id: Instance identifier, if known yet
+        names: Placeholder names used by the templates to render; commit SHAs are only
+            resolved for repositories whose SHA variable is among them
+        commits: Already known commit SHAs by repository path relative to the instance directory
+
+    Returns:
+        Variable values by name
+    """
+    variables = {str(name): str(value) for name, value in (env_config.get("vars") or {}).items()}
+    variables.update(WORK_DIR=instance_dir, ENV_NAME=env_name)
+    if instance_id:
+        variables["INSTANCE_ID"] = instance_id
+
+    names = set(names)
+    commits = commits or {}
+    for repo_config in env_config.get("repositories", []):
+        if not repo_config.get("url"):
+            continue
+        key = repository_key(repo_config)
+        path = os.path.normpath(os.path.join(instance_dir, repo_config.get("path", "")))
+        variables[f"REPO_{key}_PATH"] = path
+        if f"REPO_{key}_SHA" in names:
+            sha = commits.get(os.path.relpath(path, instance_dir)) or _head_commit(path)
+            if sha:
+                variables[f"REPO_{key}_SHA"] = sha
+    return variables
+
+
+def is_instance_specific(name: str) -> bool:
+    """
+    Whether a variable differs between instances of the same environment and commits.
+
+    Args:
+        name: Variable name
+
+    Returns:
+        True for INSTANCE_ID, WORK_DIR and the repository paths
+    """
+    return name in ("INSTANCE_ID", "WORK_DIR") or (name.startswith("REPO_") and name.endswith("_PATH"))
+
+
+def _head_commit(path: str) -> Optional[str]:
+    """Get the commit checked out in a repository, or None if it cannot be read."""
+    import git
+
+    try:
+        return git.Repo(path).head.commit.hexsha
+    except Exception:
+        return None
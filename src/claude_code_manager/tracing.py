@@ -0,0 +1,235 @@
+"""
+Tracing for Claude Code Manager.
+Records nested spans (scaffold phases, clones, commands, MCP tool calls) as Chrome
+trace events, loadable in chrome://tracing, Perfetto or any viewer of that format.
+
+Tracing is enabled by pointing CCM_TRACE at a file, or at a directory to get one
+file per process. When it is disabled, span() returns a shared no-op context manager.
+"""
+
+import atexit
+import contextvars
+import itertools
+import json
+import os
+import threading
+import time
+import uuid
+from typing import IO, Any, Callable, Dict, Optional, Set, TypeVar
+
+from .output import is_routed
+
+# Environment variable naming the trace file, or a directory to write one file per process to
+TRACE_ENV = "CCM_TRACE"
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+_current_span: contextvars.ContextVar[Optional["Span"]] = contextvars.ContextVar("ccm_span", default=None)
+_span_ids = itertools.count(1)
+
+
+class TraceWriter:
+    """Streams trace events to a file in the Chrome trace JSON array format."""
+
+    def __init__(self, path: str):
+        """
+        Initialize the writer; the file is created when the first event is written.
+
+        Args:
+            path: Trace file, or an existing directory to create ``ccm-<pid>-<time>.trace.json`` in
+        """
+        if os.path.isdir(path):
+            path = os.path.join(path, f"ccm-{os.getpid()}-{time.strftime('%Y%m%d-%H%M%S')}.trace.json")
+        self.path = path
+        self.pid = os.getpid()
+        self._lock = threading.Lock()
+        self._file: Optional[IO[str]] = None
+        self._threads: Set[int] = set()
+
+    def _open(self) -> IO[str]:
+        """Create the trace file and write the process metadata."""
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        f = open(self.path, "w")
+        # Events are written with a leading separator, so an interrupted trace only lacks the
+        # closing bracket, which the format allows
+        f.write("[\n")
+        f.write(json.dumps({"name": "process_name", "ph": "M", "pid": self.pid, "args": {"name": "ccm"}}))
+        atexit.register(self.close)
+        return f
+
+    def write(self, event: Dict[str, Any], flush: bool = False) -> None:
+        """
+        Append an event.
+
+        Args:
+            event: Chrome trace event
+            flush: Whether to flush the file, e.g. when a root span ends
+        """
+        thread = threading.current_thread()
+        with self._lock:
+            if self._file is None:
+                self._file = self._open()
+            if event["tid"] not in self._threads:
+                self._threads.add(event["tid"])
+                name_event = {"name": "thread_name", "ph": "M", "pid": self.pid, "tid": event["tid"]}
+                name_event["args"] = {"name": thread.name}
+                self._file.write(",\n" + json.dumps(name_event))
+            self._file.write(",\n" + json.dumps(event, default=str))
+            if flush:
+                self._file.flush()
+
+    def close(self) -> None:
+        """Terminate the JSON array and close the file."""
+        with self._lock:
+            if self._file is not None:
+                self._file.write("\n]\n")
+                self._file.close()
+                self._file = None
+
+
+class Span:
+    """A timed operation; spans opened while it is active in the same context become its children."""
+
+    def __init__(self, writer: TraceWriter, name: str, attributes: Dict[str, Any]):
+        """
+        Initialize a span; timing starts when it is entered.
+
+        Args:
+            writer: Writer the finished span is sent to
+            name: Span name
+            attributes: Attributes shown with the span
+        """
+        self.writer = writer
+        self.name = name
+        self.attributes = attributes
+        self.span_id = next(_span_ids)
+        self.parent: Optional[Span] = None
+        self.trace_id = ""
+        self._token: Optional[contextvars.Token] = None
+        self._start_us = 0
+        self._start_ns = 0
+
+    def set(self, /, **attributes: Any) -> None:
+        """
+        Add attributes, e.g. results known only at the end of the operation.
+
+        Args:
+            **attributes: Attributes to add
+        """
+        self.attributes.update(attributes)
+
+    def __enter__(self) -> "Span":
+        self.parent = _current_span.get()
+        self.trace_id = self.parent.trace_id if self.parent is not None else uuid.uuid4().hex
+        self._token = _current_span.set(self)
+        self._start_us = time.time_ns() // 1000
+        self._start_ns = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        duration_us = (time.perf_counter_ns() - self._start_ns) // 1000
+        _current_span.reset(self._token)
+        args = dict(self.attributes)
+        args.update(trace_id=self.trace_id, span_id=self.span_id)
+        if self.parent is not None:
+            args["parent_id"] = self.parent.span_id
+        if exc_type is not None:
+            args["error"] = f"{exc_type.__name__}: {exc_value}"
+        event = {
+            "name": self.name,
+            "cat": "ccm",
+            "ph": "X",
+            "ts": self._start_us,
+            "dur": duration_us,
+            "pid": self.writer.pid,
+            "tid": threading.get_native_id(),
+            "args": args,
+        }
+        self.writer.write(event, flush=self.parent is None)
+
+
+class _NoopSpan:
+    """Stand-in returned by span() while tracing is disabled."""
+
+    def set(self, /, **attributes: Any) -> None:
+        pass
+
+    def __enter__(self) -> "_NoopSpan":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        pass
+
+
+_NOOP_SPAN = _NoopSpan()
+_writer: Optional[TraceWriter] = TraceWriter(os.environ[TRACE_ENV]) if os.environ.get(TRACE_ENV) else None
+
+
+def enabled() -> bool:
+    """Whether spans are being recorded."""
+    return _writer is not None
+
+
+def span(name: str, /, **attributes: Any) -> Any:
+    """
+    Create a span to use as a context manager.
+
+    Args:
+        name: Span name
+        **attributes: Attributes shown with the span
+
+    Returns:
+        A Span, or a no-op stand-in when tracing is disabled
+    """
+    if _writer is None:
+        return _NOOP_SPAN
+    return Span(_writer, name, attributes)
+
+
+def detached_environment(**overrides: str) -> Dict[str, str]:
+    """
+    Build the environment of a detached helper process, such as the trash reaper or a pool refill.
+
+    The helper outlives the command that started it, so it must not write to that command's
+    trace or profiles: a trace file would be reopened and truncated while the parent still
+    writes to it.
+
+    Args:
+        **overrides: Variables to set
+
+    Returns:
+        A copy of this process's environment without CCM_TRACE and CCM_MCP_PROFILE, with the overrides
+    """
+    from .profiling import MCP_PROFILE_ENV
+
+    env = {name: value for name, value in os.environ.items() if name not in (TRACE_ENV, MCP_PROFILE_ENV)}
+    env.update(overrides)
+    return env
+
+
+def propagate(func: F) -> F:
+    """
+    Bind a function to the current span and output routing, for running it on another thread.
+
+    Executor threads don't inherit context variables, so spans opened by functions
+    submitted to a thread pool would otherwise start a trace of their own, and their
+    output would not reach the ccm client the daemon is scaffolding for.
+
+    Args:
+        func: Function to run on another thread
+
+    Returns:
+        A function running func in a copy of the current context, or func itself
+        when tracing is disabled and output is not routed
+    """
+    if _writer is None and not is_routed():
+        return func
+    context = contextvars.copy_context()
+
+    def run(*args: Any, **kwargs: Any) -> Any:
+        # A context can only be entered by one thread at a time, so each call gets a copy
+        return context.copy().run(func, *args, **kwargs)
+
+    return run  # type: ignore[return-value]
@@ -0,0 +1,165 @@
+"""
+Trash-and-reap removal of instance directories for Claude Code Manager.
+
+Deleting an instance renames its directory into a ``.ccm-trash`` directory next to it,
+which is instant on the same filesystem. The trashed trees are removed later by a
+detached low-priority reaper process or by ``ccm gc``. Every trash directory is recorded
+under the configuration directory, so trees left behind by a crashed reaper are found
+and removed by the next one.
+"""
+
+import errno
+import fcntl
+import hashlib
+import os
+import shutil
+import subprocess
+import sys
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+
+from .config import ConfigManager
+from .tracing import detached_environment
+
+TRASH_DIR_NAME = ".ccm-trash"
+DEFAULT_MAX_PARALLEL_REAPS = 4
+
+
+class Trash:
+    """Moves directories to trash and reaps them."""
+
+    def __init__(self, config_manager: ConfigManager):
+        """
+        Initialize the trash.
+
+        Args:
+            config_manager: Configuration manager instance
+        """
+        self.config_manager = config_manager
+        self.records_dir = os.path.join(config_manager.config_dir, "trash")
+
+    def _record(self, trash_dir: str) -> None:
+        """Remember a trash directory so reapers can find it."""
+        os.makedirs(self.records_dir, exist_ok=True)
+        record = os.path.join(self.records_dir, hashlib.sha1(trash_dir.encode("utf-8")).hexdigest()[:16])
+        if not os.path.exists(record):
+            with open(record, "w") as f:
+                f.write(trash_dir)
+
+    def trash_dirs(self) -> List[str]:
+        """
+        List the known trash directories.
+
+        Returns:
+            Paths of the recorded trash directories that still exist
+        """
+        if not os.path.isdir(self.records_dir):
+            return []
+        trash_dirs = []
+        for entry in os.scandir(self.records_dir):
+            with open(entry.path, "r") as f:
+                trash_dir = f.read().strip()
+            if os.path.isdir(trash_dir):
+                trash_dirs.append(trash_dir)
+            else:
+                os.remove(entry.path)
+        return trash_dirs
+
+    def move(self, path: str) -> Optional[str]:
+        """
+        Move a directory into the trash directory next to it.
+
+        Args:
+            path: Directory to trash
+
+        Returns:
+            Path of the trashed directory, or None if it cannot be renamed (for example
+            because it is a mount point or the trash would be on another filesystem)
+        """
+        path = os.path.abspath(path)
+        trash_dir = os.path.join(os.path.dirname(path), TRASH_DIR_NAME)
+        try:
+            os.makedirs(trash_dir, exist_ok=True)
+            # Record before renaming: a crash in between leaves at most an empty trash directory
+            self._record(trash_dir)
+            trashed_path = os.path.join(trash_dir, f"{os.path.basename(path)}-{uuid.uuid4().hex[:8]}")
+            os.rename(path, trashed_path)
+        except OSError as e:
+            if e.errno not in (errno.EXDEV, errno.EBUSY, errno.EACCES, errno.EPERM, errno.EROFS):
+                raise
+            return None
+        return trashed_path
+
+    def reap(self, max_workers: int = DEFAULT_MAX_PARALLEL_REAPS) -> int:
+        """
+        Remove everything in the known trash directories.
+
+        Trash directories being reaped by another process are skipped.
+
+        Args:
+            max_workers: Maximum number of trees removed at once
+
+        Returns:
+            Number of trashed trees removed
+        """
+        reaped = 0
+        with ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix="ccm-reap") as executor:
+            for trash_dir in self.trash_dirs():
+                with open(os.path.join(trash_dir, ".lock"), "a") as lock_file:
+                    try:
+                        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    except BlockingIOError:
+                        continue
+                    # Directories trashed while reaping are picked up by the next scan; trees
+                    # that could not be removed completely are left for the next reap
+                    attempted = set()
+                    while True:
+                        entries = [
+                            entry.path
+                            for entry in os.scandir(trash_dir)
+                            if entry.name != ".lock" and entry.path not in attempted
+                        ]
+                        if not entries:
+                            break
+                        attempted.update(entries)
+                        list(executor.map(_remove, entries))
+                        reaped += sum(1 for entry in entries if not os.path.lexists(entry))
+        return reaped
+
+    def reap_in_background(self) -> None:
+        """Start a detached reaper process at the lowest CPU and I/O priority."""
+        command = [sys.executable, "-m", "claude_code_manager.trash"]
+        ionice = shutil.which("ionice")
+        if ionice:
+            command = [ionice, "-c", "3"] + command
+        env = detached_environment(CCM_CONFIG_DIR=self.config_manager.config_dir)
+        subprocess.Popen(
+            command,
+            env=env,
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            start_new_session=True,
+        )
+
+
+def _remove(path: str) -> None:
+    """Remove a trashed file or tree."""
+    if os.path.isdir(path) and not os.path.islink(path):
+        shutil.rmtree(path, ignore_errors=True)
+    else:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+def main():
+    """Entry point of the detached reaper process."""
+    os.nice(19)
+    Trash(ConfigManager()).reap()
+
+
+if __name__ == "__main__":
+    main()
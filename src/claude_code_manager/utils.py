@@ -1,5 +1,8 @@
 """
 Utility functions for Claude Code Manager.
+
+Only the rich console is imported at module level; tables and panels are imported
+when first printed.
 """
 
 import os
@@ -9,8 +12,6 @@ import time
 from typing import Any, Callable, Dict, List, Optional
 
 from rich.console import Console
-from rich.panel import Panel
-from rich.table import Table
 
 # Initialize rich console
 console = Console()
@@ -45,6 +46,8 @@ def print_table(title: str, data: List[Dict[str, Any]], columns: List[Dict[str,
         data: List of dictionaries containing data
         columns: List of column definitions with keys and headers
     """
+    from rich.table import Table
+
     table = Table(title=title)
 
     # Add columns
@@ -67,6 +70,8 @@ def display_environment_details(env_data: Dict[str, Any], config_manager=None) -
         env_data: Environment data
         config_manager: Optional configuration manager to get claude.md content
     """
+    from rich.panel import Panel
+
     console.print(
         Panel.fit(
             f"[bold]Environment:[/bold] {env_data.get('name', 'Unknown')}\n"
@@ -0,0 +1,45 @@
+"""Shared fixtures: an isolated configuration directory and generated local git repositories."""
+
+import os
+import subprocess
+
+import pytest
+
+from claude_code_manager.config import ConfigManager
+from claude_code_manager.environment import EnvironmentManager
+
+
+@pytest.fixture
+def env_manager(tmp_path, monkeypatch):
+    """An environment manager whose configuration and work directories are inside tmp_path."""
+    monkeypatch.setenv("CCM_NO_DAEMON", "1")
+    config_manager = ConfigManager(str(tmp_path / "config"))
+    config_manager.config["default_work_dir"] = str(tmp_path / "work")
+    config_manager.save()
+    return EnvironmentManager(config_manager)
+
+
+@pytest.fixture
+def make_repo(tmp_path):
+    """Create a git repository with one commit of the given files and return its file:// URL."""
+
+    def make(name, files):
+        path = tmp_path / "repos" / name
+        for rel_path, content in files.items():
+            (path / rel_path).parent.mkdir(parents=True, exist_ok=True)
+            (path / rel_path).write_text(content)
+        git = ["git", "-C", str(path), "-c", "user.name=test", "-c", "user.email=test@example.com"]
+        subprocess.run(git + ["init", "-q", "-b", "main"], check=True)
+        subprocess.run(git + ["add", "-A"], check=True)
+        subprocess.run(git + ["commit", "-q", "-m", "Initial"], check=True)
+        return f"file://{path}"
+
+    return make
+
+
+def read_lines(path):
+    """Read the lines of a file, or an empty list if it does not exist."""
+    if not os.path.exists(path):
+        return []
+    with open(path) as f:
+        return f.read().splitlines()
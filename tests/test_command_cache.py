@@ -0,0 +1,40 @@
+import os
+
+from claude_code_manager.command_cache import CommandCache
+
+
+def _write(path, content):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        f.write(content)
+
+
+def test_outputs_containing_the_instance_path_are_not_cached(env_manager, tmp_path):
+    cache = env_manager.command_cache
+    instance_dir = str(tmp_path / "instance")
+    _write(os.path.join(instance_dir, "venv", "bin", "activate"), f"VIRTUAL_ENV={instance_dir}/venv\n")
+    _write(os.path.join(instance_dir, "deps", "index.js"), "module.exports = {};\n")
+
+    assert not cache.store("a" * 64, ["venv"], instance_dir)
+    assert cache.store("b" * 64, ["deps"], instance_dir)
+    assert [entry["key"] for entry in cache.list_entries()] == ["b" * 64]
+
+
+def test_store_only_prunes_when_due(env_manager, tmp_path, monkeypatch):
+    cache = env_manager.command_cache
+    instance_dir = str(tmp_path / "instance")
+    _write(os.path.join(instance_dir, "deps", "index.js"), "module.exports = {};\n")
+    prunes = []
+    original_prune = CommandCache.prune
+    monkeypatch.setattr(CommandCache, "prune", lambda self, *args: prunes.append(1) or original_prune(self, *args))
+
+    # The first store finds no ledger and prunes; later ones trust the recorded sizes
+    for key in ("c" * 64, "d" * 64, "e" * 64):
+        assert cache.store(key, ["deps"], instance_dir)
+    assert len(prunes) == 1
+
+    # Over the limit, the next store prunes down to it
+    env_manager.config_manager.config["command_cache_max_size_mb"] = 0
+    assert cache.store("f" * 64, ["deps"], instance_dir)
+    assert len(prunes) == 2
+    assert cache.list_entries() == []
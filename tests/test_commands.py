@@ -0,0 +1,65 @@
+from claude_code_manager.commands import normalize_commands, run_scaffold_commands
+
+
+def _run(command_configs, cwd, max_workers=4):
+    results = run_scaffold_commands(normalize_commands(command_configs), str(cwd), max_workers=max_workers)
+    return {result["name"]: result["status"] for result in results}
+
+
+def _wait_for(name):
+    """A command that succeeds only if the named file shows up within five seconds."""
+    return f"for i in $(seq 50); do [ -e {name} ] && exit 0; sleep 0.1; done; exit 1"
+
+
+def test_plain_list_keeps_running_after_a_failure(tmp_path):
+    statuses = _run(
+        [
+            {"command": "echo first >> order.log"},
+            {"command": "exit 1"},
+            {"command": "echo third >> order.log"},
+        ],
+        tmp_path,
+    )
+
+    assert statuses == {"command_1": "succeeded", "command_2": "failed", "command_3": "succeeded"}
+    assert (tmp_path / "order.log").read_text().split() == ["first", "third"]
+
+
+def test_plain_list_runs_in_order(tmp_path):
+    statuses = _run([{"command": "sleep 0.3 && touch first"}, {"command": "test -e first"}], tmp_path)
+
+    assert statuses == {"command_1": "succeeded", "command_2": "succeeded"}
+
+
+def test_failure_skips_dependents_only(tmp_path):
+    statuses = _run(
+        [
+            {"name": "build", "command": "exit 1"},
+            {"name": "test", "command": "true", "depends_on": "build"},
+            {"name": "deploy", "command": "true", "depends_on": ["test"]},
+            {"name": "docs", "command": "true"},
+            {"name": "lint", "command": "true", "parallel": True},
+        ],
+        tmp_path,
+    )
+
+    assert statuses == {
+        "build": "failed",
+        "test": "skipped",
+        "deploy": "skipped",
+        "docs": "succeeded",
+        "lint": "succeeded",
+    }
+
+
+def test_parallel_commands_run_at_the_same_time(tmp_path):
+    statuses = _run(
+        [
+            {"name": "a", "command": f"touch a.started && {_wait_for('b.started')}", "parallel": True},
+            {"name": "b", "command": f"touch b.started && {_wait_for('a.started')}", "parallel": True},
+            {"name": "both", "command": "test -e a.started && test -e b.started", "depends_on": ["a", "b"]},
+        ],
+        tmp_path,
+    )
+
+    assert statuses == {"a": "succeeded", "b": "succeeded", "both": "succeeded"}
@@ -0,0 +1,19 @@
+from claude_code_manager.core import ClaudeCodeManager
+
+
+def test_listing_does_not_create_the_environment_manager(env_manager, make_repo, capsys):
+    env_manager.config_manager.save_environment_config(
+        "listed", {"description": "Listed", "repositories": [{"url": make_repo("app", {"a": "a"}), "path": "app"}]}
+    )
+    instance_path = env_manager.scaffold_environment("listed")
+    capsys.readouterr()
+
+    manager = ClaudeCodeManager(env_manager.config_manager.config_dir)
+    assert manager.list_env_types()
+    assert manager.list_instances(output_format="plain")
+    assert instance_path in capsys.readouterr().out
+    assert "env_manager" not in vars(manager)
+
+    # Sorting by size measures the instances, which needs it
+    assert manager.list_instances(sort="size", output_format="plain")
+    assert "env_manager" in vars(manager)
@@ -0,0 +1,100 @@
+import os
+import subprocess
+import sys
+import time
+
+import pytest
+
+from claude_code_manager.daemon.client import connect, default_socket_path
+
+
+@pytest.fixture
+def daemon(env_manager, monkeypatch, tmp_path):
+    """Run ccmd for the env_manager's configuration directory, from another working directory."""
+    config_dir = env_manager.config_manager.config_dir
+    monkeypatch.setenv("CCM_CONFIG_DIR", config_dir)
+    monkeypatch.delenv("CCM_NO_DAEMON")
+    daemon_cwd = tmp_path / "daemon_cwd"
+    daemon_cwd.mkdir()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "claude_code_manager.daemon.server"],
+        cwd=daemon_cwd,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+    )
+    deadline = time.monotonic() + 10
+    while not os.path.exists(default_socket_path(config_dir)):
+        assert process.poll() is None and time.monotonic() < deadline, "ccmd did not start"
+        time.sleep(0.05)
+    client = connect(config_dir)
+    assert client is not None
+    yield client
+    client.close()
+    process.terminate()
+    process.wait(timeout=10)
+
+
+def test_scaffold_through_daemon_uses_client_cwd_environment_and_stdout(
+    env_manager, make_repo, daemon, tmp_path, monkeypatch, capsys
+):
+    from claude_code_manager.core import ClaudeCodeManager
+
+    url = make_repo("app", {"README.md": "app\n"})
+    env_manager.config_manager.save_environment_config(
+        "hello",
+        {"repositories": [{"url": url, "path": "app"}], "scaffold_commands": [{"command": "echo hello $CLIENT_VAR"}]},
+    )
+    client_cwd = tmp_path / "client_cwd"
+    client_cwd.mkdir()
+    monkeypatch.chdir(client_cwd)
+    monkeypatch.setenv("CLIENT_VAR", "from-client")
+
+    manager = ClaudeCodeManager(env_manager.config_manager.config_dir, daemon=daemon)
+    assert manager.scaffold_environment("hello", "relinst")
+
+    assert (client_cwd / "relinst" / "app" / "README.md").exists()
+    assert "hello from-client" in capsys.readouterr().out
+    instances = env_manager.list_instances("hello")
+    assert [instance["path"] for instance in instances] == [str(client_cwd / "relinst")]
+
+
+def test_listing_through_daemon(env_manager, make_repo, daemon, monkeypatch, capsys):
+    from claude_code_manager.core import ClaudeCodeManager
+    from claude_code_manager.daemon.client import DaemonClient
+
+    env_manager.config_manager.save_environment_config(
+        "listed", {"description": "Listed", "repositories": [{"url": make_repo("app", {"a": "a"}), "path": "app"}]}
+    )
+    instance_paths = [env_manager.scaffold_environment("listed") for _ in range(3)]
+    capsys.readouterr()
+
+    manager = ClaudeCodeManager(env_manager.config_manager.config_dir, daemon=daemon)
+    assert manager.list_env_types()
+    assert "Listed" in capsys.readouterr().out
+
+    # Each instance is printed as soon as its line arrives, not after the whole listing was received
+    events = []
+    receive = DaemonClient._receive
+    monkeypatch.setattr(DaemonClient, "_receive", lambda self: events.append("receive") or receive(self))
+    write = sys.stdout.write
+    monkeypatch.setattr(sys.stdout, "write", lambda text: events.append("write") or write(text))
+    assert manager.list_instances(output_format="plain")
+
+    output = capsys.readouterr().out
+    assert all(path in output for path in instance_paths)
+    assert events == ["receive", "write"] * 3 + ["receive"]
+
+
+def test_status_reports_file_cache_counters(env_manager, daemon):
+    env_manager.config_manager.save_environment_config("hello", {"repositories": []})
+    for _ in range(3):
+        assert daemon.call("config_manager.get_environment_config", "hello") == {"repositories": []}
+
+    assert daemon.call("ping")["file_cache"] == {"hits": 2, "misses": 1, "entries": 1}
+    status = subprocess.run(
+        [sys.executable, "-m", "claude_code_manager.daemon.server", "--status"],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    assert "Configuration file cache: 2 hits, 1 misses, 1 files" in status.stdout
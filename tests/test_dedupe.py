@@ -0,0 +1,34 @@
+import os
+import subprocess
+
+
+def _blob_files(dedupe):
+    return sorted(name for _, _, names in os.walk(dedupe.blobs_dir) for name in names)
+
+
+def test_shared_blobs_survive_until_the_last_reference_is_released(env_manager, make_repo):
+    config_manager = env_manager.config_manager
+    config_manager.config.update(dedupe_enabled=True, dedupe_min_file_size_kb=0)
+    config_manager.save()
+    config_manager.save_environment_config(
+        "app", {"repositories": [{"url": make_repo("app", {"a.txt": "a" * 100}), "path": "app"}]}
+    )
+    first = env_manager.scaffold_instance("app")
+    second = env_manager.scaffold_instance("app")
+    dedupe = env_manager.dedupe
+    stats = dedupe.stats()
+    assert stats["instances"] == 2
+    assert stats["files"] == 2 * stats["blobs"] > 0
+    blobs = _blob_files(dedupe)
+    assert len(blobs) == stats["blobs"]
+
+    assert env_manager.delete_instance(first["id"])
+    assert _blob_files(dedupe) == blobs
+    assert dedupe.stats()["files"] == stats["blobs"]
+    # The remaining instance's deduplicated git objects are still readable
+    show = ["git", "-C", os.path.join(second["path"], "app"), "show", "HEAD:a.txt"]
+    assert subprocess.run(show, capture_output=True, text=True, check=True).stdout == "a" * 100
+
+    assert env_manager.delete_instance(second["id"])
+    assert _blob_files(dedupe) == []
+    assert dedupe.stats()["blobs"] == 0
@@ -0,0 +1,59 @@
+import os
+from datetime import datetime, timedelta
+
+from claude_code_manager import garbage
+
+
+def _orphans(env_manager):
+    return [candidate["path"] for candidate in env_manager.garbage.plan() if candidate["reason"] == "orphan_directory"]
+
+
+def test_only_marked_instance_directories_are_orphans(env_manager, make_repo, monkeypatch):
+    monkeypatch.setattr(garbage, "ORPHAN_GRACE_SECONDS", -1)
+    env_manager.config_manager.save_environment_config(
+        "app", {"repositories": [{"url": make_repo("app", {"a": "a"}), "path": "app"}]}
+    )
+    orphan = env_manager.scaffold_instance("app")
+    env_manager.delete_instance(orphan["id"], remove_files=False)
+    kept = env_manager.scaffold_instance("app")
+
+    work_dir = env_manager.config_manager.get_default_work_dir()
+    unrelated = [os.path.join(work_dir, name) for name in ("backup_20241017", "notes_deadbeef", "app_0badc0de")]
+    for path in unrelated:
+        os.makedirs(path)
+    # A marker whose id does not match the directory name does not count either
+    garbage.write_instance_marker(unrelated[2], "ffffffff-0000-0000-0000-000000000000")
+
+    assert _orphans(env_manager) == [orphan["path"]]
+    env_manager.garbage.collect(env_manager.garbage.plan())
+    assert not os.path.exists(orphan["path"])
+    assert all(os.path.isdir(path) for path in unrelated + [kept["path"]])
+
+
+def test_live_and_recent_instances_are_kept(env_manager, make_repo):
+    url = make_repo("app", {"a": "a"})
+    config_manager = env_manager.config_manager
+    config_manager.save_environment_config(
+        "app", {"repositories": [{"url": url, "path": "app"}], "gc": {"ttl_hours": 1, "max_instances": 2}}
+    )
+    config_manager.save_environment_config("unlimited", {"repositories": [{"url": url, "path": "app"}]})
+    expired, over_limit, newer, newest = [env_manager.scaffold_instance("app") for _ in range(4)]
+    expired["created_at"] = (datetime.now() - timedelta(hours=2)).isoformat()
+    config_manager.save_instance(expired["id"], expired)
+    unlimited = [env_manager.scaffold_instance("unlimited") for _ in range(3)]
+    # A directory whose scaffold has not saved its record yet, within ORPHAN_GRACE_SECONDS
+    recent = env_manager.scaffold_instance("unlimited")
+    env_manager.delete_instance(recent["id"], remove_files=False)
+
+    plan = env_manager.garbage.plan()
+    assert sorted((candidate["reason"], candidate["instance_id"]) for candidate in plan) == sorted(
+        [("expired", expired["id"]), ("over_limit", over_limit["id"])]
+    )
+    assert env_manager.garbage.collect(plan) == 2
+
+    kept = [newer, newest] + unlimited
+    assert sorted(instance["id"] for instance in config_manager.list_instances()) == sorted(
+        instance["id"] for instance in kept
+    )
+    assert all(os.path.isdir(instance["path"]) for instance in kept + [recent])
+    assert not any(os.path.exists(instance["path"]) for instance in (expired, over_limit))
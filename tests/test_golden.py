@@ -0,0 +1,57 @@
+import os
+
+
+def _golden_config(url, command):
+    return {
+        "repositories": [{"url": url, "path": "app"}],
+        "scaffold_commands": [{"name": "setup", "command": command}],
+        "golden_image": True,
+    }
+
+
+def _templates(env_manager):
+    return [template["name"] for template in env_manager.golden.list_templates()]
+
+
+def test_instances_are_copied_from_the_template(env_manager, make_repo):
+    env_manager.config_manager.save_environment_config(
+        "healthy", _golden_config(make_repo("app", {"a": "a"}), "echo built > built.txt")
+    )
+
+    instance = env_manager.scaffold_instance("healthy")
+    assert len(_templates(env_manager)) == 1
+    assert os.path.exists(os.path.join(instance["path"], "built.txt"))
+
+
+def test_builds_with_failed_commands_are_not_saved(env_manager, make_repo):
+    env_manager.config_manager.save_environment_config("broken", _golden_config(make_repo("app", {"a": "a"}), "exit 3"))
+
+    instance = env_manager.scaffold_instance("broken")
+    assert _templates(env_manager) == []
+    # Built normally instead, so the failure shows in the instance record
+    assert [command["status"] for command in instance["scaffold_commands"]] == ["failed"]
+
+
+def test_commands_using_work_dir_build_every_instance(env_manager, make_repo):
+    env_manager.config_manager.save_environment_config(
+        "templated", _golden_config(make_repo("app", {"a": "a"}), "echo ${WORK_DIR} > where.txt")
+    )
+
+    instance = env_manager.scaffold_instance("templated")
+    assert _templates(env_manager) == []
+    with open(os.path.join(instance["path"], "where.txt")) as f:
+        assert f.read().strip() == instance["path"]
+
+
+def test_builds_embedding_the_build_directory_are_not_saved(env_manager, make_repo):
+    env_manager.config_manager.save_environment_config(
+        "venv", _golden_config(make_repo("app", {"a": "a"}), "pwd > where.txt")
+    )
+
+    for _ in range(2):
+        instance = env_manager.scaffold_instance("venv")
+        with open(os.path.join(instance["path"], "where.txt")) as f:
+            assert f.read().strip() == instance["path"]
+    assert _templates(env_manager) == []
+    # Remembered, so the second scaffold did not build a template again
+    assert len([name for name in os.listdir(env_manager.golden.golden_dir) if name.endswith(".unusable")]) == 1
@@ -0,0 +1,50 @@
+import asyncio
+
+from claude_code_manager.mcp.jobs import ScaffoldJobManager
+
+
+def _run_job(env_manager, env_name):
+    async def run():
+        jobs = ScaffoldJobManager(lambda: env_manager, max_jobs=1)
+        job = jobs.start(env_name)
+        await job.task
+        return job.to_dict()
+
+    return asyncio.run(run())
+
+
+def test_job_with_failed_command_is_failed(env_manager, make_repo):
+    url = make_repo("app", {"a": "a"})
+    env_manager.config_manager.save_environment_config(
+        "broken",
+        {"repositories": [{"url": url, "path": "app"}], "scaffold_commands": [{"name": "setup", "command": "exit 3"}]},
+    )
+
+    job = _run_job(env_manager, "broken")
+    assert job["status"] == "failed"
+    assert job["failed_commands"] == ["setup"]
+    assert job["failed_repositories"] == []
+    assert "setup" in job["error"]
+    assert job["instance"]["path"]
+
+
+def test_job_with_failed_clone_is_failed(env_manager, tmp_path):
+    missing = f"file://{tmp_path / 'missing'}"
+    env_manager.config_manager.save_environment_config(
+        "unreachable", {"repositories": [{"url": missing, "path": "app"}]}
+    )
+
+    job = _run_job(env_manager, "unreachable")
+    assert job["status"] == "failed"
+    assert job["failed_repositories"] == [missing]
+
+
+def test_complete_job_succeeds(env_manager, make_repo):
+    url = make_repo("app", {"a": "a"})
+    env_manager.config_manager.save_environment_config(
+        "healthy", {"repositories": [{"url": url, "path": "app"}], "scaffold_commands": [{"command": "true"}]}
+    )
+
+    job = _run_job(env_manager, "healthy")
+    assert job["status"] == "succeeded"
+    assert "error" not in job and "failed_commands" not in job
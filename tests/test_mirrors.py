@@ -0,0 +1,23 @@
+from claude_code_manager.mirrors import MirrorCache
+
+
+def test_clone_only_prunes_when_due(env_manager, make_repo, tmp_path, monkeypatch):
+    mirrors = env_manager.mirror_cache
+    urls = [make_repo(name, {"README": name}) for name in ("one", "two", "three")]
+    prunes = []
+    original_prune = MirrorCache.prune
+    monkeypatch.setattr(
+        MirrorCache, "prune", lambda self, *args, **kwargs: prunes.append(1) or original_prune(self, *args, **kwargs)
+    )
+
+    # The first clone finds no ledger and prunes; later ones trust the recorded sizes
+    for index, url in enumerate(urls):
+        mirrors.clone(url, str(tmp_path / "clones" / str(index)))
+    assert len(prunes) == 1
+    assert len(mirrors.list_mirrors(with_urls=False)) == 3
+
+    # Over the limit, the next clone evicts every mirror but its own
+    env_manager.config_manager.config["mirror_cache_max_size_mb"] = 0
+    mirrors.clone(urls[0], str(tmp_path / "clones" / "again"))
+    assert len(prunes) == 2
+    assert [mirror["path"] for mirror in mirrors.list_mirrors(with_urls=False)] == [mirrors.mirror_path(urls[0])]
@@ -0,0 +1,41 @@
+def _pooled_config(url, command):
+    return {
+        "repositories": [{"url": url, "path": "app"}],
+        "scaffold_commands": [{"name": "setup", "command": command}],
+        "pool": {"size": 1},
+    }
+
+
+def test_fill_publishes_healthy_builds(env_manager, make_repo):
+    env_manager.config_manager.save_environment_config("healthy", _pooled_config(make_repo("app", {"a": "a"}), "true"))
+
+    assert env_manager.pool.fill("healthy") == 1
+    assert [entry["ready"] for entry in env_manager.pool.status()] == [1]
+
+
+def test_fill_discards_builds_with_failed_commands(env_manager, make_repo):
+    env_manager.config_manager.save_environment_config("broken", _pooled_config(make_repo("app", {"a": "a"}), "exit 3"))
+
+    assert env_manager.pool.fill("broken") == 0
+    assert [entry["ready"] for entry in env_manager.pool.status()] == [0]
+
+
+def test_commands_using_work_dir_are_not_pooled(env_manager, make_repo):
+    env_manager.config_manager.save_environment_config(
+        "templated", _pooled_config(make_repo("app", {"a": "a"}), "echo ${WORK_DIR} > where.txt")
+    )
+
+    assert env_manager.pool.fill("templated") == 0
+
+
+def test_builds_embedding_the_build_directory_are_not_pooled(env_manager, make_repo, capsys):
+    env_manager.config_manager.save_environment_config(
+        "venv", _pooled_config(make_repo("app", {"a": "a"}), "pwd > where.txt")
+    )
+
+    assert env_manager.pool.fill("venv") == 0
+    assert "contain the build directory" in capsys.readouterr().out
+    # Not built again until the config changes
+    assert env_manager.pool.fill("venv") == 0
+    assert capsys.readouterr().out == ""
+    assert [entry["ready"] for entry in env_manager.pool.status()] == [0]
@@ -0,0 +1,28 @@
+import os
+
+from conftest import read_lines
+
+
+def test_refresh_skips_templated_command_with_unchanged_inputs(env_manager, make_repo):
+    url = make_repo("app", {"lock.txt": "v1\n"})
+    env_manager.config_manager.save_environment_config(
+        "templated",
+        {
+            "vars": {"FOO": "bar"},
+            "repositories": [{"url": url, "path": "app"}],
+            "scaffold_commands": [
+                {"name": "vars", "command": "echo ${FOO} >> vars.log", "inputs": ["app/lock.txt"]},
+                {"name": "sha", "command": "echo ${REPO_APP_SHA} >> sha.log", "inputs": ["app/lock.txt"]},
+            ],
+        },
+    )
+    instance = env_manager.scaffold_instance("templated")
+    instance_dir = instance["path"]
+    assert read_lines(os.path.join(instance_dir, "vars.log")) == ["bar"]
+
+    for _ in range(2):
+        report = env_manager.refresh_instance(instance["id"])
+        assert [result["status"] for result in report["commands"]] == ["unchanged", "unchanged"]
+
+    assert read_lines(os.path.join(instance_dir, "vars.log")) == ["bar"]
+    assert len(read_lines(os.path.join(instance_dir, "sha.log"))) == 1
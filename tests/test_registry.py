@@ -0,0 +1,53 @@
+import os
+import shutil
+
+from claude_code_manager.config import ConfigManager
+from claude_code_manager.serialization import dump_file
+
+
+def _legacy_records():
+    return [
+        {
+            "id": f"{index:08x}-0000-0000-0000-000000000000",
+            "environment": "app" if index % 2 else "api",
+            "path": f"/work/app_{index:08x}",
+            "created_at": f"2024-10-{index + 1:02d}T12:00:00",
+            "repositories": [{"url": "https://example.com/app.git", "path": "app", "branch": "main"}],
+            "commits": {"app": "0" * 40},
+        }
+        for index in range(5)
+    ]
+
+
+def test_legacy_yaml_migration_keeps_every_record_and_is_idempotent(tmp_path):
+    config_dir = str(tmp_path / "config")
+    instances_dir = os.path.join(config_dir, "instances")
+    os.makedirs(instances_dir)
+    records = _legacy_records()
+    # Records without an id are keyed by their file name
+    expected = {record["id"]: record for record in records[:-1]}
+    unnamed_id = records[-1]["id"]
+    expected[unnamed_id] = {key: value for key, value in records[-1].items() if key != "id"}
+    for instance_id, record in expected.items():
+        dump_file(record, os.path.join(instances_dir, f"{instance_id}.yaml"))
+
+    def registered():
+        config_manager = ConfigManager(config_dir)
+        return {instance_id: config_manager.get_instance(instance_id) for instance_id in expected}
+
+    assert registered() == expected
+    migrated_dir = os.path.join(instances_dir, "migrated")
+    assert sorted(os.listdir(migrated_dir)) == sorted(f"{instance_id}.yaml" for instance_id in expected)
+    assert [name for name in os.listdir(instances_dir) if name.endswith(".yaml")] == []
+
+    # Re-running, also with a file left behind by an interrupted migration, changes nothing
+    config_manager = ConfigManager(config_dir)
+    assert len(config_manager.list_instances()) == len(expected)
+    changed = dict(records[0], environment="changed")
+    config_manager.save_instance(changed["id"], changed)
+    shutil.copy(os.path.join(migrated_dir, f"{changed['id']}.yaml"), instances_dir)
+
+    expected[changed["id"]] = changed
+    assert registered() == expected
+    assert len(ConfigManager(config_dir).list_instances()) == len(expected)
+    assert [name for name in os.listdir(instances_dir) if name.endswith(".yaml")] == []
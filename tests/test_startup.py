@@ -0,0 +1,37 @@
+"""Commands must not import what they do not need; the import time budgets are checked by benchmarks/startup.py."""
+
+import importlib.util
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+_spec = importlib.util.spec_from_file_location(
+    "startup_benchmark", os.path.join(os.path.dirname(__file__), "..", "benchmarks", "startup.py")
+)
+startup_benchmark = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(startup_benchmark)
+
+# Runs a ccm command, then reports on stderr which of the given modules it imported
+_CHECK = """
+import json, sys
+from claude_code_manager.cli import cli
+forbidden = json.loads(sys.argv[1])
+try:
+    cli.main(sys.argv[2:], prog_name="ccm")
+except SystemExit:
+    pass
+sys.stderr.write(json.dumps(sorted(name for name in forbidden if name in sys.modules)))
+"""
+
+
+@pytest.mark.parametrize("args", list(startup_benchmark.BUDGETS), ids=" ".join)
+def test_command_does_not_import_forbidden_modules(args, tmp_path):
+    _, forbidden = startup_benchmark.BUDGETS[args]
+    env = dict(os.environ, HOME=str(tmp_path), CCM_CONFIG_DIR=str(tmp_path / ".claude_code"))
+    result = subprocess.run(
+        [sys.executable, "-c", _CHECK, json.dumps(forbidden), *args], capture_output=True, text=True, env=env
+    )
+    assert json.loads(result.stderr.splitlines()[-1]) == []
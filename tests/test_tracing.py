@@ -0,0 +1,12 @@
+from claude_code_manager.tracing import detached_environment
+
+
+def test_detached_environment_drops_trace_and_profile_outputs(monkeypatch):
+    monkeypatch.setenv("CCM_TRACE", "/tmp/parent.trace.json")
+    monkeypatch.setenv("CCM_MCP_PROFILE", "/tmp/profiles")
+    monkeypatch.setenv("KEEP_ME", "1")
+
+    env = detached_environment(CCM_CONFIG_DIR="/tmp/config")
+
+    assert "CCM_TRACE" not in env and "CCM_MCP_PROFILE" not in env
+    assert env["KEEP_ME"] == "1" and env["CCM_CONFIG_DIR"] == "/tmp/config"
@@ -0,0 +1,32 @@
+import os
+
+from claude_code_manager.trash import TRASH_DIR_NAME
+
+
+def _files(directory):
+    return [os.path.join(root, name) for root, _, names in os.walk(directory) for name in names]
+
+
+def test_deleted_instance_is_reaped_and_released(env_manager, make_repo, monkeypatch):
+    config_manager = env_manager.config_manager
+    config_manager.config.update(dedupe_enabled=True, dedupe_min_file_size_kb=0)
+    config_manager.save()
+    config_manager.save_environment_config(
+        "app", {"repositories": [{"url": make_repo("app", {"a.txt": "a" * 100}), "path": "app"}]}
+    )
+    instance = env_manager.scaffold_instance("app")
+    assert env_manager.dedupe.stats()["files"] > 0
+    # Reap in this process instead of the detached reaper, to check what it removes
+    monkeypatch.setattr(env_manager.trash, "reap_in_background", lambda: None)
+
+    assert env_manager.delete_instance(instance["id"])
+    assert not os.path.exists(instance["path"])
+    trash_dir = os.path.join(os.path.dirname(instance["path"]), TRASH_DIR_NAME)
+    assert env_manager.trash.trash_dirs() == [trash_dir]
+    assert len([name for name in os.listdir(trash_dir) if name != ".lock"]) == 1
+    assert not env_manager.dedupe.has_references(instance["id"])
+    assert env_manager.dedupe.stats()["blobs"] == 0
+
+    assert env_manager.trash.reap() == 1
+    assert os.listdir(trash_dir) == [".lock"]
+    assert _files(env_manager.dedupe.blobs_dir) == []